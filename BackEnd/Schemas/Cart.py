@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class CartItem(BaseModel):
@@ -14,6 +14,21 @@ class CartItem(BaseModel):
 class CartItemUpdate(BaseModel):
     quantity: int
 
+class CartOperation(BaseModel):
+    op: Literal["add", "update", "remove"]
+    product_id: int
+    # add: amount to add (default 1); update: new quantity
+    quantity: Optional[int] = Field(None, gt=0)
+    # Product details stored on the row when an add inserts it
+    product_name: Optional[str] = None
+    product_price: Optional[int] = None
+    product_category: Optional[str] = None
+    product_image: Optional[str] = ""
+
+class CartBatch(BaseModel):
+    user_id: str
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=100)
+
 class CartResponse(BaseModel):
     id: int
     user_id: str
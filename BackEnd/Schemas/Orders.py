@@ -25,6 +25,19 @@ class OrderCreate(BaseModel):
     total_price: int
     status: Optional[str] = "Confirmed"
 
+class CheckoutRequest(BaseModel):
+    # Items and totals are taken from the user's cart on the server
+    order_id: Optional[str] = None
+    customer_name: str
+    customer_email: str
+    customer_phone: str
+    address: str
+    city: str
+    state: str
+    pincode: str
+    country: Optional[str] = "India"
+    status: Optional[str] = "Confirmed"
+
 class OrderUpdate(BaseModel):
     status: Optional[str] = None
     shipping_id: Optional[str] = None
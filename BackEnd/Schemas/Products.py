@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 
 class Product(BaseModel):
     name: str
@@ -7,3 +8,10 @@ class Product(BaseModel):
     Description: str
     Image: str
     Quantity: int
+
+class StockReservationItem(BaseModel):
+    product_id: int
+    quantity: int = Field(..., gt=0)
+
+class StockReservation(BaseModel):
+    items: List[StockReservationItem] = Field(..., min_length=1)
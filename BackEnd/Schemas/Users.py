@@ -25,3 +25,9 @@ class UserUpdate(BaseModel):
     name: Optional[str] = None
     phone: Optional[str] = None
     password: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LoginCodeRequest(BaseModel):
+    code: str
@@ -0,0 +1,107 @@
+"""
+Benchmark: blocking vs async Supabase access under concurrent load
+
+Starts a local stand-in PostgREST server that answers every query after a
+fixed delay, then fires concurrent requests at two FastAPI endpoints:
+  /blocking - the old pattern, sync supabase client inside an async handler
+  /async    - the repository layer on the async client
+
+Run from the BackEnd directory:
+    python benchmarks/bench_async_db.py --requests 200 --concurrency 50 --delay-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def start_stub_postgrest(delay_seconds: float) -> ThreadingHTTPServer:
+    """Serve `[]` for every request after `delay_seconds`, like a slow PostgREST"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            # Drain any request body so the kept-alive connection stays in sync
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(delay_seconds)
+            body = json.dumps([]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 256
+
+    server = Server(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_load(app, path: str, total: int, concurrency: int) -> float:
+    """Send `total` GETs to `path` with at most `concurrency` in flight, return req/s"""
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay-ms", type=float, default=50.0, help="simulated PostgREST latency")
+    args = parser.parse_args()
+
+    server = start_stub_postgrest(args.delay_ms / 1000)
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "bench.bench.bench"
+
+    from fastapi import FastAPI
+    from config.db import supabase
+    from repositories import products as products_repo
+
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking():
+        return supabase.table("products").select("*").order("id").execute().data
+
+    @app.get("/async")
+    async def non_blocking():
+        return await products_repo.list_products()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, PostgREST delay {args.delay_ms:.0f} ms")
+    for label, path in (("before (blocking)", "/blocking"), ("after (async)", "/async")):
+        rps = asyncio.run(run_load(app, path, args.requests, args.concurrency))
+        print(f"  {label:<18} {rps:8.1f} req/s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
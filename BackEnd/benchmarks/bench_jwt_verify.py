@@ -0,0 +1,71 @@
+"""
+Benchmark: per-request cost of JWT verification with and without the verified-token cache
+
+Times three things for the same token:
+  decode    - python-jose signature check + claims validation (the old verify_token)
+  cold      - verify_token on a token it hasn't seen (decode + cache store)
+  cached    - verify_token on a token it has already verified
+plus a rejected (bad signature) token, with and without the negative cache.
+
+Run from the BackEnd directory:
+    python benchmarks/bench_jwt_verify.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt, JWTError
+from utils.jwt_utils import create_access_token, verify_token, token_cache, SECRET_KEY, ALGORITHM
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    token = create_access_token({"sub": "bench@example.com", "user_id": 1, "role": "user"})
+    bad_token = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+
+    def decode():
+        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+    def decode_rejected():
+        try:
+            jwt.decode(bad_token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            pass
+
+    def cold():
+        token_cache.clear()
+        verify_token(token)
+
+    results = [
+        ("decode (no cache)", per_call_us(decode, n)),
+        ("verify_token cold", per_call_us(cold, n)),
+    ]
+    token_cache.clear()
+    verify_token(token)
+    results.append(("verify_token cached", per_call_us(lambda: verify_token(token), n)))
+    results.append(("rejected decode (no cache)", per_call_us(decode_rejected, n)))
+    verify_token(bad_token)
+    results.append(("rejected verify_token cached", per_call_us(lambda: verify_token(bad_token), n)))
+
+    print(f"{n} iterations each")
+    for name, us in results:
+        print(f"  {name:30s} {us:8.2f} us/call")
+    print(f"  speedup (valid token)          {results[0][1] / results[2][1]:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: per-query cost of product search on a synthetic catalog
+
+Indexes --products products whose names and descriptions are drawn from a random
+vocabulary, then times two query mixes:
+  typo      - vocabulary words with two adjacent letters swapped (fuzzy matching)
+  exact     - vocabulary words as they are
+
+Run from the BackEnd directory:
+    python benchmarks/bench_search.py --products 5000 --vocabulary 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.search_index import SearchIndex
+
+LETTERS = "etaoinshrdlucmfwypvbgk"
+
+
+def per_query_ms(index: SearchIndex, queries: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            index.search(query)
+    return (time.perf_counter() - start) / (rounds * len(queries)) * 1e3
+
+
+def swap_two(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocabulary = ["".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 11))) for _ in range(args.vocabulary)]
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.rebuild({
+        "id": pid,
+        "name": " ".join(rng.sample(vocabulary, 3)),
+        "Category": rng.choice(["Hoodies", "Jerseys", "T-Shirts"]),
+        "Description": " ".join(rng.sample(vocabulary, 8))
+    } for pid in range(1, args.products + 1))
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    long_words = [word for word in vocabulary if len(word) >= 5]
+    typos = [swap_two(rng.choice(long_words), rng) for _ in range(args.queries)]
+    exact = [rng.choice(vocabulary) for _ in range(args.queries)]
+
+    print(f"{args.products} products, {len(index._postings)} distinct tokens (index built in {build_ms:.0f} ms)")
+    print(f"  {'typo':10s} {per_query_ms(index, typos, args.rounds):8.3f} ms/query")
+    print(f"  {'exact':10s} {per_query_ms(index, exact, args.rounds):8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
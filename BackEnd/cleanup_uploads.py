@@ -0,0 +1,130 @@
+"""
+Script to reclaim orphaned product image uploads
+An upload is orphaned when nothing points at it: no product's Image, cart line or past
+order (e.g. the product was deleted, switched to its CDN copy, or never saved). Files newer
+than the grace period are kept, since an admin may still be filling in the product form.
+
+Dry run by default:   python cleanup_uploads.py
+Actually delete:      python cleanup_uploads.py --delete [--grace-hours 24]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import json
+import time
+
+from config.db import supabase
+from utils.uploads import PRODUCT_UPLOAD_DIR, PRODUCT_UPLOAD_URL
+from utils.upload_index import upload_index
+from utils.image_variants import VARIANT_DIR, MANIFEST_DIR
+
+
+# PostgREST caps the rows in one response, so references are read a page at a time
+PAGE_SIZE = 1000
+
+
+def _select_all(table: str, columns: str) -> list:
+    rows = []
+    while True:
+        page = supabase.table(table).select(columns).order("id").range(len(rows), len(rows) + PAGE_SIZE - 1).execute()
+        rows += page.data or []
+        if len(page.data or []) < PAGE_SIZE:
+            return rows
+
+
+def _upload_name(image) -> str:
+    image = image if isinstance(image, str) else ""
+    if PRODUCT_UPLOAD_URL not in image:
+        return ""
+    return image.split(PRODUCT_UPLOAD_URL, 1)[1].split("?", 1)[0]
+
+
+def referenced_uploads() -> set:
+    """
+    File names under /uploads/products/ still referenced anywhere
+
+    Besides products' current Image, cart lines (product_image) and past orders
+    (order_items[*].img) keep the URL they were created with, which outlives a
+    product's image change.
+    """
+    images = [row.get("Image") for row in _select_all("products", "id,Image")]
+    images += [row.get("product_image") for row in _select_all("cart", "id,product_image")]
+    for order in _select_all("orders", "id,order_items"):
+        images += [item.get("img") for item in order.get("order_items") or [] if isinstance(item, dict)]
+    return {name for name in map(_upload_name, images) if name}
+
+
+def _old_enough(path, grace_seconds: float) -> bool:
+    return time.time() - path.stat().st_mtime >= grace_seconds
+
+
+def _remove(path, delete: bool) -> int:
+    size = path.stat().st_size
+    if delete:
+        path.unlink(missing_ok=True)
+    return size
+
+
+def cleanup_uploads(delete: bool = False, grace_hours: float = 24):
+    grace_seconds = grace_hours * 3600
+    mode = "Deleting" if delete else "Dry run -"
+    try:
+        referenced = referenced_uploads()
+    except Exception as e:
+        # Never delete against a partial reference set
+        print(f"❌ Could not read image references: {str(e)}")
+        return
+
+    reclaimed_files = 0
+    reclaimed_bytes = 0
+
+    # 1. Uploads nothing points at (and temp files left by interrupted uploads)
+    orphans = [
+        path for path in (sorted(PRODUCT_UPLOAD_DIR.iterdir()) if PRODUCT_UPLOAD_DIR.is_dir() else [])
+        if path.is_file() and path.name not in referenced and _old_enough(path, grace_seconds)
+    ]
+    orphan_names = {path.name for path in orphans}
+    for path in orphans:
+        print(f"   {mode} {path}")
+        reclaimed_bytes += _remove(path, delete)
+        reclaimed_files += 1
+        if delete and not path.name.endswith(".part"):
+            upload_index.forget_local(PRODUCT_UPLOAD_URL + path.name)
+
+    # 2. Manifests of reclaimed uploads, and variant files no remaining manifest lists
+    # (identical images share variants, so a variant stays while any manifest uses it)
+    live_variants = set()
+    for manifest_path in sorted(MANIFEST_DIR.glob("*.json")) if MANIFEST_DIR.is_dir() else []:
+        upload_name = manifest_path.name[:-len(".json")]
+        if upload_name in orphan_names or not (PRODUCT_UPLOAD_DIR / upload_name).is_file():
+            if delete:
+                manifest_path.unlink(missing_ok=True)
+            continue
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        for entries in manifest.get("variants", {}).values():
+            live_variants.update(name for _, name in entries)
+
+    for path in sorted(VARIANT_DIR.iterdir()) if VARIANT_DIR.is_dir() else []:
+        if not path.is_file() or path.name in live_variants or not _old_enough(path, grace_seconds):
+            continue
+        print(f"   {mode} {path}")
+        reclaimed_bytes += _remove(path, delete)
+        reclaimed_files += 1
+
+    verb = "Reclaimed" if delete else "Would reclaim"
+    print(f"✅ {verb} {reclaimed_files} file(s), {reclaimed_bytes / (1024 * 1024):.1f} MB")
+    if not delete and reclaimed_files:
+        print("   Run again with --delete to remove them")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reclaim product image uploads nothing references")
+    parser.add_argument("--delete", action="store_true", help="delete files instead of only listing them")
+    parser.add_argument("--grace-hours", type=float, default=24, help="keep files modified more recently than this")
+    args = parser.parse_args()
+    cleanup_uploads(delete=args.delete, grace_hours=args.grace_hours)
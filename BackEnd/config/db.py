@@ -1,4 +1,6 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, acreate_client, AsyncClient
+from typing import Optional
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -10,4 +12,19 @@ SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Use service role key fo
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in .env")
 
+# Synchronous client - used by one-off scripts (create_admin.py etc.)
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Async client - used by the API so PostgREST round trips don't block the event loop
+_async_supabase: Optional[AsyncClient] = None
+_async_lock = asyncio.Lock()
+
+
+async def get_async_supabase() -> AsyncClient:
+    """Return the shared async Supabase client, creating it on first use"""
+    global _async_supabase
+    if _async_supabase is None:
+        async with _async_lock:
+            if _async_supabase is None:
+                _async_supabase = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    return _async_supabase
@@ -1,13 +1,39 @@
 """
 Google OAuth 2.0 Configuration
 Handles OAuth setup using Authlib
+Google's OpenID metadata and signing keys are prefetched and cached (utils/oidc_cache.py)
+instead of being fetched lazily during a user's sign-in
 """
 import os
-from authlib.integrations.starlette_client import OAuth
+from authlib.integrations.starlette_client import OAuth, StarletteOAuth2App
 from dotenv import load_dotenv
+from utils.oidc_cache import OIDCProviderCache
 
 load_dotenv()
 
+# Point these at a stand-in provider (URL or local files) to run the flow without Google
+GOOGLE_METADATA_URL = os.getenv(
+    'GOOGLE_OIDC_METADATA_URL', 'https://accounts.google.com/.well-known/openid-configuration'
+)
+
+google_metadata = OIDCProviderCache(
+    GOOGLE_METADATA_URL,
+    metadata_file=os.getenv('GOOGLE_OIDC_METADATA_FILE') or None,
+    jwks_file=os.getenv('GOOGLE_OIDC_JWKS_FILE') or None
+)
+
+
+class CachedKeysOAuth2App(StarletteOAuth2App):
+    """Authlib client whose JWKS refetch on an unknown signing key goes through the cache"""
+
+    async def fetch_jwk_set(self, force=False):
+        if not force:
+            return await super().fetch_jwk_set()
+        jwks = await google_metadata.refresh_keys()
+        self.server_metadata['jwks'] = jwks
+        return jwks
+
+
 # Initialize OAuth registry
 oauth = OAuth()
 
@@ -16,14 +42,27 @@ oauth.register(
     name='google',
     client_id=os.getenv('GOOGLE_CLIENT_ID'),
     client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+    server_metadata_url=GOOGLE_METADATA_URL,
+    client_cls=CachedKeysOAuth2App,
     client_kwargs={
         'scope': 'openid email profile'
     }
 )
 
+
+async def load_google_metadata():
+    """Load Google's metadata and JWKS into the cache and hand them to the Authlib client"""
+    await google_metadata.load()
+    oauth.google.server_metadata.update(google_metadata.server_metadata())
+
+
 def get_google_oauth():
     """
     Returns the configured Google OAuth client
+    Installs the newest cached metadata and starts a background refresh once it expires
     """
-    return oauth.google
+    google = oauth.google
+    if google_metadata.ready:
+        google.server_metadata.update(google_metadata.server_metadata())
+    google_metadata.refresh_if_stale()
+    return google
@@ -1,12 +1,16 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from routers.Products import router as ProductRouter
+from routers.Products import router as ProductRouter, load_product_catalog
 from routers.Cart import router as CartRouter
 from routers.Orders import router as OrderRouter
 from routers.Users import router as UserRouter
-from routers.Auth import router as AuthRouter
+from routers.Auth import router as AuthRouter, prefetch_google_metadata
+from routers.Metrics import router as MetricsRouter
+from config.db import get_async_supabase
+from utils.static_files import UploadFiles
 from pathlib import Path
+import asyncio
 import os
 from dotenv import load_dotenv
 import logging
@@ -19,22 +23,28 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
-
-# Log startup info
-@app.on_event("startup")
-async def startup_event():
+# Startup work runs in the app lifespan (on_event hooks are deprecated)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     logger.info("Application starting up...")
     logger.info(f"SUPABASE configured: {bool(os.getenv('SUPABASE_URL'))}")
     logger.info(f"CORS_ORIGINS: {os.getenv('CORS_ORIGINS', '*')}")
     logger.info(f"FRONTEND_URL: {os.getenv('FRONTEND_URL', 'NOT SET')}")  # Add this line
     logger.info(f"GOOGLE_REDIRECT_URI: {os.getenv('GOOGLE_REDIRECT_URI', 'NOT SET')}")  # Add this line
     logger.info(f"ENVIRONMENT: {os.getenv('ENVIRONMENT', 'development')}")  # Add this line
+    # Create the shared async Supabase client up front instead of on the first request
+    await get_async_supabase()
+    # Warm the product catalog snapshot and Google's OIDC metadata before the first requests
+    await asyncio.gather(load_product_catalog(), prefetch_google_metadata())
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files for uploaded images
+# Content-hash names are cached for a year (immutable); ranges and 304s are supported
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "public/uploads"))
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+app.mount("/uploads", UploadFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 # Get CORS origins from environment
 cors_origins = os.getenv("CORS_ORIGINS", "*").split(",")
@@ -52,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache", "ETag", "Last-Modified"],
 )
 
 # Root endpoint
@@ -74,3 +85,4 @@ app.include_router(CartRouter, prefix="/cart", tags=["Cart"])
 app.include_router(OrderRouter, prefix="/orders", tags=["Orders"])
 app.include_router(UserRouter, prefix="", tags=["Users"])
 app.include_router(AuthRouter, prefix="/auth", tags=["OAuth"])
+app.include_router(MetricsRouter, prefix="/metrics", tags=["Metrics"])
@@ -0,0 +1,63 @@
+"""
+Cart repository
+Async data access for the cart table
+"""
+from typing import Optional
+from config.db import get_async_supabase
+
+
+async def _table():
+    client = await get_async_supabase()
+    return client.table("cart")
+
+
+async def list_items(user_id: str) -> list:
+    """Fetch every cart row belonging to a user"""
+    result = await (await _table()).select("*").eq("user_id", user_id).execute()
+    return result.data or []
+
+
+async def get_item(cart_item_id: int) -> Optional[dict]:
+    """Fetch a single cart row by id, None if it does not exist"""
+    result = await (await _table()).select("*").eq("id", cart_item_id).limit(1).execute()
+    return result.data[0] if result.data else None
+
+
+async def add_item(values: dict) -> dict:
+    """
+    Insert a cart row or increment the existing one for the same user/product, atomically
+
+    Returns {"cart_item_id", "quantity", "inserted"} for the resulting row.
+    """
+    client = await get_async_supabase()
+    result = await client.rpc("cart_add_item", {
+        "p_user_id": values["user_id"],
+        "p_product_id": values["product_id"],
+        "p_product_name": values.get("product_name"),
+        "p_product_price": values.get("product_price"),
+        "p_product_category": values.get("product_category"),
+        "p_product_image": values.get("product_image"),
+        "p_quantity": values.get("quantity", 1)
+    }).execute()
+    return result.data[0] if result.data else {}
+
+
+async def apply_operations(user_id: str, operations: list) -> list:
+    """Apply add/update/remove operations to a user's cart in one transaction, return the resulting rows"""
+    client = await get_async_supabase()
+    result = await client.rpc("cart_apply", {"p_user_id": user_id, "p_ops": operations}).execute()
+    return result.data or []
+
+
+async def update_item(cart_item_id: int, values: dict) -> None:
+    await (await _table()).update(values).eq("id", cart_item_id).execute()
+
+
+async def delete_item(cart_item_id: int) -> None:
+    await (await _table()).delete().eq("id", cart_item_id).execute()
+
+
+async def clear_items(user_id: str) -> list:
+    """Delete every cart row for a user and return the deleted rows"""
+    result = await (await _table()).delete().eq("user_id", user_id).execute()
+    return result.data or []
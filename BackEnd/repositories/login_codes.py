@@ -0,0 +1,37 @@
+"""
+Login codes repository
+Async data access for the login_codes table (code hashes only, never raw codes)
+"""
+from datetime import datetime, timezone
+from typing import Optional
+from config.db import get_async_supabase
+
+
+async def _table():
+    client = await get_async_supabase()
+    return client.table("login_codes")
+
+
+async def insert_code(code_hash: str, user_id: int, oauth_provider: Optional[str], expires_at: datetime) -> None:
+    """Store a new code, dropping codes that expired unredeemed"""
+    table = await _table()
+    await table.delete().lt("expires_at", datetime.now(timezone.utc).isoformat()).execute()
+    await table.insert({
+        "code_hash": code_hash,
+        "user_id": user_id,
+        "oauth_provider": oauth_provider,
+        "expires_at": expires_at.isoformat()
+    }).execute()
+
+
+async def take_code(code_hash: str) -> Optional[dict]:
+    """
+    Delete an unexpired code and return its row ({"user_id", "oauth_provider", ...})
+
+    The delete is the redemption, so of two concurrent requests with the same
+    code (on any worker) only one gets the row. None if unknown, used or expired.
+    """
+    result = await (await _table()).delete().eq("code_hash", code_hash).gt(
+        "expires_at", datetime.now(timezone.utc).isoformat()
+    ).execute()
+    return result.data[0] if result.data else None
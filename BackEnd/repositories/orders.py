@@ -0,0 +1,58 @@
+"""
+Orders repository
+Async data access for the orders table
+"""
+from typing import Optional
+from config.db import get_async_supabase
+
+
+async def _table():
+    client = await get_async_supabase()
+    return client.table("orders")
+
+
+async def list_orders(customer_email: Optional[str] = None, status: Optional[str] = None, columns: str = "*") -> list:
+    """Fetch orders newest first, optionally filtered by customer and status"""
+    query = (await _table()).select(columns).order("order_date", desc=True)
+
+    if customer_email:
+        query = query.eq("customer_email", customer_email)
+    if status:
+        query = query.eq("status", status)
+
+    result = await query.execute()
+    return result.data or []
+
+
+async def get_order(order_id: str, columns: str = "*") -> Optional[dict]:
+    """Fetch a single order by its public order_id, None if it does not exist"""
+    result = await (await _table()).select(columns).eq("order_id", order_id).limit(1).execute()
+    return result.data[0] if result.data else None
+
+
+async def insert_order(values: dict) -> dict:
+    result = await (await _table()).insert(values).execute()
+    return result.data[0] if result.data else {}
+
+
+async def update_order(order_id: str, values: dict) -> None:
+    await (await _table()).update(values).eq("order_id", order_id).execute()
+
+
+async def delete_order(order_id: str) -> None:
+    await (await _table()).delete().eq("order_id", order_id).execute()
+
+
+async def checkout(user_id: str, order: dict, idempotency_key: str) -> dict:
+    """
+    Place an order from a user's cart with the checkout RPC (one transaction)
+
+    Returns the function's result: {"status": ..., "order": ..., "items": ...}
+    """
+    client = await get_async_supabase()
+    result = await client.rpc("checkout", {
+        "p_user_id": user_id,
+        "p_order": order,
+        "p_idempotency_key": idempotency_key
+    }).execute()
+    return result.data[0]["result"] if result.data else {}
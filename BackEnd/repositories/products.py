@@ -0,0 +1,153 @@
+"""
+Products repository
+Async data access for the products table
+"""
+from typing import Optional
+from config.db import get_async_supabase
+
+# Columns listings can be ordered (and keyset-paginated) by; id is always the tie-breaker
+SORTABLE_COLUMNS = ("id", "Price")
+
+
+async def _table():
+    client = await get_async_supabase()
+    return client.table("products")
+
+
+def _apply_filters(query, category, min_price, max_price, search, in_stock, ids=None):
+    if ids is not None:
+        query = query.in_("id", ids)
+    if category:
+        query = query.eq("Category", category)
+    if min_price is not None:
+        query = query.gte("Price", min_price)
+    if max_price is not None:
+        query = query.lte("Price", max_price)
+    if search:
+        query = query.ilike("name", f"%{search}%")
+    if in_stock is True:
+        query = query.gt("Quantity", 0)
+    elif in_stock is False:
+        query = query.eq("Quantity", 0)
+    return query
+
+
+def _apply_order(query, sort: str, descending: bool):
+    """
+    Order by `sort` then id, NULLs last in both directions (like the catalog snapshot
+    and utils.pagination.sort_tuple). Postgres puts NULLs first when descending, and
+    order() can only add nullsfirst, so the descending term is spelled out.
+    """
+    if sort != "id":
+        query = query.order(f"{sort}.desc.nullslast" if descending else sort)
+    return query.order("id", desc=descending)
+
+
+def _keyset_filter(sort: str, descending: bool, after: tuple) -> str:
+    """
+    PostgREST `or` filter selecting rows strictly after (sort_value, id) in
+    the _apply_order() order
+    """
+    sort_value, last_id = after
+    # These are interpolated into the filter; decode_cursor() already validated them
+    if type(last_id) is not int or not (sort_value is None or type(sort_value) in (int, float)):
+        raise ValueError("Keyset position must be a numeric sort value and an integer id")
+    op = "lt" if descending else "gt"
+    if sort == "id":
+        return f"id.{op}.{last_id}"
+
+    if sort_value is None:
+        return f"and({sort}.is.null,id.{op}.{last_id})"
+    return ",".join([
+        f"{sort}.{op}.{sort_value}",
+        f"and({sort}.eq.{sort_value},id.{op}.{last_id})",
+        f"{sort}.is.null"
+    ])
+
+
+async def list_products(
+    category: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    search: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    sort: str = "id",
+    descending: bool = False,
+    after: Optional[tuple] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    columns: str = "*",
+    ids: Optional[list] = None
+) -> list:
+    """
+    Fetch products matching the given filters
+
+    Ordered by `sort` then id. Pass `after` (sort value, id of the last row
+    seen) for keyset pagination, or `offset` for offset pagination.
+    `ids` restricts the result to those product ids.
+    """
+    query = _apply_filters((await _table()).select(columns), category, min_price, max_price, search, in_stock, ids)
+
+    if after is not None:
+        query = query.or_(_keyset_filter(sort, descending, after))
+
+    query = _apply_order(query, sort, descending)
+
+    if limit is not None:
+        query = query.range(offset, offset + limit - 1)
+
+    result = await query.execute()
+    return result.data or []
+
+
+async def count_products(
+    category: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    search: Optional[str] = None,
+    in_stock: Optional[bool] = None
+) -> int:
+    """Count products matching the given filters"""
+    query = _apply_filters((await _table()).select("id", count="exact"), category, min_price, max_price, search, in_stock)
+    result = await query.limit(1).execute()
+    return result.count or 0
+
+
+async def get_product(product_id: int, columns: str = "*") -> Optional[dict]:
+    """Fetch a single product by id, None if it does not exist"""
+    result = await (await _table()).select(columns).eq("id", product_id).limit(1).execute()
+    return result.data[0] if result.data else None
+
+
+async def insert_product(values: dict) -> dict:
+    """Insert a product and return the stored row"""
+    result = await (await _table()).insert(values).execute()
+    return result.data[0] if result.data else {}
+
+
+async def update_product(product_id: int, values: dict) -> Optional[dict]:
+    """Update a product and return the stored row, None if nothing matched"""
+    result = await (await _table()).update(values).eq("id", product_id).execute()
+    return result.data[0] if result.data else None
+
+
+async def replace_image(old_url: str, new_url: str) -> list:
+    """Point every product whose image is `old_url` at `new_url`, return the updated rows"""
+    result = await (await _table()).update({"Image": new_url}).eq("Image", old_url).execute()
+    return result.data or []
+
+
+async def delete_product(product_id: int) -> None:
+    await (await _table()).delete().eq("id", product_id).execute()
+
+
+async def reserve_stock(items: list) -> list:
+    """
+    Atomically decrement stock for [{"product_id", "quantity"}, ...] via the reserve_stock RPC
+
+    All-or-nothing: returns one row per product with product_id, requested,
+    available, remaining, category and reserved (false everywhere if any line was short).
+    """
+    client = await get_async_supabase()
+    result = await client.rpc("reserve_stock", {"items": items}).execute()
+    return result.data or []
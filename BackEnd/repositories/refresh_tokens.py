@@ -0,0 +1,51 @@
+"""
+Refresh tokens repository
+Async data access for the refresh_tokens table (token hashes only, never raw tokens)
+"""
+from datetime import datetime, timezone
+from typing import Optional
+from config.db import get_async_supabase
+
+
+async def _table():
+    client = await get_async_supabase()
+    return client.table("refresh_tokens")
+
+
+async def insert_token(
+    user_id: int,
+    token_hash: str,
+    family_id: str,
+    expires_at: datetime,
+    oauth_provider: Optional[str] = None
+) -> None:
+    await (await _table()).insert({
+        "user_id": user_id,
+        "token_hash": token_hash,
+        "family_id": family_id,
+        "oauth_provider": oauth_provider,
+        "expires_at": expires_at.isoformat()
+    }).execute()
+
+
+async def rotate(token_hash: str, new_hash: str, expires_at: datetime) -> dict:
+    """
+    Redeem a token and store its successor atomically
+
+    Returns {"status", "user_id", "email", "name", "role", "oauth_provider"}; status is ok, invalid,
+    expired, inactive or reused (see rotate_refresh_token in supabase_schema.sql).
+    """
+    client = await get_async_supabase()
+    result = await client.rpc("rotate_refresh_token", {
+        "p_token_hash": token_hash,
+        "p_new_hash": new_hash,
+        "p_expires_at": expires_at.isoformat()
+    }).execute()
+    return result.data[0] if result.data else {"status": "invalid"}
+
+
+async def revoke(token_hash: str) -> None:
+    """Revoke one token (sign-out); unknown or already revoked tokens are ignored"""
+    await (await _table()).update({"revoked_at": datetime.now(timezone.utc).isoformat()}).eq(
+        "token_hash", token_hash
+    ).is_("revoked_at", "null").execute()
@@ -0,0 +1,45 @@
+"""
+Users repository
+Async data access for the users table
+"""
+from typing import Optional
+from config.db import get_async_supabase
+from utils.fields import USER_FIELDS
+
+# Columns that are safe to return from the API (never the password hash)
+PUBLIC_COLUMNS = ", ".join(USER_FIELDS)
+
+
+async def _table():
+    client = await get_async_supabase()
+    return client.table("users")
+
+
+async def list_users(columns: str = PUBLIC_COLUMNS) -> list:
+    result = await (await _table()).select(columns).execute()
+    return result.data or []
+
+
+async def get_user(user_id: int, columns: str = PUBLIC_COLUMNS) -> Optional[dict]:
+    """Fetch a single user by id, None if it does not exist"""
+    result = await (await _table()).select(columns).eq("id", user_id).limit(1).execute()
+    return result.data[0] if result.data else None
+
+
+async def get_user_by_email(email: str, columns: str = "*") -> Optional[dict]:
+    """Fetch a single user by email, None if it does not exist"""
+    result = await (await _table()).select(columns).eq("email", email).limit(1).execute()
+    return result.data[0] if result.data else None
+
+
+async def insert_user(values: dict) -> dict:
+    result = await (await _table()).insert(values).execute()
+    return result.data[0] if result.data else {}
+
+
+async def update_user(user_id: int, values: dict) -> None:
+    await (await _table()).update(values).eq("id", user_id).execute()
+
+
+async def delete_user(user_id: int) -> None:
+    await (await _table()).delete().eq("id", user_id).execute()
@@ -4,12 +4,12 @@ Handles Google OAuth 2.0 login flow
 """
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from config.db import supabase
-from config.google_oauth_config import get_google_oauth
-from utils.jwt_utils import create_access_token
+from repositories import users as users_repo
+from config.google_oauth_config import get_google_oauth, load_google_metadata
+from utils.sessions import start_session, refresh_session, end_session, issue_login_code, redeem_login_code
+from Schemas.Users import LoginCodeRequest, RefreshRequest
 import os
 from datetime import datetime, timezone
-import json
 from urllib.parse import quote
 
 router = APIRouter()
@@ -23,6 +23,15 @@ print(f"   FRONTEND_URL: {FRONTEND_URL}")
 print(f"   GOOGLE_REDIRECT_URI: {GOOGLE_REDIRECT_URI}")
 
 
+async def prefetch_google_metadata():
+    """Fetch Google's OpenID metadata and signing keys before the first sign-in needs them (run at app startup)"""
+    try:
+        await load_google_metadata()
+    except Exception as e:
+        # Authlib falls back to fetching them lazily; get_google_oauth retries in the background
+        print(f"Google OIDC metadata prefetch failed: {str(e)}")
+
+
 @router.get("/google/login")
 async def google_login(request: Request):
     """
@@ -46,7 +55,7 @@ async def google_callback(request: Request):
     Exchanges authorization code for access token
     Fetches user info from Google
     Creates/finds user in database
-    Redirects to frontend with JWT token
+    Redirects to frontend with a one-time code it exchanges at /auth/exchange
     """
     try:
         # Check if user denied access
@@ -89,26 +98,24 @@ async def google_callback(request: Request):
             raise HTTPException(status_code=400, detail="Email not provided by Google")
         
         # Check if user exists
-        existing_user = supabase.table("users").select("*").eq("email", email).execute()
+        user = await users_repo.get_user_by_email(email)
         
         now = datetime.now(timezone.utc).isoformat()
         
-        if existing_user.data:
+        if user:
             # User exists - update Google ID if not set
-            user = existing_user.data[0]
-            
             if not user.get('google_id'):
-                supabase.table("users").update({
+                await users_repo.update_user(user['id'], {
                     "google_id": google_id,
                     "profile_picture": picture,
                     "updated_at": now
-                }).eq("id", user['id']).execute()
+                })
                 print(f"Updated existing user {user['id']} with Google ID")
             
             user_data = user
         else:
             # Create new user with Google OAuth
-            result = supabase.table("users").insert({
+            user_data = await users_repo.insert_user({
                 "email": email,
                 "name": name,
                 "google_id": google_id,
@@ -118,40 +125,14 @@ async def google_callback(request: Request):
                 "is_active": True,
                 "created_at": now,
                 "updated_at": now
-            }).execute()
-            
-            user_data = result.data[0] if result.data else {}
+            })
             print(f"Created new OAuth user: {user_data.get('id')}")
         
-        # Generate JWT token with user claims
-        token = create_access_token(
-            data={
-                "sub": user_data.get("email"),
-                "user_id": user_data.get("id"),
-                "role": user_data.get("role"),
-                "name": user_data.get("name"),
-                "oauth_provider": "google"
-            }
-        )
-        
-        # Prepare user response
-        user_response = {
-            "id": user_data.get("id"),
-            "email": user_data.get("email"),
-            "name": user_data.get("name"),
-            "phone": user_data.get("phone"),
-            "role": user_data.get("role"),
-            "profile_picture": user_data.get("profile_picture")
-        }
-        
-        # URL encode the user data
-        user_json = json.dumps(user_response)
-        user_encoded = quote(user_json)
-        
-        # Redirect to frontend with JWT token
-        frontend_redirect = f"{FRONTEND_URL}/auth/callback?token={token}&user={user_encoded}"
+        # Tokens stay out of the URL; the frontend redeems the code by POST for the session
+        code = await issue_login_code(user_data["id"], oauth_provider="google")
+        frontend_redirect = f"{FRONTEND_URL}/auth/callback?code={quote(code)}"
         
-        print(f"✅ OAuth successful - Redirecting to: {frontend_redirect}")
+        print(f"✅ OAuth successful - Redirecting user {user_data.get('id')} to frontend")
         print(f"FRONTEND_URL from env: {FRONTEND_URL}")
         return RedirectResponse(url=frontend_redirect)
         
@@ -165,6 +146,67 @@ async def google_callback(request: Request):
         return RedirectResponse(url=error_redirect)
 
 
+@router.post("/exchange")
+async def exchange_login_code(data: LoginCodeRequest):
+    """
+    Redeem the one-time code from the Google callback redirect
+    Returns the session tokens and user; the code works once, within LOGIN_CODE_TTL_SECONDS.
+    """
+    try:
+        login = await redeem_login_code(data.code)
+        user = await users_repo.get_user(login["user_id"])
+        if not user:
+            raise HTTPException(status_code=401, detail="Login code is invalid or expired, please sign in again")
+        if not user.get("is_active", True):
+            raise HTTPException(status_code=403, detail="Account is deactivated")
+        
+        # Generate JWT token with user claims, plus a refresh token for /auth/refresh
+        session = await start_session(user, oauth_provider=login["oauth_provider"])
+        
+        # Prepare user response
+        user_response = {
+            "id": user.get("id"),
+            "email": user.get("email"),
+            "name": user.get("name"),
+            "phone": user.get("phone"),
+            "role": user.get("role"),
+            "profile_picture": user.get("profile_picture")
+        }
+        return {**session, "user": user_response}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error completing sign-in: {str(e)}")
+
+
+@router.post("/refresh")
+async def refresh(data: RefreshRequest):
+    """
+    Exchange a refresh token for a new access token
+    The refresh token is single-use: the response carries its replacement.
+    Presenting an already-used token revokes the whole session (401).
+    """
+    try:
+        return await refresh_session(data.refresh_token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refreshing session: {str(e)}")
+
+
+@router.post("/logout")
+async def logout(data: RefreshRequest):
+    """
+    Revoke a refresh token
+    The current access token stays valid until it expires (at most JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+    """
+    try:
+        await end_session(data.refresh_token)
+        return {"message": "Logged out successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error logging out: {str(e)}")
+
+
 @router.get("/google/logout")
 async def google_logout():
     """
@@ -1,15 +1,33 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import Optional
-from config.db import supabase
-from Schemas.Cart import CartItem, CartItemUpdate
+from repositories import cart as cart_repo
+from Schemas.Cart import CartItem, CartItemUpdate, CartBatch
 from datetime import datetime, timezone
 from utils.auth_dependency import get_current_user
+from utils import cart_cache
 
 router = APIRouter()
 
 
+async def _owned_item(cart_item_id: int, user_email: str) -> dict:
+    """The cart row if it belongs to the user; 404 if it doesn't exist, 403 if it's someone else's"""
+    item = await cart_cache.find_item(user_email, cart_item_id)
+    if item is not None:
+        return item
+
+    # Not in the caller's cached cart - check Supabase to tell missing from not-yours
+    existing = await cart_repo.get_item(cart_item_id)
+    if not existing:
+        raise HTTPException(status_code=404, detail=f"Cart item {cart_item_id} not found")
+    if str(existing["user_id"]) != str(user_email):
+        raise HTTPException(status_code=403, detail="Access denied")
+    # The cached cart was out of date (written elsewhere); reload it next time
+    cart_cache.invalidate(user_email)
+    return existing
+
+
 @router.get("/")
-def get_cart_items(
+async def get_cart_items(
     user_id: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
@@ -24,9 +42,8 @@ def get_cart_items(
         # If no user_id provided, use current user's email
         target_user_id = user_id or user_email
         
-        query = supabase.table("cart").select("*").eq("user_id", target_user_id)
-        result = query.execute()
-        return result.data or []
+        # Lines are repriced and stock-checked against the current catalog
+        return (await cart_cache.repriced_cart(target_user_id))["items"]
     except HTTPException:
         raise
     except Exception as e:
@@ -34,20 +51,13 @@ def get_cart_items(
 
 
 @router.get("/{cart_item_id}")
-def get_cart_item(cart_item_id: int, current_user: dict = Depends(get_current_user)):
+async def get_cart_item(cart_item_id: int, current_user: dict = Depends(get_current_user)):
     try:
-        result = supabase.table("cart").select("*").eq("id", cart_item_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail=f"Cart item {cart_item_id} not found")
-        
         # Get user's email from JWT token
         user_email = current_user.get("sub")
         
         # Verify the cart item belongs to the current user
-        if str(result.data["user_id"]) != str(user_email):
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        return result.data
+        return await _owned_item(cart_item_id, user_email)
     except HTTPException:
         raise
     except Exception as e:
@@ -64,73 +74,83 @@ async def add_to_cart(data: CartItem, current_user: dict = Depends(get_current_u
         if str(data.user_id) != str(user_email):
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Check if item already exists for this user
-        existing = supabase.table("cart").select("*") \
-            .eq("user_id", data.user_id) \
-            .eq("product_id", data.product_id) \
-            .execute()
+        # Insert or increment in one atomic statement (unique on user_id + product_id)
+        values = {
+            "user_id": data.user_id,
+            "product_id": data.product_id,
+            "product_name": data.product_name,
+            "product_price": data.product_price,
+            "product_category": data.product_category,
+            "product_image": data.product_image,
+            "quantity": data.quantity
+        }
+        with cart_cache.writing(data.user_id):
+            item = await cart_repo.add_item(values)
+            cart_cache.item_added(data.user_id, values, item.get("cart_item_id"), item.get("quantity"), bool(item.get("inserted")))
 
-        now = datetime.now(timezone.utc).isoformat()
+        return {
+            "message": "Item added to cart" if item.get("inserted") else "Cart item quantity updated",
+            "cart_item_id": item.get("cart_item_id"),
+            "quantity": item.get("quantity"),
+            "action": "added" if item.get("inserted") else "updated"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error adding to cart: {str(e)}")
 
-        if existing.data:
-            item = existing.data[0]
-            new_quantity = item["quantity"] + data.quantity
-            supabase.table("cart").update({
-                "quantity": new_quantity,
-                "updated_at": now
-            }).eq("id", item["id"]).execute()
-
-            return {
-                "message": "Cart item quantity updated",
-                "cart_item_id": item["id"],
-                "quantity": new_quantity,
-                "action": "updated"
-            }
-        else:
-            result = supabase.table("cart").insert({
-                "user_id": data.user_id,
-                "product_id": data.product_id,
-                "product_name": data.product_name,
-                "product_price": data.product_price,
-                "product_category": data.product_category,
-                "product_image": data.product_image,
-                "quantity": data.quantity,
-                "created_at": now,
-                "updated_at": now
-            }).execute()
 
-            inserted = result.data[0] if result.data else {}
-            return {
-                "message": "Item added to cart",
-                "cart_item_id": inserted.get("id"),
-                "quantity": data.quantity,
-                "action": "added"
-            }
+@router.post("/batch")
+async def apply_cart_batch(data: CartBatch, current_user: dict = Depends(get_current_user)):
+    """
+    Apply many cart operations in one request (e.g. merging a guest cart at login)
+
+    Operations are applied in order, in one transaction, keyed by product_id:
+    - add: insert or increment by `quantity` (default 1)
+    - update: set the quantity
+    - remove: delete the product from the cart
+    Returns the resulting cart.
+    """
+    try:
+        user_email = current_user.get("sub")
+
+        # Users can only modify their own cart
+        if str(data.user_id) != str(user_email):
+            raise HTTPException(status_code=403, detail="Access denied")
+
+        for operation in data.operations:
+            if operation.op == "update" and operation.quantity is None:
+                raise HTTPException(status_code=400, detail=f"update of product {operation.product_id} needs a quantity")
+
+        with cart_cache.writing(data.user_id):
+            items = await cart_repo.apply_operations(
+                data.user_id,
+                [operation.model_dump(exclude_none=True) for operation in data.operations]
+            )
+            cart_cache.store(data.user_id, items)
+        return {"message": "Cart updated", "operations": len(data.operations), "items": items}
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error adding to cart: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error updating cart: {str(e)}")
 
 
 @router.put("/{cart_item_id}")
 async def update_cart_item(cart_item_id: int, data: CartItemUpdate, current_user: dict = Depends(get_current_user)):
     try:
-        existing = supabase.table("cart").select("*").eq("id", cart_item_id).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail=f"Cart item {cart_item_id} not found")
-        
         # Get user's email from JWT token
         user_email = current_user.get("sub")
         
         # Verify the cart item belongs to the current user
-        if str(existing.data[0]["user_id"]) != str(user_email):
-            raise HTTPException(status_code=403, detail="Access denied")
+        await _owned_item(cart_item_id, user_email)
 
         now = datetime.now(timezone.utc).isoformat()
-        supabase.table("cart").update({
-            "quantity": data.quantity,
-            "updated_at": now
-        }).eq("id", cart_item_id).execute()
+        with cart_cache.writing(user_email):
+            await cart_repo.update_item(cart_item_id, {
+                "quantity": data.quantity,
+                "updated_at": now
+            })
+            cart_cache.item_updated(user_email, cart_item_id, data.quantity)
 
         return {"message": "Cart item updated", "cart_item_id": cart_item_id, "quantity": data.quantity}
     except HTTPException:
@@ -142,18 +162,15 @@ async def update_cart_item(cart_item_id: int, data: CartItemUpdate, current_user
 @router.delete("/{cart_item_id}")
 async def delete_cart_item(cart_item_id: int, current_user: dict = Depends(get_current_user)):
     try:
-        existing = supabase.table("cart").select("*").eq("id", cart_item_id).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail=f"Cart item {cart_item_id} not found")
-        
         # Get user's email from JWT token
         user_email = current_user.get("sub")
         
         # Verify the cart item belongs to the current user
-        if str(existing.data[0]["user_id"]) != str(user_email):
-            raise HTTPException(status_code=403, detail="Access denied")
+        await _owned_item(cart_item_id, user_email)
 
-        supabase.table("cart").delete().eq("id", cart_item_id).execute()
+        with cart_cache.writing(user_email):
+            await cart_repo.delete_item(cart_item_id)
+            cart_cache.item_removed(user_email, cart_item_id)
         return {"message": "Cart item deleted", "cart_item_id": cart_item_id}
     except HTTPException:
         raise
@@ -171,8 +188,10 @@ async def clear_user_cart(user_id: str, current_user: dict = Depends(get_current
         if str(user_id) != str(user_email):
             raise HTTPException(status_code=403, detail="Access denied")
         
-        result = supabase.table("cart").delete().eq("user_id", user_id).execute()
-        return {"message": f"Cart cleared for user {user_id}", "items_deleted": len(result.data or [])}
+        with cart_cache.writing(user_id):
+            deleted = await cart_repo.clear_items(user_id)
+            cart_cache.cleared(user_id)
+        return {"message": f"Cart cleared for user {user_id}", "items_deleted": len(deleted)}
     except HTTPException:
         raise
     except Exception as e:
@@ -180,7 +199,7 @@ async def clear_user_cart(user_id: str, current_user: dict = Depends(get_current
 
 
 @router.get("/user/{user_id}/summary")
-def get_cart_summary(user_id: str, current_user: dict = Depends(get_current_user)):
+async def get_cart_summary(user_id: str, current_user: dict = Depends(get_current_user)):
     try:
         # Get user's email from JWT token
         user_email = current_user.get("sub")
@@ -189,18 +208,16 @@ def get_cart_summary(user_id: str, current_user: dict = Depends(get_current_user
         if str(user_id) != str(user_email):
             raise HTTPException(status_code=403, detail="Access denied")
         
-        result = supabase.table("cart").select("*").eq("user_id", user_id).execute()
-        items = result.data or []
-
-        total_items = sum(i["quantity"] for i in items)
-        total_price = sum(i["product_price"] * i["quantity"] for i in items)
-
+        # Totals use current product prices; changed lines are flagged
+        cart = await cart_cache.repriced_cart(user_id)
         return {
             "user_id": user_id,
-            "total_items": total_items,
-            "total_price": total_price,
-            "items_count": len(items),
-            "items": items
+            "total_items": cart["total_items"],
+            "total_price": cart["total_price"],
+            "items_count": cart["items_count"],
+            "price_changes": cart["price_changes"],
+            "stock_issues": cart["stock_issues"],
+            "items": cart["items"]
         }
     except HTTPException:
         raise
@@ -0,0 +1,33 @@
+"""
+Metrics Router
+Exposes in-process counters (cache hit rates etc.) to admins
+"""
+from fastapi import APIRouter, Depends
+import asyncio
+from utils.cache import cache
+from utils.jwt_utils import token_cache
+from utils.passwords import password_pool
+from config.google_oauth_config import google_metadata
+from utils.cdn_queue import cdn_queue
+from utils.image_variants import variant_generator
+from utils.upload_index import upload_index
+from utils.auth_dependency import get_current_admin
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_metrics(current_user: dict = Depends(get_current_admin)):
+    """
+    Get in-process metrics for this worker (Admin only)
+    """
+    return {
+        "cache": cache.stats(),
+        "token_cache": token_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "google_oidc": google_metadata.stats(),
+        "cdn_uploads": cdn_queue.stats(),
+        "image_variants": variant_generator.stats(),
+        # Synchronous SQLite count; keep it off the event loop
+        "upload_index": await asyncio.to_thread(upload_index.stats)
+    }
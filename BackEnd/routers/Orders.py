@@ -1,39 +1,70 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Header, Request, Response
+from fastapi.responses import JSONResponse
+from postgrest.exceptions import APIError
 from typing import Optional
-from config.db import supabase
-from Schemas.Orders import OrderCreate, OrderUpdate
+from repositories import orders as orders_repo
+from Schemas.Orders import OrderCreate, OrderUpdate, CheckoutRequest
 from datetime import datetime, timezone
 from utils.auth_dependency import get_current_user, get_current_admin
+from utils.fields import select_columns, ORDER_FIELDS
+from utils.http_cache import versions, conditional_get, PRIVATE_REVALIDATE
+from utils.catalog import apply_stock_reservation, stock_shortage
+from utils import cart_cache
+import secrets
+import time
 
 router = APIRouter()
 
+# Postgres error code for a unique constraint violation
+UNIQUE_VIOLATION = "23505"
+
+# Version resource covering every order (admin listings)
+ALL_ORDERS = "orders:*"
+
+
+def _customer_orders(email: str) -> str:
+    """Version resource for one customer's orders"""
+    return f"orders:{email}"
+
+
+def _order_changed(order_id: str, customer_email: Optional[str]):
+    versions.bump(ALL_ORDERS, _customer_orders(customer_email), f"order:{order_id}")
+
 
 @router.get("/")
-def get_my_orders(
+async def get_my_orders(
+    request: Request,
+    response: Response,
     status: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get orders for the current authenticated user
     Regular users see only their own orders
+    Use `fields` to skip heavy columns such as order_items in list views
     """
     try:
         user_email = current_user.get("sub")
-        query = supabase.table("orders").select("*").eq("customer_email", user_email).order("order_date", desc=True)
-
-        if status:
-            query = query.eq("status", status)
+        not_modified = conditional_get(request, response, _customer_orders(user_email), cache_control=PRIVATE_REVALIDATE)
+        if not_modified is not None:
+            return not_modified
 
-        result = query.execute()
-        return result.data or []
+        columns = select_columns(fields, ORDER_FIELDS)
+        return await orders_repo.list_orders(customer_email=user_email, status=status, columns=columns)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching orders: {str(e)}")
 
 
 @router.get("/admin/all")
-def get_all_orders_admin(
+async def get_all_orders_admin(
+    request: Request,
+    response: Response,
     status: Optional[str] = Query(None),
     customer_email: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
     current_user: dict = Depends(get_current_admin)
 ):
     """
@@ -41,25 +72,39 @@ def get_all_orders_admin(
     Can optionally filter by status or customer_email
     """
     try:
-        query = supabase.table("orders").select("*").order("order_date", desc=True)
+        not_modified = conditional_get(request, response, ALL_ORDERS, cache_control=PRIVATE_REVALIDATE)
+        if not_modified is not None:
+            return not_modified
 
-        if customer_email:
-            query = query.eq("customer_email", customer_email)
-
-        if status:
-            query = query.eq("status", status)
-
-        result = query.execute()
-        return result.data or []
+        columns = select_columns(fields, ORDER_FIELDS)
+        return await orders_repo.list_orders(customer_email=customer_email, status=status, columns=columns)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching orders: {str(e)}")
 
 
 @router.get("/{order_id}")
-def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
+async def get_order(
+    request: Request,
+    response: Response,
+    order_id: str,
+    fields: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
     try:
-        result = supabase.table("orders").select("*").eq("order_id", order_id).single().execute()
-        if not result.data:
+        # The validator covers the caller too, so one user's ETag never unlocks another's 304
+        not_modified = conditional_get(
+            request, response, f"order:{order_id}",
+            cache_control=PRIVATE_REVALIDATE,
+            variant=f"{current_user.get('sub')}|{request.url.query}"
+        )
+        if not_modified is not None:
+            return not_modified
+
+        # customer_email is always fetched for the ownership check below
+        order = await orders_repo.get_order(order_id, columns=select_columns(fields, ORDER_FIELDS, required=("customer_email",)))
+        if not order:
             raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
         
         # Get user's email and role from JWT token
@@ -67,10 +112,10 @@ def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
         user_role = current_user.get("role")
         
         # Users can only access their own orders unless they're admin
-        if user_role != "admin" and result.data["customer_email"] != user_email:
+        if user_role != "admin" and order["customer_email"] != user_email:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        return result.data
+        return order
     except HTTPException:
         raise
     except Exception as e:
@@ -87,31 +132,32 @@ async def create_order(data: OrderCreate, current_user: dict = Depends(get_curre
         if data.customer_email != user_email:
             raise HTTPException(status_code=403, detail="Cannot create order for another user")
         
-        # Check if order_id already exists
-        existing = supabase.table("orders").select("id").eq("order_id", data.order_id).execute()
-        if existing.data:
-            raise HTTPException(status_code=400, detail=f"Order {data.order_id} already exists")
-
+        # Duplicate order_ids are rejected by the unique constraint (no pre-check round trip)
         now = datetime.now(timezone.utc).isoformat()
-        result = supabase.table("orders").insert({
-            "order_id": data.order_id,
-            "customer_name": data.customer_name,
-            "customer_email": data.customer_email,
-            "customer_phone": data.customer_phone,
-            "address": data.address,
-            "city": data.city,
-            "state": data.state,
-            "pincode": data.pincode,
-            "country": data.country,
-            "order_items": data.order_items,
-            "total_items": data.total_items,
-            "total_price": data.total_price,
-            "status": data.status,
-            "order_date": now,
-            "updated_at": now
-        }).execute()
-
-        inserted = result.data[0] if result.data else {}
+        try:
+            inserted = await orders_repo.insert_order({
+                "order_id": data.order_id,
+                "customer_name": data.customer_name,
+                "customer_email": data.customer_email,
+                "customer_phone": data.customer_phone,
+                "address": data.address,
+                "city": data.city,
+                "state": data.state,
+                "pincode": data.pincode,
+                "country": data.country,
+                "order_items": data.order_items,
+                "total_items": data.total_items,
+                "total_price": data.total_price,
+                "status": data.status,
+                "order_date": now,
+                "updated_at": now
+            })
+        except APIError as e:
+            if e.code == UNIQUE_VIOLATION:
+                raise HTTPException(status_code=400, detail=f"Order {data.order_id} already exists")
+            raise
+
+        _order_changed(data.order_id, data.customer_email)
         return {"message": "Order created successfully", "order_id": data.order_id, "id": inserted.get("id")}
     except HTTPException:
         raise
@@ -119,12 +165,68 @@ async def create_order(data: OrderCreate, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=500, detail=f"Error creating order: {str(e)}")
 
 
+@router.post("/checkout")
+async def checkout(
+    data: CheckoutRequest,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Place an order from the current user's cart in one request
+
+    Validates the cart, reserves stock, inserts the order and clears the cart
+    in a single database transaction. Items and totals come from the cart
+    priced at current product prices. Send an `Idempotency-Key` header (the
+    order_id is used otherwise): a retry returns the order already placed
+    with `duplicate: true` instead of placing it again.
+    """
+    try:
+        user_email = current_user.get("sub")
+        if data.customer_email != user_email:
+            raise HTTPException(status_code=403, detail="Cannot create order for another user")
+
+        order = data.model_dump()
+        order["order_id"] = data.order_id or f"ORD-{int(time.time() * 1000)}-{secrets.randbelow(10000)}"
+        # The RPC empties the cart, so it counts as a cart write
+        with cart_cache.writing(user_email):
+            result = await orders_repo.checkout(user_email, order, idempotency_key or order["order_id"])
+            if result.get("status") == "created":
+                cart_cache.cleared(user_email)
+
+        status = result.get("status")
+        if status == "empty_cart":
+            raise HTTPException(status_code=400, detail="Cart is empty")
+        if status == "insufficient_stock":
+            return JSONResponse(status_code=400, content=stock_shortage(result["items"]))
+        if status == "conflict":
+            raise HTTPException(status_code=400, detail=f"Order {order['order_id']} already exists")
+        if status not in ("created", "duplicate"):
+            raise HTTPException(status_code=500, detail=f"Unexpected checkout result: {status}")
+
+        placed = result["order"]
+        if status == "created":
+            _order_changed(placed["order_id"], user_email)
+            apply_stock_reservation(result["items"])
+
+        return {
+            "message": "Order placed successfully" if status == "created" else "Order already placed",
+            "order_id": placed["order_id"],
+            "id": placed.get("id"),
+            "duplicate": status == "duplicate",
+            "order": placed
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error placing order: {str(e)}")
+
+
 @router.patch("/{order_id}")
 async def update_order(order_id: str, data: OrderUpdate, current_user: dict = Depends(get_current_admin)):
     try:
         # Only admins can update orders
-        existing = supabase.table("orders").select("id").eq("order_id", order_id).execute()
-        if not existing.data:
+        existing = await orders_repo.get_order(order_id, columns="id, customer_email")
+        if not existing:
             raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
 
         update_data = {}
@@ -139,7 +241,8 @@ async def update_order(order_id: str, data: OrderUpdate, current_user: dict = De
             raise HTTPException(status_code=400, detail="No fields to update")
 
         update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-        supabase.table("orders").update(update_data).eq("order_id", order_id).execute()
+        await orders_repo.update_order(order_id, update_data)
+        _order_changed(order_id, existing.get("customer_email"))
 
         return {"message": "Order updated successfully", "order_id": order_id, "updated_fields": list(update_data.keys())}
     except HTTPException:
@@ -152,11 +255,12 @@ async def update_order(order_id: str, data: OrderUpdate, current_user: dict = De
 async def delete_order(order_id: str, current_user: dict = Depends(get_current_admin)):
     try:
         # Only admins can delete orders
-        existing = supabase.table("orders").select("id").eq("order_id", order_id).execute()
-        if not existing.data:
+        existing = await orders_repo.get_order(order_id, columns="id, customer_email")
+        if not existing:
             raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
 
-        supabase.table("orders").delete().eq("order_id", order_id).execute()
+        await orders_repo.delete_order(order_id)
+        _order_changed(order_id, existing.get("customer_email"))
         return {"message": "Order deleted successfully", "order_id": order_id}
     except HTTPException:
         raise
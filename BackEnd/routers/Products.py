@@ -1,74 +1,354 @@
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.datastructures import UploadFile
 from typing import Optional
-from config.db import supabase
-from Schemas.Products import Product
-from utils.cache import cache
+from repositories import products as products_repo
+from Schemas.Products import Product, StockReservation
+from utils.cache import cache, FRESH, STALE
+from utils.product_cache import (
+    listing_tags, invalidate_product, product_tag, cache_products,
+    PRODUCTS_RESOURCE, PRODUCTS_CACHE_TTL, PRODUCTS_CACHE_MAX_STALE
+)
+from utils.pagination import encode_cursor, decode_cursor, page_metadata, sort_tuple, keyset_slice
+from utils.search_index import search_index
+from utils.catalog import (
+    catalog, load_catalog, refresh_catalog_if_stale, upsert_product, remove_product,
+    apply_stock_reservation, stock_shortage, snapshot_usable, products_by_id
+)
+from utils.fields import select_columns, PRODUCT_FIELDS
+from utils.http_cache import conditional_get
 from utils.auth_dependency import get_current_admin, get_current_user
-import os
-import shutil
+from utils.uploads import save_upload, read_upload_form, ALLOWED_IMAGE_EXTENSIONS, PRODUCT_UPLOAD_DIR
+from utils.cdn_queue import cdn_queue, cloudinary_enabled
+from utils.static_files import asset_response
+from utils.image_variants import (
+    variant_generator, with_srcsets, variant_path, IMAGE_VARIANTS_RESOURCE, MEDIA_TYPES
+)
+import asyncio
+import logging
 from pathlib import Path
-import uuid
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-UPLOAD_DIR = Path("public/uploads/products")
+UPLOAD_DIR = PRODUCT_UPLOAD_DIR
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Most ids GET /products/batch accepts in one call
+MAX_BATCH_IDS = 100
+
+# Seconds a client is told to wait for facets while the catalog snapshot loads
+FACETS_RETRY_AFTER_SECONDS = 5
+
+
+async def load_product_catalog():
+    """Load the catalog snapshot and search index from the products table (run at app startup)"""
+    try:
+        await load_catalog()
+    except Exception as e:
+        # get_products queries Supabase directly until a background reload succeeds
+        logger.warning(f"Catalog snapshot load failed: {e}")
+
 
 @router.get("/")
-def get_products(
+async def get_products(
+    request: Request,
+    response: Response,
+    category: Optional[str] = Query(None),
+    min_price: Optional[int] = Query(None),
+    max_price: Optional[int] = Query(None),
+    search: Optional[str] = Query(None),
+    in_stock: Optional[bool] = Query(None),
+    sort: Optional[str] = Query(None, description="id, Price, or relevance (search only); defaults to relevance when searching, else id"),
+    order: str = Query("asc"),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    page: Optional[int] = Query(None, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(False),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return")
+):
+    """
+    List products
+
+    Without paging parameters the full filtered list is returned (legacy shape).
+    - Keyset: pass `limit` (and `cursor` from the previous page's `next_cursor`)
+    - Offset (admin table): pass `page` / `page_size`
+    `fields` narrows the columns returned (id and the sort column are always included)
+    `search` is ranked, prefix and typo tolerant via the in-process search index
+
+    Served from the in-memory catalog snapshot when it is loaded; otherwise
+    from Supabase through the listing cache.
+    Supports If-None-Match / If-Modified-Since (304 until a product changes).
+    """
+    try:
+        not_modified = conditional_get(request, response, PRODUCTS_RESOURCE, IMAGE_VARIANTS_RESOURCE)
+        if not_modified is not None:
+            return not_modified
+
+        stale = refresh_catalog_if_stale()
+        use_snapshot = snapshot_usable()
+        sort = sort or ("relevance" if search and use_snapshot else "id")
+        if sort not in products_repo.SORTABLE_COLUMNS and not (sort == "relevance" and search and use_snapshot):
+            raise HTTPException(status_code=400, detail=f"Invalid sort. Allowed: {', '.join(products_repo.SORTABLE_COLUMNS)}, relevance (with search)")
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail="Invalid order. Allowed: asc, desc")
+        after = decode_cursor(cursor) if cursor else None
+        required = ("id",) if sort == "relevance" else ("id", sort)
+        columns = select_columns(fields, PRODUCT_FIELDS, required=required)
+
+        filters = {
+            "category": category,
+            "min_price": min_price,
+            "max_price": max_price,
+            "search": search,
+            "in_stock": in_stock
+        }
+        listing = {"sort": sort, "descending": order == "desc", "columns": columns}
+        paging = {
+            "cursor": cursor,
+            "after": after,
+            "limit": limit,
+            "page": page,
+            "page_size": page_size,
+            "include_total": include_total
+        }
+
+        if use_snapshot:
+            response.headers["X-Cache"] = STALE if stale else FRESH
+            return await with_srcsets(_snapshot_listing(filters, listing, paging))
+
+        cache_key = (
+            f"products_{category}_{min_price}_{max_price}_{search}_{in_stock}"
+            f"_{sort}_{order}_{cursor}_{limit}_{page}_{page_size}_{include_total}_{columns}"
+        )
+
+        # Concurrent misses for the same key share a single Supabase query
+        products, freshness = await cache.get_or_load(
+            cache_key,
+            lambda: _db_listing(filters, listing, paging),
+            ttl_seconds=PRODUCTS_CACHE_TTL,
+            tags=listing_tags(category, in_stock),
+            stale_seconds=PRODUCTS_CACHE_MAX_STALE
+        )
+        response.headers["X-Cache"] = freshness
+        return await with_srcsets(products)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching products: {str(e)}")
+
+
+async def _db_listing(filters: dict, listing: dict, paging: dict):
+    """Filter, sort and paginate in Supabase"""
+    if listing["columns"] != "*":
+        return await _db_listing_rows(filters, listing, paging)
+
+    # Full rows also fill the per-id cache used by product detail and batch lookups
+    watch = cache.watch()
+    result = await _db_listing_rows(filters, listing, paging)
+    rows = result["products"] if isinstance(result, dict) else result
+    cache_products(rows, ttl_seconds=PRODUCTS_CACHE_TTL, watch=watch)
+    return result
+
+
+async def _db_listing_rows(filters: dict, listing: dict, paging: dict):
+    sort = listing["sort"]
+
+    if paging["page"] is not None or paging["page_size"] is not None:
+        current_page = paging["page"] or 1
+        size = paging["page_size"] or DEFAULT_PAGE_SIZE
+        products, total = await asyncio.gather(
+            products_repo.list_products(**filters, **listing, limit=size, offset=(current_page - 1) * size),
+            products_repo.count_products(**filters)
+        )
+        return {"products": products, "pagination": page_metadata(current_page, size, total)}
+
+    if paging["cursor"] is not None or paging["limit"] is not None:
+        size = paging["limit"] or DEFAULT_PAGE_SIZE
+        # Fetch one extra row to know whether there is a next page
+        lookups = [products_repo.list_products(**filters, **listing, after=paging["after"], limit=size + 1)]
+        if paging["include_total"]:
+            lookups.append(products_repo.count_products(**filters))
+        rows, *total = await asyncio.gather(*lookups)
+        products = rows[:size]
+        next_cursor = None
+        if len(rows) > size:
+            last = products[-1]
+            next_cursor = encode_cursor(last.get(sort), last["id"])
+        body = {"products": products, "next_cursor": next_cursor, "limit": size}
+        if paging["include_total"]:
+            body["total"] = total[0]
+        return body
+
+    return await products_repo.list_products(**filters, **listing)
+
+
+def _snapshot_listing(filters: dict, listing: dict, paging: dict):
+    """Filter, rank, sort and paginate against the in-memory catalog snapshot"""
+    scores = None
+    if filters["search"]:
+        scores = dict(search_index.search(filters["search"]))
+
+    bits = catalog.filter(
+        category=filters["category"],
+        min_price=filters["min_price"],
+        max_price=filters["max_price"],
+        in_stock=filters["in_stock"],
+        ids=scores
+    )
+
+    # Rows come back already in listing order (search ranking, or the snapshot's id / price
+    # index), so pages are sliced from them without sorting again
+    sort = listing["sort"]
+    if sort == "relevance":
+        # Best score first, ties by id, as search_index.search ranks them
+        if paging["after"] is not None and paging["after"][0] is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        value_of = lambda row: scores[row["id"]]
+        key_of = lambda value, row_id: (-value, row_id)
+        rows = catalog.rows_for_ids(bits, scores)
+    else:
+        value_of = lambda row: row.get(sort)
+        descending = listing["descending"]
+        key_of = lambda value, row_id: sort_tuple(value, row_id, descending)
+        rows = catalog.rows(bits, sort=sort, descending=descending)
+
+    columns = listing["columns"]
+    project = (lambda row: row) if columns == "*" else _projector(columns)
+
+    if paging["page"] is not None or paging["page_size"] is not None:
+        current_page = paging["page"] or 1
+        size = paging["page_size"] or DEFAULT_PAGE_SIZE
+        offset = (current_page - 1) * size
+        products = [project(row) for row in rows[offset:offset + size]]
+        return {"products": products, "pagination": page_metadata(current_page, size, len(rows))}
+
+    if paging["cursor"] is not None or paging["limit"] is not None:
+        size = paging["limit"] or DEFAULT_PAGE_SIZE
+        after_key = key_of(*paging["after"]) if paging["after"] is not None else None
+        page_rows, has_more = keyset_slice(rows, after_key, size, key=lambda row: key_of(value_of(row), row["id"]))
+        next_cursor = None
+        if has_more:
+            last = page_rows[-1]
+            next_cursor = encode_cursor(value_of(last), last["id"])
+        body = {"products": [project(row) for row in page_rows], "next_cursor": next_cursor, "limit": size}
+        if paging["include_total"]:
+            body["total"] = len(rows)
+        return body
+
+    return [project(row) for row in rows]
+
+
+def _projector(columns: str):
+    names = [name.strip() for name in columns.split(",")]
+    return lambda row: {name: row.get(name) for name in names}
+
+
+@router.get("/facets")
+async def get_product_facets(
+    request: Request,
+    response: Response,
     category: Optional[str] = Query(None),
     min_price: Optional[int] = Query(None),
     max_price: Optional[int] = Query(None),
     search: Optional[str] = Query(None),
     in_stock: Optional[bool] = Query(None)
 ):
+    """
+    Category counts, price histogram buckets and stock counts for a filter set
+
+    Computed from the in-memory catalog snapshot's precomputed bitmaps,
+    so it costs no database queries. Until the snapshot has loaded (a
+    background load is started) it answers 503 with Retry-After.
+    """
     try:
-        cache_key = f"products_{category}_{min_price}_{max_price}_{search}_{in_stock}"
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
-
-        # Build query to get all products
-        query = supabase.table("products").select("*")
-
-        # Apply filters
-        if category:
-            query = query.eq("Category", category)
-        if min_price is not None:
-            query = query.gte("Price", min_price)
-        if max_price is not None:
-            query = query.lte("Price", max_price)
+        not_modified = conditional_get(request, response, PRODUCTS_RESOURCE)
+        if not_modified is not None:
+            return not_modified
+
+        refresh_catalog_if_stale()
+        if not catalog.ready:
+            raise HTTPException(
+                status_code=503,
+                detail="Product facets are not available yet, please retry shortly",
+                headers={"Retry-After": str(FACETS_RETRY_AFTER_SECONDS)}
+            )
+
+        ids = None
         if search:
-            query = query.ilike("name", f"%{search}%")
-        if in_stock is True:
-            query = query.gt("Quantity", 0)
-        elif in_stock is False:
-            query = query.eq("Quantity", 0)
-
-        # Order by id and get all results
-        query = query.order("id", desc=False)
-        
-        result = query.execute()
-        products_list = result.data or []
-
-        # Return all products without pagination metadata
-        response = products_list
-
-        cache.set(cache_key, response, ttl_seconds=300)
-        return response
+            ids = [pid for pid, _ in search_index.search(search)]
+
+        return catalog.facets(
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock=in_stock,
+            ids=ids
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching product facets: {str(e)}")
+
+
+def _parse_ids(ids: str) -> list:
+    """Parse a comma-separated id list, dropping duplicates but keeping order"""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids is required")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+
+@router.get("/batch")
+async def get_products_batch(
+    ids: str = Query(..., description="Comma-separated product ids"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return")
+):
+    """
+    Fetch many products in one call (e.g. to render a cart)
+
+    Products come back in the order requested; ids that don't exist are
+    listed under `missing`.
+    """
+    try:
+        product_ids = _parse_ids(ids)
+        columns = select_columns(fields, PRODUCT_FIELDS, required=("id",))
+        project = (lambda row: row) if columns == "*" else _projector(columns)
+
+        found = await products_by_id(product_ids)
+        return await with_srcsets({
+            "products": [project(found[pid]) for pid in product_ids if pid in found],
+            "missing": [pid for pid in product_ids if pid not in found]
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching products: {str(e)}")
 
 
 @router.get("/{product_id}")
-def get_product_by_id(product_id: int):
+async def get_product_by_id(request: Request, response: Response, product_id: int, fields: Optional[str] = Query(None)):
     try:
-        result = supabase.table("products").select("*").eq("id", product_id).single().execute()
-        if not result.data:
+        not_modified = conditional_get(request, response, product_tag(product_id), IMAGE_VARIANTS_RESOURCE)
+        if not_modified is not None:
+            return not_modified
+
+        columns = select_columns(fields, PRODUCT_FIELDS, required=("id",))
+        product = (await products_by_id([product_id])).get(product_id)
+        if not product:
             raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
-        return result.data
+        return await with_srcsets(product if columns == "*" else _projector(columns)(product))
     except HTTPException:
         raise
     except Exception as e:
@@ -79,17 +359,18 @@ def get_product_by_id(product_id: int):
 async def create_product(data: Product, current_user: dict = Depends(get_current_admin)):
     try:
         # Only admins can create products
-        result = supabase.table("products").insert({
+        # An uploaded image whose CDN copy is already done is stored by its CDN URL
+        inserted = await products_repo.insert_product({
             "name": data.name,
             "Category": data.Category,
             "Price": data.Price,
             "Description": data.Description,
-            "Image": data.Image,
+            "Image": await cdn_queue.resolve(data.Image),
             "Quantity": data.Quantity
-        }).execute()
+        })
 
-        cache.clear()
-        inserted = result.data[0] if result.data else {}
+        invalidate_product(inserted)
+        upsert_product(inserted)
         return {
             "message": "Product created successfully",
             "product_id": inserted.get("id"),
@@ -103,21 +384,22 @@ async def create_product(data: Product, current_user: dict = Depends(get_current
 async def update_product(product_id: int, data: Product, current_user: dict = Depends(get_current_admin)):
     try:
         # Only admins can update products
-        existing = supabase.table("products").select("id").eq("id", product_id).execute()
-        if not existing.data:
+        existing = await products_repo.get_product(product_id, columns="id, Category")
+        if not existing:
             raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
 
-        result = supabase.table("products").update({
+        updated = await products_repo.update_product(product_id, {
             "name": data.name,
             "Category": data.Category,
             "Price": data.Price,
             "Description": data.Description,
-            "Image": data.Image,
+            "Image": await cdn_queue.resolve(data.Image),
             "Quantity": data.Quantity
-        }).eq("id", product_id).execute()
+        })
 
-        cache.clear()
-        return {"message": "Product updated successfully", "product": result.data[0] if result.data else None}
+        invalidate_product(existing, updated)
+        upsert_product(updated)
+        return {"message": "Product updated successfully", "product": updated}
     except HTTPException:
         raise
     except Exception as e:
@@ -128,12 +410,13 @@ async def update_product(product_id: int, data: Product, current_user: dict = De
 async def delete_product(product_id: int, current_user: dict = Depends(get_current_admin)):
     try:
         # Only admins can delete products
-        existing = supabase.table("products").select("id").eq("id", product_id).execute()
-        if not existing.data:
+        existing = await products_repo.get_product(product_id, columns="id, Category")
+        if not existing:
             raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
 
-        supabase.table("products").delete().eq("id", product_id).execute()
-        cache.clear()
+        await products_repo.delete_product(product_id)
+        invalidate_product(existing)
+        remove_product(product_id)
         return {"message": "Product deleted successfully", "product_id": product_id}
     except HTTPException:
         raise
@@ -141,28 +424,55 @@ async def delete_product(product_id: int, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=500, detail=f"Error deleting product: {str(e)}")
 
 
+@router.post("/reserve-stock")
+async def reserve_stock(data: StockReservation, current_user: dict = Depends(get_current_user)):
+    """
+    Reserve stock for every line of an order in one atomic database call
+
+    All-or-nothing: if any product is missing or short, no stock is taken and
+    a 400 lists every line with what was available.
+    """
+    try:
+        rows = await products_repo.reserve_stock([item.model_dump() for item in data.items])
+
+        if not all(row["reserved"] for row in rows):
+            return JSONResponse(status_code=400, content=stock_shortage(rows))
+
+        apply_stock_reservation(rows)
+        return {
+            "message": "Stock reserved successfully",
+            "items": [{
+                "product_id": row["product_id"],
+                "previous_quantity": row["available"],
+                "reduced_by": row["requested"],
+                "new_quantity": row["remaining"]
+            } for row in rows]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reserving stock: {str(e)}")
+
+
 @router.patch("/{product_id}/reduce-stock")
-async def reduce_product_stock(product_id: int, quantity: int = Query(...), current_user: dict = Depends(get_current_user)):
+async def reduce_product_stock(product_id: int, quantity: int = Query(..., gt=0), current_user: dict = Depends(get_current_user)):
     try:
         # Authenticated users can reduce stock during order placement
-        result = supabase.table("products").select("id, Quantity").eq("id", product_id).single().execute()
-        if not result.data:
+        # Check and decrement happen in one statement, so concurrent buyers can't oversell
+        rows = await products_repo.reserve_stock([{"product_id": product_id, "quantity": quantity}])
+        row = rows[0] if rows else None
+        if not row or row["available"] is None:
             raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        if not row["reserved"]:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock. Available: {row['available']}, Requested: {quantity}")
 
-        current_qty = result.data["Quantity"]
-        if current_qty < quantity:
-            raise HTTPException(status_code=400, detail=f"Insufficient stock. Available: {current_qty}, Requested: {quantity}")
-
-        new_quantity = current_qty - quantity
-        supabase.table("products").update({"Quantity": new_quantity}).eq("id", product_id).execute()
-        cache.clear()
-
+        apply_stock_reservation(rows)
         return {
             "message": "Stock reduced successfully",
             "product_id": product_id,
-            "previous_quantity": current_qty,
+            "previous_quantity": row["available"],
             "reduced_by": quantity,
-            "new_quantity": new_quantity
+            "new_quantity": row["remaining"]
         }
     except HTTPException:
         raise
@@ -170,39 +480,83 @@ async def reduce_product_stock(product_id: int, quantity: int = Query(...), curr
         raise HTTPException(status_code=500, detail=f"Error reducing stock: {str(e)}")
 
 
-@router.post("/upload-image")
-async def upload_product_image(file: UploadFile = File(...), current_user: dict = Depends(get_current_admin)):
+# The body is parsed in the handler (not with File(...)) so it can be capped while it streams;
+# this keeps the multipart `file` field in the OpenAPI schema
+UPLOAD_IMAGE_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"]
+        }}}
+    }
+}
+
+
+@router.post("/upload-image", openapi_extra=UPLOAD_IMAGE_BODY)
+async def upload_product_image(request: Request, current_user: dict = Depends(get_current_admin)):
+    form = None
     try:
-        # Only admins can upload product images
-        allowed_extensions = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+        # Only admins can upload product images; the admin check runs before the body is read
+        form = await read_upload_form(request)
+        file = form.get("file")
+        if not isinstance(file, UploadFile) or not file.filename:
+            raise HTTPException(status_code=400, detail="No file uploaded")
         file_extension = Path(file.filename).suffix.lower()
 
-        if file_extension not in allowed_extensions:
-            raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}")
-
-        try:
-            from config.cloudinary_config import upload_image
-            file_content = await file.read()
-            image_url = upload_image(file_content, folder="clothing-store/products")
-            return {"message": "Image uploaded to Cloudinary", "path": image_url, "url": image_url}
-        except Exception as cloudinary_error:
-            print(f"Cloudinary upload failed: {cloudinary_error}, falling back to local storage")
-            await file.seek(0)
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = UPLOAD_DIR / unique_filename
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            relative_path = f"/uploads/products/{unique_filename}"
-            return {"message": "Image uploaded locally", "path": relative_path, "url": relative_path}
+        if file_extension not in ALLOWED_IMAGE_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}")
+
+        # Hashed in chunks, then written under its content hash unless the same bytes were
+        # uploaded before
+        stored = await save_upload(file, file_extension)
+        if stored["cdn_url"]:
+            return {"message": "Image already uploaded", "path": stored["cdn_url"], "url": stored["cdn_url"], "duplicate": True}
+
+        relative_path = stored["local_url"]
+        if not stored["duplicate"]:
+            # Resized AVIF/WebP copies are rendered in the background (process pool)
+            variant_generator.schedule(stored["path"])
+        uploaded = {"path": relative_path, "url": relative_path, "duplicate": stored["duplicate"]}
+
+        if not cloudinary_enabled():
+            message = "Image already uploaded" if stored["duplicate"] else "Image uploaded locally"
+            return {"message": message, **uploaded}
+
+        # The local URL works right away; products using it are switched to the CDN URL
+        # once the background upload finishes
+        job = cdn_queue.status(relative_path)
+        if job is None or job["status"] == "failed":
+            job = cdn_queue.enqueue(relative_path, str(stored["path"]))
+        return {"message": "Image uploaded locally, CDN upload queued", **uploaded, "cdn_status": job["status"]}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
+    finally:
+        if form is not None:
+            await form.close()
+
+
+@router.get("/upload-image/status")
+async def get_upload_status(path: str = Query(..., description="Local URL returned by /upload-image"), current_user: dict = Depends(get_current_admin)):
+    """CDN upload progress for an uploaded image: url is the CDN URL once status is done"""
+    job = cdn_queue.status(path)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No CDN upload tracked for this image")
+    return job
+
+
+@router.get("/image-variants/{name}")
+async def get_image_variant(request: Request, name: str):
+    """A resized image variant; names are content hashes, so responses are cached as immutable"""
+    file_path = variant_path(name)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+    return await asset_response(request, file_path, media_type=MEDIA_TYPES[file_path.suffix[1:]])
 
 
 @router.get("/image/{filename}")
-async def get_product_image(filename: str):
-    file_path = UPLOAD_DIR / filename
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path)
+async def get_product_image(request: Request, filename: str):
+    return await asset_response(request, UPLOAD_DIR / filename)
@@ -1,48 +1,37 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from config.db import supabase
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import Optional
+from repositories import users as users_repo
 from Schemas.Users import UserCreate, UserLogin, UserResponse
-from passlib.context import CryptContext
 from datetime import datetime, timezone
-from utils.jwt_utils import create_access_token
+from utils.sessions import start_session
 from utils.auth_dependency import get_current_user, get_current_admin
+from utils.fields import select_columns, USER_FIELDS
+from utils.passwords import hash_password, verify_password
 
 router = APIRouter()
 
-# Password hashing context using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt with automatic salting"""
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a bcrypt hash"""
-    return pwd_context.verify(plain_password, hashed_password)
-
-
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
 async def signup(data: UserCreate):
     try:
         # Check if email already exists
-        existing = supabase.table("users").select("id").eq("email", data.email).execute()
-        if existing.data:
+        existing = await users_repo.get_user_by_email(data.email, columns="id")
+        if existing:
             raise HTTPException(status_code=400, detail="Email already registered")
 
+        # bcrypt runs in the password pool; a full pool raises 503 (PasswordPoolBusy)
+        hashed = await hash_password(data.password)
         now = datetime.now(timezone.utc).isoformat()
-        result = supabase.table("users").insert({
+        inserted = await users_repo.insert_user({
             "email": data.email,
-            "password": hash_password(data.password),
+            "password": hashed,
             "name": data.name,
             "phone": data.phone,
             "role": "user",
             "is_active": True,
             "created_at": now,
             "updated_at": now
-        }).execute()
+        })
 
-        inserted = result.data[0] if result.data else {}
         return {
             "message": "User registered successfully",
             "user_id": inserted.get("id"),
@@ -59,13 +48,11 @@ async def signup(data: UserCreate):
 @router.post("/login")
 async def login(data: UserLogin):
     try:
-        result = supabase.table("users").select("*").eq("email", data.email).single().execute()
+        user = await users_repo.get_user_by_email(data.email)
 
-        if not result.data:
+        if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
-        user = result.data
-
         # Check if OAuth user (no password)
         if user.get("password") is None:
             raise HTTPException(
@@ -73,25 +60,18 @@ async def login(data: UserLogin):
                 detail="This account uses Google Sign-In. Please use 'Sign in with Google' button."
             )
 
-        if not verify_password(data.password, user["password"]):
+        if not await verify_password(data.password, user["password"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
         if not user.get("is_active", True):
             raise HTTPException(status_code=403, detail="Account is deactivated")
 
-        # Create JWT token with user claims
-        token = create_access_token(
-            data={
-                "sub": user["email"],  # Subject (user identifier)
-                "user_id": user["id"],
-                "role": user["role"],
-                "name": user["name"]
-            }
-        )
+        # Short-lived JWT plus a refresh token; /auth/refresh renews access without bcrypt
+        session = await start_session(user)
 
         return {
             "message": "Login successful",
-            "token": token,
+            **session,
             "user": {
                 "id": user["id"],
                 "email": user["email"],
@@ -108,29 +88,39 @@ async def login(data: UserLogin):
 
 
 @router.get("/users")
-async def get_all_users(current_user: dict = Depends(get_current_admin)):
+async def get_all_users(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user: dict = Depends(get_current_admin)
+):
     """
     Get all users (Admin only)
     Requires valid JWT token with admin role
     """
     try:
-        result = supabase.table("users").select("id, email, name, phone, role, is_active, created_at, google_id, profile_picture, oauth_provider").execute()
-        return result.data or []
+        columns = select_columns(fields, USER_FIELDS) if fields else users_repo.PUBLIC_COLUMNS
+        return await users_repo.list_users(columns=columns)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
 
 
 @router.get("/users/{user_id}")
-async def get_user(user_id: int, current_user: dict = Depends(get_current_user)):
+async def get_user(
+    user_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user: dict = Depends(get_current_user)
+):
     """
     Get user by ID
     Requires valid JWT token
     """
     try:
-        result = supabase.table("users").select("id, email, name, phone, role, is_active, created_at, google_id, profile_picture, oauth_provider").eq("id", user_id).single().execute()
-        if not result.data:
+        columns = select_columns(fields, USER_FIELDS) if fields else users_repo.PUBLIC_COLUMNS
+        user = await users_repo.get_user(user_id, columns=columns)
+        if not user:
             raise HTTPException(status_code=404, detail=f"User {user_id} not found")
-        return result.data
+        return user
     except HTTPException:
         raise
     except Exception as e:
@@ -147,11 +137,11 @@ async def update_user_role(user_id: int, role: str, current_user: dict = Depends
         if role not in ["admin", "user"]:
             raise HTTPException(status_code=400, detail="Role must be 'admin' or 'user'")
 
-        existing = supabase.table("users").select("id").eq("id", user_id).execute()
-        if not existing.data:
+        existing = await users_repo.get_user(user_id, columns="id")
+        if not existing:
             raise HTTPException(status_code=404, detail=f"User {user_id} not found")
 
-        supabase.table("users").update({"role": role}).eq("id", user_id).execute()
+        await users_repo.update_user(user_id, {"role": role})
         return {"message": "User role updated", "user_id": user_id, "new_role": role}
     except HTTPException:
         raise
@@ -166,15 +156,15 @@ async def delete_user(user_id: int, current_user: dict = Depends(get_current_adm
     Requires valid JWT token with admin role
     """
     try:
-        existing = supabase.table("users").select("id, email, name").eq("id", user_id).single().execute()
-        if not existing.data:
+        existing = await users_repo.get_user(user_id, columns="id, email, name")
+        if not existing:
             raise HTTPException(status_code=404, detail=f"User {user_id} not found")
 
-        supabase.table("users").delete().eq("id", user_id).execute()
+        await users_repo.delete_user(user_id)
         return {
             "message": "User deleted successfully",
             "user_id": user_id,
-            "deleted_user": {"email": existing.data["email"], "name": existing.data["name"]}
+            "deleted_user": {"email": existing["email"], "name": existing["name"]}
         }
     except HTTPException:
         raise
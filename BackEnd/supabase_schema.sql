@@ -45,6 +45,21 @@ create table if not exists cart (
   updated_at timestamptz default now()
 );
 
+-- One row per user/product so adds can upsert atomically.
+-- On an existing database, merge duplicate rows left by the old select-then-insert path first:
+update cart keep
+set quantity = dup.total
+from (
+  select min(id) as keep_id, sum(quantity)::integer as total
+  from cart
+  group by user_id, product_id
+  having count(*) > 1
+) as dup
+where keep.id = dup.keep_id;
+delete from cart a using cart b
+where a.user_id = b.user_id and a.product_id = b.product_id and a.id > b.id;
+create unique index if not exists cart_user_product_key on cart (user_id, product_id);
+
 -- ORDERS TABLE
 create table if not exists orders (
   id bigint generated by default as identity primary key,
@@ -67,6 +82,321 @@ create table if not exists orders (
   updated_at timestamptz default now()
 );
 
+-- Client-supplied key so a retried checkout can't place the order twice (existing databases)
+alter table orders add column if not exists idempotency_key text unique;
+
+-- REFRESH TOKENS TABLE
+-- Opaque, single-use refresh tokens; only their SHA-256 is stored (token_hash is the lookup key).
+-- Every token issued from one sign-in shares a family_id so a replayed token can end the whole session.
+create table if not exists refresh_tokens (
+  id bigint generated by default as identity primary key,
+  token_hash text unique not null,
+  user_id bigint not null references users(id) on delete cascade,
+  family_id uuid not null,
+  -- Set for sign-ins through an OAuth provider (e.g. google); carried to every successor
+  oauth_provider text,
+  expires_at timestamptz not null,
+  revoked_at timestamptz,
+  created_at timestamptz default now()
+);
+create index if not exists refresh_tokens_family_idx on refresh_tokens (family_id);
+alter table refresh_tokens add column if not exists oauth_provider text;
+
+-- One-time codes the OAuth callback hands the frontend (redeemed by deleting the row)
+create table if not exists login_codes (
+  code_hash text primary key,
+  user_id bigint not null references users(id) on delete cascade,
+  oauth_provider text,
+  expires_at timestamptz not null,
+  created_at timestamptz default now()
+);
+create index if not exists login_codes_expires_idx on login_codes (expires_at);
+
+-- =============================================
+-- Functions (called through the PostgREST RPC endpoint)
+-- =============================================
+
+-- Reserve stock for every line of an order in one transaction
+-- items: [{"product_id": 1, "quantity": 2}, ...] (repeated products are summed)
+-- All-or-nothing: rows are locked, and stock is only decremented if every line can be met.
+-- Returns one row per product; `reserved` is false for every row when anything was short,
+-- with `remaining` null and `available` showing the stock that was there.
+create or replace function reserve_stock(items jsonb)
+returns table (
+  product_id bigint,
+  requested integer,
+  available integer,
+  remaining integer,
+  category text,
+  reserved boolean
+)
+language plpgsql
+as $$
+declare
+  ids bigint[];
+  qtys integer[];
+begin
+  select array_agg(line.pid order by line.pid), array_agg(line.qty order by line.pid)
+    into ids, qtys
+  from (
+    select (item->>'product_id')::bigint as pid, sum((item->>'quantity')::integer)::integer as qty
+    from jsonb_array_elements(items) as item
+    group by 1
+  ) as line;
+
+  if ids is null then
+    return;
+  end if;
+  if exists (select 1 from unnest(qtys) as q where q is null or q <= 0) then
+    raise exception 'quantity must be positive';
+  end if;
+
+  -- Lock in id order so concurrent reservations can't deadlock
+  perform 1 from products p where p.id = any(ids) order by p.id for update;
+
+  if exists (
+    select 1
+    from unnest(ids, qtys) as w(pid, qty)
+    left join products p on p.id = w.pid
+    where p.id is null or coalesce(p."Quantity", 0) < w.qty
+  ) then
+    return query
+      select w.pid, w.qty, p."Quantity", null::integer, p."Category", false
+      from unnest(ids, qtys) as w(pid, qty)
+      left join products p on p.id = w.pid
+      order by w.pid;
+    return;
+  end if;
+
+  return query
+    with updated as (
+      update products p
+      set "Quantity" = p."Quantity" - w.qty
+      from unnest(ids, qtys) as w(pid, qty)
+      where p.id = w.pid
+      returning p.id, w.qty, p."Quantity" + w.qty as before, p."Quantity" as after, p."Category"
+    )
+    select u.id, u.qty, u.before, u.after, u."Category", true
+    from updated u
+    order by u.id;
+end;
+$$;
+
+-- Add to a cart in one statement: inserts the row, or increments its quantity if the
+-- user already has the product (concurrent adds can't duplicate rows or lose increments)
+create or replace function cart_add_item(
+  p_user_id text,
+  p_product_id integer,
+  p_product_name text,
+  p_product_price integer,
+  p_product_category text,
+  p_product_image text,
+  p_quantity integer
+)
+returns table (cart_item_id bigint, quantity integer, inserted boolean)
+language sql
+as $$
+  insert into cart as c (
+    user_id, product_id, product_name, product_price, product_category, product_image,
+    quantity, created_at, updated_at
+  )
+  values (
+    p_user_id, p_product_id, p_product_name, p_product_price, p_product_category, coalesce(p_product_image, ''),
+    p_quantity, now(), now()
+  )
+  on conflict (user_id, product_id) do update
+    set quantity = c.quantity + excluded.quantity, updated_at = now()
+  returning c.id, c.quantity, c.xmax = 0;
+$$;
+
+-- Apply a list of cart operations for one user in one transaction and return the resulting cart
+-- p_ops: [{"op": "add" | "update" | "remove", "product_id": 1, "quantity": 2, "product_name": ...}, ...]
+-- add increments like cart_add_item, update sets the quantity, remove deletes the product's row
+create or replace function cart_apply(p_user_id text, p_ops jsonb)
+returns setof cart
+language plpgsql
+as $$
+declare
+  v_op jsonb;
+begin
+  for v_op in select * from jsonb_array_elements(p_ops) loop
+    case v_op->>'op'
+      when 'add' then
+        insert into cart as c (
+          user_id, product_id, product_name, product_price, product_category, product_image,
+          quantity, created_at, updated_at
+        )
+        values (
+          p_user_id, (v_op->>'product_id')::integer, v_op->>'product_name', (v_op->>'product_price')::integer,
+          v_op->>'product_category', coalesce(v_op->>'product_image', ''),
+          coalesce((v_op->>'quantity')::integer, 1), now(), now()
+        )
+        on conflict (user_id, product_id) do update
+          set quantity = c.quantity + excluded.quantity, updated_at = now();
+      when 'update' then
+        update cart c
+        set quantity = (v_op->>'quantity')::integer, updated_at = now()
+        where c.user_id = p_user_id and c.product_id = (v_op->>'product_id')::integer;
+      when 'remove' then
+        delete from cart c
+        where c.user_id = p_user_id and c.product_id = (v_op->>'product_id')::integer;
+      else
+        raise exception 'unknown cart operation: %', v_op->>'op';
+    end case;
+  end loop;
+
+  return query select * from cart c where c.user_id = p_user_id order by c.id;
+end;
+$$;
+
+-- Place an order from a user's cart in one transaction:
+-- lock the cart, reserve stock for it (all-or-nothing), insert the order priced
+-- from the products table, and clear the cart.
+-- p_order holds order_id, customer_* and address fields, and status.
+-- Duplicates are caught by the unique order_id / idempotency_key constraints; a retry
+-- of an order that was already placed gets that order back.
+-- Returns one row whose `result` is {"status": "created" | "duplicate" | "conflict" | "empty_cart" | "insufficient_stock", ...}
+-- (a set rather than a bare jsonb value so PostgREST clients get the usual row list)
+create or replace function checkout(p_user_id text, p_order jsonb, p_idempotency_key text)
+returns table (result jsonb)
+language plpgsql
+as $$
+declare
+  v_lines jsonb;
+  v_reservation jsonb;
+  v_reserved boolean;
+  v_items jsonb;
+  v_total_items integer;
+  v_total_price integer;
+  v_order orders;
+begin
+  perform 1 from cart c where c.user_id = p_user_id for update;
+
+  select jsonb_agg(jsonb_build_object('product_id', c.product_id, 'quantity', c.quantity))
+    into v_lines
+  from cart c
+  where c.user_id = p_user_id;
+
+  if v_lines is null then
+    -- The cart is cleared on success, so this may be a retry of a placed order
+    select * into v_order from orders o
+      where o.idempotency_key = p_idempotency_key and o.customer_email = p_order->>'customer_email';
+    if found then
+      return query select jsonb_build_object('status', 'duplicate', 'order', to_jsonb(v_order));
+      return;
+    end if;
+    return query select jsonb_build_object('status', 'empty_cart');
+    return;
+  end if;
+
+  begin
+    select jsonb_agg(to_jsonb(r) order by r.product_id), bool_and(r.reserved)
+      into v_reservation, v_reserved
+    from reserve_stock(v_lines) as r;
+
+    if not v_reserved then
+      return query select jsonb_build_object('status', 'insufficient_stock', 'items', v_reservation);
+      return;
+    end if;
+
+    select
+      jsonb_agg(jsonb_build_object(
+        'id', p.id::text,
+        'name', p.name,
+        'price', coalesce(p."Price", c.product_price),
+        'quantity', c.quantity,
+        'category', p."Category",
+        'img', coalesce(p."Image", '')
+      ) order by c.id),
+      sum(c.quantity),
+      sum(coalesce(p."Price", c.product_price) * c.quantity)
+      into v_items, v_total_items, v_total_price
+    from cart c
+    join products p on p.id = c.product_id
+    where c.user_id = p_user_id;
+
+    insert into orders (
+      order_id, idempotency_key, customer_name, customer_email, customer_phone,
+      address, city, state, pincode, country,
+      order_items, total_items, total_price, status, order_date, updated_at
+    )
+    values (
+      p_order->>'order_id', p_idempotency_key, p_order->>'customer_name', p_order->>'customer_email', p_order->>'customer_phone',
+      p_order->>'address', p_order->>'city', p_order->>'state', p_order->>'pincode', coalesce(p_order->>'country', 'India'),
+      v_items, v_total_items, v_total_price, coalesce(p_order->>'status', 'Confirmed'), now(), now()
+    )
+    returning * into v_order;
+
+    delete from cart c where c.user_id = p_user_id;
+
+    return query select jsonb_build_object('status', 'created', 'order', to_jsonb(v_order), 'items', v_reservation);
+    return;
+  exception when unique_violation then
+    -- Everything in this block (including the stock reservation) is rolled back
+    select * into v_order from orders o
+      where o.idempotency_key = p_idempotency_key or o.order_id = p_order->>'order_id'
+      order by (o.idempotency_key = p_idempotency_key) desc nulls last
+      limit 1;
+    if v_order.customer_email is distinct from p_order->>'customer_email' then
+      return query select jsonb_build_object('status', 'conflict');
+      return;
+    end if;
+    return query select jsonb_build_object('status', 'duplicate', 'order', to_jsonb(v_order));
+    return;
+  end;
+end;
+$$;
+
+-- Redeem a refresh token and issue its successor in one transaction
+-- Returns one row: status is 'ok' (with the user's current claims), 'invalid', 'expired',
+-- 'inactive', or 'reused' - a token that was already rotated came back, so the whole
+-- family is revoked and that sign-in has to start over.
+-- The result gained oauth_provider, and a function's result type can't be replaced in place
+drop function if exists rotate_refresh_token(text, text, timestamptz);
+create or replace function rotate_refresh_token(p_token_hash text, p_new_hash text, p_expires_at timestamptz)
+returns table (status text, user_id bigint, email text, name text, role text, oauth_provider text)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+  v_token refresh_tokens;
+  v_user users;
+begin
+  select * into v_token from refresh_tokens t where t.token_hash = p_token_hash for update;
+  if not found then
+    return query select 'invalid'::text, null::bigint, null::text, null::text, null::text, null::text;
+    return;
+  end if;
+
+  if v_token.revoked_at is not null then
+    update refresh_tokens t set revoked_at = now()
+      where t.family_id = v_token.family_id and t.revoked_at is null;
+    return query select 'reused'::text, v_token.user_id, null::text, null::text, null::text, null::text;
+    return;
+  end if;
+
+  if v_token.expires_at <= now() then
+    update refresh_tokens t set revoked_at = now() where t.id = v_token.id;
+    return query select 'expired'::text, v_token.user_id, null::text, null::text, null::text, null::text;
+    return;
+  end if;
+
+  select * into v_user from users u where u.id = v_token.user_id;
+  if not found or not coalesce(v_user.is_active, true) then
+    update refresh_tokens t set revoked_at = now()
+      where t.family_id = v_token.family_id and t.revoked_at is null;
+    return query select 'inactive'::text, v_token.user_id, null::text, null::text, null::text, null::text;
+    return;
+  end if;
+
+  update refresh_tokens t set revoked_at = now() where t.id = v_token.id;
+  insert into refresh_tokens (token_hash, user_id, family_id, oauth_provider, expires_at)
+  values (p_new_hash, v_token.user_id, v_token.family_id, v_token.oauth_provider, p_expires_at);
+
+  return query select 'ok'::text, v_user.id, v_user.email, v_user.name, v_user.role::text, v_token.oauth_provider;
+end;
+$$;
+
 -- =============================================
 -- Row Level Security (RLS) - Optional but recommended
 -- =============================================
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Tests import the backend the way main.py does (utils.*, repositories.*), from BackEnd/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.db builds its clients at import time; nothing in these tests talks to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test.service.key")
+
+# Keep uploads, variants and the upload index out of the working tree
+_runtime_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_runtime_dir, "uploads"))
+os.environ.setdefault("UPLOAD_INDEX_PATH", os.path.join(_runtime_dir, "upload_index.sqlite3"))
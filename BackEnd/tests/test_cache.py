@@ -0,0 +1,233 @@
+import asyncio
+
+from utils.cache import FRESH, MISS, STALE, LRUCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = LRUCache()
+    cache.set("a", 1, ttl_seconds=-1)
+    assert cache.get("a") is None
+
+
+def test_invalidate_tags_removes_only_tagged_entries():
+    cache = LRUCache()
+    cache.set("p1", 1, tags=["product:1"])
+    cache.set("list", [1, 2], tags=["product:1", "product:2"])
+    cache.set("p2", 2, tags=["product:2"])
+    assert cache.invalidate_tags("product:1") == 2
+    assert cache.get("p1") is None
+    assert cache.get("list") is None
+    assert cache.get("p2") == 2
+
+
+def test_concurrent_misses_share_one_load():
+    cache = LRUCache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(5)))
+
+    results = run(scenario())
+    assert calls == 1
+    assert results == [("value", MISS)] * 5
+    assert cache.get("k") == "value"
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_fresh_hit_skips_loader():
+    cache = LRUCache()
+    cache.set("k", "cached")
+
+    async def loader():
+        raise AssertionError("should not load")
+
+    assert run(cache.get_or_load("k", loader)) == ("cached", FRESH)
+
+
+def test_delete_of_another_key_does_not_discard_a_load():
+    cache = LRUCache()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def loader():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "listing"
+
+        task = asyncio.ensure_future(cache.get_or_load("listing", loader))
+        await started.wait()
+        cache.delete("cart_someone")
+        await task
+
+    run(scenario())
+    assert cache.get("listing") == "listing"
+
+
+def test_delete_during_load_keeps_older_copy_out():
+    cache = LRUCache()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def loader():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "old"
+
+        task = asyncio.ensure_future(cache.get_or_load("cart_1", loader))
+        await started.wait()
+        cache.delete("cart_1")
+        cache.set("cart_1", "new")
+        assert await task == ("old", MISS)
+
+    run(scenario())
+    assert cache.get("cart_1") == "new"
+
+
+def test_tag_invalidation_during_load_discards_result():
+    cache = LRUCache()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def loader():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "rows"
+
+        task = asyncio.ensure_future(cache.get_or_load("listing", loader, tags=["products"]))
+        await started.wait()
+        cache.invalidate_tags("products")
+        await task
+
+    run(scenario())
+    assert cache.get("listing") is None
+
+
+def test_unrelated_tag_invalidation_during_load_keeps_result():
+    cache = LRUCache()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def loader():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "cart"
+
+        task = asyncio.ensure_future(cache.get_or_load("cart_1", loader, tags=["cart:1"]))
+        await started.wait()
+        cache.invalidate_tags("product:7")
+        await task
+
+    run(scenario())
+    assert cache.get("cart_1") == "cart"
+
+
+def test_set_many_skips_only_entries_touched_since_the_watch():
+    cache = LRUCache()
+    watch = cache.watch()
+    cache.invalidate_tags("product:1")
+    cache.delete("p3")
+    stored = cache.set_many(
+        [("p1", 1, ["product:1"]), ("p2", 2, ["product:2"]), ("p3", 3, ["product:3"])],
+        watch=watch
+    )
+    assert stored == 1
+    assert cache.get("p1") is None
+    assert cache.get("p2") == 2
+    assert cache.get("p3") is None
+
+    watch = cache.watch()
+    cache.clear()
+    assert cache.set_many([("p2", 2, ["product:2"])], watch=watch) == 0
+
+
+def test_failed_load_is_not_cached_and_can_retry():
+    cache = LRUCache()
+
+    async def failing():
+        raise RuntimeError("db down")
+
+    async def working():
+        return "ok"
+
+    async def scenario():
+        try:
+            await cache.get_or_load("k", failing)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected the loader error")
+        return await cache.get_or_load("k", working)
+
+    assert run(scenario()) == ("ok", MISS)
+    assert cache.get("k") == "ok"
+
+
+def test_stale_entry_is_served_while_refreshing():
+    cache = LRUCache()
+    cache.set("k", "old", ttl_seconds=-1, stale_seconds=60)
+
+    async def loader():
+        return "new"
+
+    async def scenario():
+        value = await cache.get_or_load("k", loader, stale_seconds=60)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return value
+
+    assert run(scenario()) == ("old", STALE)
+    assert cache.get("k") == "new"
+
+
+def test_patch_tags_updates_in_place_and_keeps_in_flight_loads_out():
+    cache = LRUCache()
+    cache.set("list", [{"id": 1, "Quantity": 5}], tags=["category:a"])
+    cache.set("other", [{"id": 2, "Quantity": 5}], tags=["category:b"])
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def loader():
+            started.set()
+            await asyncio.sleep(0.01)
+            return [{"id": 1, "Quantity": 5}]
+
+        task = asyncio.ensure_future(cache.get_or_load("page", loader, tags=["category:a"]))
+        await started.wait()
+
+        def patch(rows):
+            rows[0]["Quantity"] = 4
+
+        assert cache.patch_tags(["category:a"], patch) == 1
+        await task
+
+    run(scenario())
+    assert cache.get("list") == [{"id": 1, "Quantity": 4}]
+    assert cache.get("other") == [{"id": 2, "Quantity": 5}]
+    assert cache.get("page") is None
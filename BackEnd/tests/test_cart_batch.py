@@ -0,0 +1,115 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from repositories import cart as cart_repo
+from routers import Cart
+from utils import cart_cache
+from utils.auth_dependency import get_current_user
+from utils.cache import cache
+
+USER = "shopper@example.com"
+
+
+class StubSupabase:
+    """Records RPC calls and answers each with the rows queued for that function"""
+
+    def __init__(self, results: dict):
+        self.results = results
+        self.calls = []
+
+    def rpc(self, name: str, params: dict):
+        self.calls.append((name, params))
+
+        async def execute():
+            return SimpleNamespace(data=self.results[name])
+        return SimpleNamespace(execute=execute)
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    stub = StubSupabase({})
+
+    async def get_async_supabase():
+        return stub
+
+    monkeypatch.setattr(cart_repo, "get_async_supabase", get_async_supabase)
+    cache.clear()
+    yield stub
+    cache.clear()
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(Cart.router, prefix="/cart")
+    app.dependency_overrides[get_current_user] = lambda: {"sub": USER}
+    return app
+
+
+def post(app, path, json):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=json)
+    return asyncio.run(run())
+
+
+def row(cart_item_id, product_id, quantity):
+    return {"id": cart_item_id, "user_id": USER, "product_id": product_id, "product_price": 100, "quantity": quantity}
+
+
+def test_add_is_one_upsert_rpc(app, supabase):
+    supabase.results["cart_add_item"] = [{"cart_item_id": 5, "quantity": 3, "inserted": False}]
+    cart_cache.store(USER, [row(5, 7, 1)])
+
+    response = post(app, "/cart/", {
+        "user_id": USER, "product_id": 7, "product_name": "Tee", "product_price": 100,
+        "product_category": "T-Shirts", "product_image": "", "quantity": 2
+    })
+    assert response.status_code == 200
+    assert response.json() == {"message": "Cart item quantity updated", "cart_item_id": 5, "quantity": 3, "action": "updated"}
+    name, params = supabase.calls[0]
+    assert (name, params["p_user_id"], params["p_product_id"], params["p_quantity"]) == ("cart_add_item", USER, 7, 2)
+    # The cached cart takes the row's new quantity from the RPC, no reload
+    assert asyncio.run(cart_cache.find_item(USER, 5))["quantity"] == 3
+    assert len(supabase.calls) == 1
+
+
+def test_batch_sends_every_operation_in_one_rpc_and_caches_the_result(app, supabase):
+    rows = [row(5, 7, 3), row(6, 9, 1)]
+    supabase.results["cart_apply"] = rows
+    operations = [
+        {"op": "add", "product_id": 7, "quantity": 2, "product_name": "Tee", "product_price": 100},
+        {"op": "add", "product_id": 9},
+        {"op": "update", "product_id": 7, "quantity": 3},
+        {"op": "remove", "product_id": 4}
+    ]
+
+    response = post(app, "/cart/batch", {"user_id": USER, "operations": operations})
+    assert response.status_code == 200
+    assert response.json()["operations"] == 4
+    assert response.json()["items"] == rows
+    assert len(supabase.calls) == 1
+    name, params = supabase.calls[0]
+    assert name == "cart_apply"
+    assert params["p_user_id"] == USER
+    assert [(op["op"], op["product_id"], op.get("quantity")) for op in params["p_ops"]] == [
+        ("add", 7, 2), ("add", 9, None), ("update", 7, 3), ("remove", 4, None)
+    ]
+    assert asyncio.run(cart_cache.get_cart(USER)) == rows
+
+
+def test_batch_update_without_quantity_is_rejected_before_the_rpc(app, supabase):
+    response = post(app, "/cart/batch", {"user_id": USER, "operations": [{"op": "update", "product_id": 7}]})
+    assert response.status_code == 400
+    assert supabase.calls == []
+
+
+def test_batch_for_another_user_is_forbidden(app, supabase):
+    response = post(app, "/cart/batch", {"user_id": "other@example.com", "operations": [{"op": "remove", "product_id": 7}]})
+    assert response.status_code == 403
+    assert supabase.calls == []
@@ -0,0 +1,73 @@
+import asyncio
+
+from utils import cart_cache
+from utils.cache import cache
+
+USER = "shopper@example.com"
+ROW = {"id": 1, "user_id": USER, "product_id": 7, "product_price": 100, "quantity": 1}
+
+
+def setup_function():
+    cache.clear()
+    cart_cache.store(USER, [dict(ROW)])
+
+
+def teardown_function():
+    cache.clear()
+
+
+async def add(quantity: int, delay: float):
+    with cart_cache.writing(USER):
+        # Stands in for the cart_add_item RPC; `quantity` is the row's absolute quantity after it
+        await asyncio.sleep(delay)
+        cart_cache.item_added(USER, ROW, 1, quantity, inserted=False)
+
+
+def test_single_write_patches_the_cached_cart():
+    asyncio.run(add(2, 0))
+    assert cache.get(cart_cache.cart_key(USER)) is not None
+    assert asyncio.run(cart_cache.find_item(USER, 1))["quantity"] == 2
+
+
+def test_overlapping_writes_drop_the_cached_cart():
+    async def scenario():
+        # The add that committed last (quantity 3) answers first; the stale 2 must not stick
+        await asyncio.gather(add(2, 0.02), add(3, 0.01))
+
+    asyncio.run(scenario())
+    assert cache.get(cart_cache.cart_key(USER)) is None
+    assert cart_cache._writes == {}
+
+
+def test_failed_write_still_releases_the_cart():
+    async def scenario():
+        with cart_cache.writing(USER):
+            raise RuntimeError("rpc failed")
+
+    try:
+        asyncio.run(scenario())
+    except RuntimeError:
+        pass
+    assert cart_cache._writes == {}
+    assert cache.get(cart_cache.cart_key(USER)) is not None
+
+
+def test_price_change_updates_cached_cart_totals(monkeypatch):
+    catalog = {7: {"id": 7, "Price": 100, "Quantity": 10}}
+
+    async def products_by_id(ids):
+        return {pid: catalog[pid] for pid in ids if pid in catalog}
+
+    monkeypatch.setattr(cart_cache, "products_by_id", products_by_id)
+    asyncio.run(add(3, 0))
+
+    cart = asyncio.run(cart_cache.repriced_cart(USER))
+    assert (cart["total_items"], cart["total_price"], cart["price_changes"]) == (3, 300, 0)
+
+    catalog[7] = {**catalog[7], "Price": 150, "Quantity": 2}
+    cart = asyncio.run(cart_cache.repriced_cart(USER))
+    assert (cart["total_items"], cart["total_price"], cart["price_changes"], cart["stock_issues"]) == (3, 450, 1, 1)
+    line = cart["items"][0]
+    assert (line["product_price"], line["previous_price"], line["stock_status"]) == (150, 100, "insufficient")
+    # The cached rows keep the price the item was added at
+    assert cache.get(cart_cache.cart_key(USER))[0]["product_price"] == 100
@@ -0,0 +1,116 @@
+import asyncio
+import random
+
+import pytest
+
+from repositories import products as products_repo
+from utils import catalog as catalog_module
+from utils.cache import cache
+from utils.catalog import CatalogSnapshot, products_by_id
+
+ROWS = [
+    {"id": 1, "name": "Tee", "Price": 500, "Category": "T-Shirts", "Quantity": 3},
+    {"id": 2, "name": "Hoodie", "Price": 1500, "Category": "Hoodies", "Quantity": 0},
+    {"id": 3, "name": "Jersey", "Price": None, "Category": "Jerseys", "Quantity": 1},
+]
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    snapshot = CatalogSnapshot(price_bucket_size=1000)
+    snapshot.rebuild(ROWS)
+    monkeypatch.setattr(catalog_module, "catalog", snapshot)
+    cache.clear()
+    yield snapshot
+    cache.clear()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Stand-in for the products table: records each ids query"""
+    table = {4: {"id": 4, "name": "New", "Price": 900, "Category": "T-Shirts", "Quantity": 2}}
+    queries = []
+
+    async def list_products(ids=None, **_):
+        queries.append(sorted(ids))
+        return [table[pid] for pid in ids if pid in table]
+
+    monkeypatch.setattr(products_repo, "list_products", list_products)
+    return queries
+
+
+def test_snapshot_misses_are_fetched_in_one_query(snapshot, db):
+    found = asyncio.run(products_by_id([1, 4, 99]))
+    assert sorted(found) == [1, 4]
+    assert db == [[4, 99]]
+
+    # The fetched row is now in the per-id cache; only the unknown id goes back to the DB
+    found = asyncio.run(products_by_id([4, 99]))
+    assert sorted(found) == [4]
+    assert db == [[4, 99], [99]]
+
+
+def test_snapshot_hits_skip_the_db(snapshot, db):
+    assert sorted(asyncio.run(products_by_id([1, 2, 3]))) == [1, 2, 3]
+    assert db == []
+
+
+def test_filter_and_facets(snapshot):
+    assert snapshot.count(snapshot.filter(category="T-Shirts")) == 1
+    assert snapshot.count(snapshot.filter(in_stock=True)) == 2
+    # NULL prices never match a price filter
+    bits = snapshot.filter(min_price=0, max_price=2000)
+    assert [row["id"] for row in snapshot.rows(bits, sort="Price")] == [1, 2]
+
+    facets = snapshot.facets(in_stock=True)
+    assert facets["total"] == 2
+    assert facets["categories"] == {"Jerseys": 1, "T-Shirts": 1}
+    assert facets["stock"] == {"in_stock": 2, "out_of_stock": 1}
+
+
+def test_incremental_updates(snapshot):
+    snapshot.upsert({"id": 2, "name": "Hoodie", "Price": 100, "Category": "Hoodies", "Quantity": 5})
+    snapshot.remove(1)
+    snapshot.set_quantity(3, 0)
+    rows = snapshot.rows(snapshot.filter(), sort="Price")
+    assert [row["id"] for row in rows] == [2, 3]
+    assert snapshot.count(snapshot.filter(in_stock=True)) == 1
+    assert snapshot.get(1) is None
+
+
+def test_rows_are_rebuilt_from_stored_values(snapshot):
+    # Readers get their own dicts, so patching a served row can't change the snapshot
+    snapshot.get(1)["Quantity"] = 99
+    assert snapshot.get(1) == ROWS[0]
+    # A row with a column the others lack doesn't add it to them
+    snapshot.upsert({**ROWS[1], "Image": "/uploads/products/hoodie.png"})
+    assert snapshot.get(2)["Image"] == "/uploads/products/hoodie.png"
+    assert "Image" not in snapshot.get(3)
+    assert snapshot.rows(snapshot.filter(category="Jerseys"))[:] == [ROWS[2]]
+
+
+def test_bitmap_queries_match_a_plain_scan():
+    rng = random.Random(3)
+    rows = [{
+        "id": pid,
+        "Category": rng.choice(["A", "B", "C"]),
+        "Price": rng.choice([None, rng.randint(0, 3000)]),
+        "Quantity": rng.randint(0, 2)
+    } for pid in range(1, 400)]
+    snapshot = CatalogSnapshot()
+    snapshot.rebuild(rows)
+    for pid in range(1, 400, 7):
+        snapshot.remove(pid)
+    live = [row for row in rows if (row["id"] - 1) % 7]
+    ids = rng.sample(range(1, 450), 150)
+
+    bits = snapshot.filter(category="B", min_price=500, max_price=2500, in_stock=True, ids=ids)
+    expected = [
+        row for row in live
+        if row["Category"] == "B" and row["Price"] is not None and 500 <= row["Price"] <= 2500
+        and row["Quantity"] > 0 and row["id"] in ids
+    ]
+    assert [row["id"] for row in snapshot.rows(bits)] == [row["id"] for row in expected]
+    by_price = sorted(expected, key=lambda row: (row["Price"], row["id"]))
+    assert [row["id"] for row in snapshot.rows(bits, sort="Price")] == [row["id"] for row in by_price]
+    assert [row["id"] for row in snapshot.rows_for_ids(bits, ids)] == [pid for pid in ids if pid in {row["id"] for row in expected}]
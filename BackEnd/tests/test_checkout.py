@@ -0,0 +1,136 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from repositories import orders as orders_repo
+from repositories import products as products_repo
+from routers import Orders, Products
+from utils import cart_cache
+from utils.auth_dependency import get_current_user
+
+USER = "shopper@example.com"
+ORDER = {
+    "order_id": "ORD-1", "customer_name": "Shopper", "customer_email": USER, "customer_phone": "9999999999",
+    "address": "1 Street", "city": "Pune", "state": "MH", "pincode": "411001"
+}
+PLACED = {"id": 10, "order_id": "ORD-1", "customer_email": USER}
+ITEMS = [{"product_id": 7, "requested": 2, "available": 5, "remaining": 3, "category": "T-Shirts", "reserved": True}]
+SHORT = [
+    {"product_id": 7, "requested": 2, "available": 5, "remaining": 5, "category": "T-Shirts", "reserved": False},
+    {"product_id": 8, "requested": 4, "available": 1, "remaining": 1, "category": "Hoodies", "reserved": False},
+    {"product_id": 9, "requested": 1, "available": None, "remaining": None, "category": None, "reserved": False}
+]
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Records the side effects that must only follow a placed order / reservation"""
+    calls = {"reserved": [], "cleared": [], "rpc": []}
+    monkeypatch.setattr(Orders, "apply_stock_reservation", calls["reserved"].append)
+    monkeypatch.setattr(Products, "apply_stock_reservation", calls["reserved"].append)
+    monkeypatch.setattr(cart_cache, "cleared", calls["cleared"].append)
+    return calls
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(Orders.router, prefix="/orders")
+    app.include_router(Products.router, prefix="/products")
+    app.dependency_overrides[get_current_user] = lambda: {"sub": USER}
+    return app
+
+
+def post(app, path, json, **headers):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=json, headers=headers)
+    return asyncio.run(run())
+
+
+def checkout_returns(monkeypatch, calls, result):
+    async def checkout(user_id, order, idempotency_key):
+        calls["rpc"].append((user_id, order["order_id"], idempotency_key))
+        return result
+    monkeypatch.setattr(orders_repo, "checkout", checkout)
+
+
+def test_created_order_reserves_stock_and_clears_the_cart(app, calls, monkeypatch):
+    checkout_returns(monkeypatch, calls, {"status": "created", "order": PLACED, "items": ITEMS})
+    response = post(app, "/orders/checkout", ORDER, **{"Idempotency-Key": "retry-1"})
+    assert response.status_code == 200
+    assert response.json()["duplicate"] is False
+    assert calls["rpc"] == [(USER, "ORD-1", "retry-1")]
+    assert calls["reserved"] == [ITEMS]
+    assert calls["cleared"] == [USER]
+
+
+def test_duplicate_returns_the_placed_order_without_side_effects(app, calls, monkeypatch):
+    checkout_returns(monkeypatch, calls, {"status": "duplicate", "order": PLACED, "items": ITEMS})
+    response = post(app, "/orders/checkout", ORDER)
+    assert response.status_code == 200
+    assert response.json()["duplicate"] is True
+    assert response.json()["order_id"] == "ORD-1"
+    # Without an Idempotency-Key the order_id is the key
+    assert calls["rpc"] == [(USER, "ORD-1", "ORD-1")]
+    assert calls["reserved"] == calls["cleared"] == []
+
+
+@pytest.mark.parametrize("result, detail", [
+    ({"status": "empty_cart"}, "Cart is empty"),
+    ({"status": "conflict"}, "Order ORD-1 already exists"),
+])
+def test_rejected_checkout_has_no_side_effects(app, calls, monkeypatch, result, detail):
+    checkout_returns(monkeypatch, calls, result)
+    response = post(app, "/orders/checkout", ORDER)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert calls["reserved"] == calls["cleared"] == []
+
+
+def test_insufficient_stock_lists_every_line(app, calls, monkeypatch):
+    checkout_returns(monkeypatch, calls, {"status": "insufficient_stock", "items": SHORT})
+    response = post(app, "/orders/checkout", ORDER)
+    assert response.status_code == 400
+    body = response.json()
+    assert body["detail"] == "Insufficient stock for product(s): 8, 9"
+    assert [item["status"] for item in body["items"]] == ["ok", "insufficient", "not_found"]
+    assert calls["reserved"] == calls["cleared"] == []
+
+
+def test_unexpected_status_is_a_server_error(app, calls, monkeypatch):
+    checkout_returns(monkeypatch, calls, {"status": "mystery"})
+    assert post(app, "/orders/checkout", ORDER).status_code == 500
+    assert calls["reserved"] == calls["cleared"] == []
+
+
+def test_checkout_for_another_user_is_forbidden(app, calls, monkeypatch):
+    checkout_returns(monkeypatch, calls, {"status": "created", "order": PLACED, "items": ITEMS})
+    assert post(app, "/orders/checkout", {**ORDER, "customer_email": "other@example.com"}).status_code == 403
+    assert calls["rpc"] == []
+
+
+def reserve_returns(monkeypatch, rows):
+    async def reserve_stock(items):
+        return rows
+    monkeypatch.setattr(products_repo, "reserve_stock", reserve_stock)
+
+
+def test_reserve_stock_applies_only_a_full_reservation(app, calls, monkeypatch):
+    reserve_returns(monkeypatch, ITEMS)
+    response = post(app, "/products/reserve-stock", {"items": [{"product_id": 7, "quantity": 2}]})
+    assert response.status_code == 200
+    assert response.json()["items"] == [{"product_id": 7, "previous_quantity": 5, "reduced_by": 2, "new_quantity": 3}]
+    assert calls["reserved"] == [ITEMS]
+
+
+def test_short_reservation_takes_nothing(app, calls, monkeypatch):
+    reserve_returns(monkeypatch, SHORT)
+    items = [{"product_id": 7, "quantity": 2}, {"product_id": 8, "quantity": 4}, {"product_id": 9, "quantity": 1}]
+    response = post(app, "/products/reserve-stock", {"items": items})
+    assert response.status_code == 400
+    assert [item["status"] for item in response.json()["items"]] == ["ok", "insufficient", "not_found"]
+    assert calls["reserved"] == []
@@ -0,0 +1,28 @@
+import cleanup_uploads
+
+TABLES = {
+    "products": [{"id": 1, "Image": "/uploads/products/current.png"}, {"id": 2, "Image": "https://cdn.example/x.png"}],
+    "cart": [{"id": 1, "product_image": "http://api.example/uploads/products/in-cart.png"}, {"id": 2, "product_image": None}],
+    "orders": [
+        {"id": 1, "order_items": [{"img": "/uploads/products/ordered.png?v=2"}, {"img": None}, "not a dict"]},
+        {"id": 2, "order_items": None},
+    ],
+}
+
+
+def test_references_include_carts_and_past_orders(monkeypatch):
+    monkeypatch.setattr(cleanup_uploads, "_select_all", lambda table, columns: TABLES[table])
+    assert cleanup_uploads.referenced_uploads() == {"current.png", "in-cart.png", "ordered.png"}
+
+
+def test_no_files_are_deleted_when_references_cannot_be_read(monkeypatch, tmp_path, capsys):
+    def fail(table, columns):
+        raise RuntimeError("orders unavailable")
+
+    upload = tmp_path / "old.png"
+    upload.write_bytes(b"image")
+    monkeypatch.setattr(cleanup_uploads, "_select_all", fail)
+    monkeypatch.setattr(cleanup_uploads, "PRODUCT_UPLOAD_DIR", tmp_path)
+    cleanup_uploads.cleanup_uploads(delete=True, grace_hours=0)
+    assert upload.exists()
+    assert "Could not read image references" in capsys.readouterr().out
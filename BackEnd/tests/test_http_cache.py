@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+from fastapi import Request, Response
+
+from utils import http_cache
+from utils.cache import cache
+from utils.http_cache import ResourceVersions, conditional_get
+from utils.product_cache import (
+    PRODUCTS_RESOURCE, category_tag, invalidate_stock_change, listing_tags, product_key, product_tag
+)
+
+START = datetime(2026, 1, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(http_cache, "_now", clock)
+    monkeypatch.setattr(http_cache, "versions", ResourceVersions())
+    return clock
+
+
+def get(**headers):
+    request = Request({
+        "type": "http", "method": "GET", "path": "/products/", "query_string": b"",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+    response = Response()
+    return conditional_get(request, response, "products") or response
+
+
+def test_matching_etag_is_not_modified(clock):
+    etag = get().headers["etag"]
+    assert get(if_none_match=etag).status_code == 304
+    http_cache.versions.bump("products")
+    assert get(if_none_match=etag).status_code == 200
+
+
+def test_last_modified_waits_until_its_second_is_over(clock):
+    http_cache.versions.bump("products")
+    assert "last-modified" not in get().headers
+
+    clock.now = START + timedelta(seconds=1)
+    last_modified = get().headers["last-modified"]
+    assert last_modified == format_datetime(START.replace(microsecond=0), usegmt=True)
+    assert get(if_modified_since=last_modified).status_code == 304
+
+
+def test_two_writes_in_one_second_never_give_a_false_304(clock):
+    http_cache.versions.bump("products")
+    clock.now = START + timedelta(milliseconds=500)
+    # A client holding a date for this second (e.g. from another server) can't validate with it
+    same_second = format_datetime(START.replace(microsecond=0), usegmt=True)
+    assert get(if_modified_since=same_second).status_code == 200
+    http_cache.versions.bump("products")
+    clock.now = START + timedelta(seconds=2)
+    assert get(if_modified_since=same_second).status_code == 304
+
+
+def test_stock_change_patches_listings_and_keeps_stock_filters_until_the_boundary():
+    cache.clear()
+    tee = {"id": 1, "Category": "T-Shirts", "Quantity": 5}
+    cache.set("all", [dict(tee)], tags=[category_tag(None)])
+    cache.set("tees_page", {"products": [dict(tee)], "next_cursor": None}, tags=[category_tag("T-Shirts")])
+    cache.set("tees_in_stock", [dict(tee)], tags=listing_tags("T-Shirts", True))
+    cache.set("hoodies", [{"id": 2, "Category": "Hoodies", "Quantity": 3}], tags=[category_tag("Hoodies")])
+    cache.set(product_key(1), dict(tee), tags=[product_tag(1)])
+    etag = http_cache.versions.etag(PRODUCTS_RESOURCE)
+
+    invalidate_stock_change(1, "T-Shirts", 5, 4)
+
+    assert http_cache.versions.etag(PRODUCTS_RESOURCE) != etag
+    assert cache.get(product_key(1)) is None
+    assert cache.get("all")[0]["Quantity"] == 4
+    assert cache.get("tees_page")["products"][0]["Quantity"] == 4
+    assert cache.get("tees_in_stock")[0]["Quantity"] == 4
+    assert cache.get("hoodies")[0]["Quantity"] == 3
+
+    invalidate_stock_change(1, "T-Shirts", 4, 0)
+
+    assert cache.get("tees_in_stock") is None
+    assert cache.get("all")[0]["Quantity"] == 0
+    assert cache.get("hoodies") is not None
+    cache.clear()
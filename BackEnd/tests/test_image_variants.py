@@ -0,0 +1,93 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import UnidentifiedImageError
+
+from utils import image_variants
+from utils.cache import cache
+from utils.image_variants import (
+    MANIFEST_DIR, PRODUCT_UPLOAD_DIR, PRODUCT_UPLOAD_URL, SrcsetMap, VariantGenerator, with_srcsets
+)
+
+MANIFEST = {
+    "source": "ab" * 12, "width": 800, "height": 600,
+    "variants": {"webp": [[320, "a-320.webp"], [640, "a-640.webp"]], "avif": [[320, "a-320.avif"]]}
+}
+
+
+def write_manifest(upload_name: str):
+    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    (MANIFEST_DIR / f"{upload_name}.json").write_text(json.dumps(MANIFEST), encoding="utf-8")
+
+
+def test_manifests_are_read_once_and_kept_out_of_the_shared_cache(monkeypatch):
+    monkeypatch.setattr(image_variants, "srcsets", SrcsetMap())
+    write_manifest("one.png")
+    reads = []
+    read = image_variants._read_local_srcsets
+    monkeypatch.setattr(image_variants, "_read_local_srcsets", lambda names: reads.append(sorted(names)) or read(names))
+
+    rows = [
+        {"id": 1, "Image": PRODUCT_UPLOAD_URL + "one.png"},
+        {"id": 2, "Image": PRODUCT_UPLOAD_URL + "one.png"},
+        {"id": 3, "Image": "https://example.com/x.png"},
+        {"id": 4, "name": "projected"},
+    ]
+    entries = len(cache)
+    first = asyncio.run(with_srcsets({"products": rows}))
+    second = asyncio.run(with_srcsets(rows))
+
+    assert reads == [["one.png"]]
+    assert len(cache) == entries
+    srcset = first["products"][0]["image_srcset"]
+    assert srcset["webp"] == "/products/image-variants/a-320.webp 320w, /products/image-variants/a-640.webp 640w"
+    assert srcset["thumbnail"] == "/products/image-variants/a-320.webp"
+    assert first["products"][2]["image_srcset"] is None
+    assert "image_srcset" not in first["products"][3]
+    assert second[1]["image_srcset"] == srcset
+
+
+def test_cloudinary_images_get_transform_srcsets(monkeypatch):
+    monkeypatch.setattr(image_variants, "srcsets", SrcsetMap())
+    url = "https://res.cloudinary.com/demo/image/upload/v1/clothing-store/products/shirt.jpg"
+    row = asyncio.run(with_srcsets({"id": 1, "Image": url}))
+    assert "/image/upload/w_160,c_limit,f_avif,q_auto/v1/clothing-store/products/shirt.jpg 160w" in row["image_srcset"]["avif"]
+
+
+def test_srcset_map_is_bounded():
+    srcsets = SrcsetMap(max_entries=2)
+    for name in ("a", "b", "c"):
+        srcsets.set(name, {"webp": name})
+    assert srcsets.lookup("a") is None
+    assert srcsets.lookup("c") == {"webp": "c"}
+
+
+def _generate(monkeypatch, error: Exception):
+    def render(*args):
+        raise error
+
+    monkeypatch.setattr(image_variants, "render_variants", render)
+    generator = VariantGenerator()
+    generator._executor = ThreadPoolExecutor(1)
+    upload = PRODUCT_UPLOAD_DIR / "broken.png"
+
+    async def scenario():
+        await generator.schedule(upload)
+        return generator.schedule(upload)
+
+    retried = asyncio.run(scenario())
+    generator._executor.shutdown()
+    return generator, retried
+
+
+def test_undecodable_upload_is_not_retried(monkeypatch):
+    generator, retried = _generate(monkeypatch, UnidentifiedImageError("not an image"))
+    assert retried is None
+    assert generator.failed == 1
+
+
+def test_transient_failure_is_retried(monkeypatch):
+    generator, retried = _generate(monkeypatch, OSError("disk full"))
+    assert retried is not None
+    assert generator.failed == 1
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from utils import jwt_utils, sessions
+from utils.jwt_utils import TokenCache, create_access_token, token_cache, verify_token
+
+CLAIMS = {"sub": "shopper@example.com", "user_id": 1, "role": "user", "name": "Shopper"}
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def test_claims_expire_with_the_token_inside_the_cache_window(monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(jwt_utils, "time", clock)
+    cache = TokenCache(max_entries=10, negative_seconds=30)
+    key = cache.digest("token")
+    cache.store_valid(key, {**CLAIMS, "exp": 1060})
+
+    clock.now = 1059.0
+    assert cache.lookup(key) == ({**CLAIMS, "exp": 1060}, False)
+    clock.now = 1060.0
+    assert cache.lookup(key) == (None, False)
+    assert cache.stats()["entries"] == 0
+
+
+def test_tokens_without_exp_are_not_cached():
+    cache = TokenCache()
+    cache.store_valid(cache.digest("token"), dict(CLAIMS))
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_token_is_rejected_and_remembered():
+    token = create_access_token(CLAIMS, expires_delta=timedelta(seconds=-1))
+    assert verify_token(token) is None
+    assert verify_token(token) is None
+    assert token_cache.stats()["negative_hits"] == 1
+
+
+def test_cache_is_bounded_least_recently_used_first():
+    cache = TokenCache(max_entries=2)
+    keys = [cache.digest(f"token-{i}") for i in range(3)]
+    cache.store_valid(keys[0], {**CLAIMS, "exp": 2 ** 40})
+    cache.store_valid(keys[1], {**CLAIMS, "exp": 2 ** 40})
+    cache.lookup(keys[0])
+    cache.store_valid(keys[2], {**CLAIMS, "exp": 2 ** 40})
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(keys[1]) == (None, False)
+    assert cache.lookup(keys[0])[0] is not None
+
+    for i in range(5):
+        cache.store_rejected(cache.digest(f"bad-{i}"))
+    assert cache.stats()["rejected_entries"] == 2
+
+
+def test_cached_claims_cannot_be_changed_by_a_caller():
+    token = create_access_token(CLAIMS)
+    verify_token(token)["role"] = "admin"
+    assert verify_token(token)["role"] == "user"
+
+
+def test_refresh_rotation_issues_claims_from_the_users_row(monkeypatch):
+    """A refreshed session never picks up the cached claims of the token it replaces"""
+    old_token = create_access_token(CLAIMS)
+    assert verify_token(old_token)["role"] == "user"
+
+    async def rotate(token_hash, new_hash, expires_at):
+        return {"status": "ok", "user_id": 1, "email": CLAIMS["sub"], "name": "Shopper", "role": "admin"}
+
+    monkeypatch.setattr(sessions.refresh_repo, "rotate", rotate)
+    new_token = asyncio.run(sessions.refresh_session("refresh"))["token"]
+    assert new_token != old_token
+    assert verify_token(new_token)["role"] == "admin"
+
+
+def test_revoked_refresh_token_gets_no_new_access_token(monkeypatch):
+    async def rotate(token_hash, new_hash, expires_at):
+        return {"status": "reused", "user_id": 1}
+
+    monkeypatch.setattr(sessions.refresh_repo, "rotate", rotate)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(sessions.refresh_session("refresh"))
+    assert excinfo.value.status_code == 401
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from utils import oidc_cache
+from utils.oidc_cache import OIDCProviderCache
+
+METADATA_URL = "https://accounts.example.test/.well-known/openid-configuration"
+JWKS_URL = "https://accounts.example.test/certs"
+
+
+class StandInProvider:
+    """Answers the discovery and JWKS URLs in-process instead of over the network"""
+
+    def __init__(self):
+        self.kids = ["key-1"]
+        self.requests = []
+        self.down = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(str(request.url))
+        if self.down:
+            return httpx.Response(503)
+        if str(request.url) == METADATA_URL:
+            return httpx.Response(200, json={"issuer": "https://accounts.example.test", "jwks_uri": JWKS_URL})
+        return httpx.Response(200, json={"keys": [{"kid": kid, "kty": "RSA"} for kid in self.kids]})
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = StandInProvider()
+    real_client = httpx.AsyncClient
+
+    def client(**kwargs):
+        return real_client(transport=httpx.MockTransport(provider.handle), **kwargs)
+
+    monkeypatch.setattr(oidc_cache.httpx, "AsyncClient", client)
+    return provider
+
+
+def kids(cache: OIDCProviderCache) -> list:
+    return [key["kid"] for key in cache.jwks["keys"]]
+
+
+def test_local_files_are_served_without_network(tmp_path):
+    metadata_file = tmp_path / "metadata.json"
+    jwks_file = tmp_path / "jwks.json"
+    metadata_file.write_text(json.dumps({"issuer": "https://stand-in.test"}))
+    jwks_file.write_text(json.dumps({"keys": [{"kid": "local-1"}]}))
+    cache = OIDCProviderCache(METADATA_URL, cache_dir=str(tmp_path), metadata_file=str(metadata_file), jwks_file=str(jwks_file))
+
+    asyncio.run(cache.load())
+    assert cache.source == "file"
+    assert cache.metadata["issuer"] == "https://stand-in.test"
+    assert not cache.stale
+    assert cache.server_metadata()["jwks"] == {"keys": [{"kid": "local-1"}]}
+
+    # A rotated key in the stand-in's JWKS file is picked up on a kid miss
+    jwks_file.write_text(json.dumps({"keys": [{"kid": "local-1"}, {"kid": "local-2"}]}))
+    assert [key["kid"] for key in asyncio.run(cache.refresh_keys("local-2"))["keys"]] == ["local-1", "local-2"]
+
+
+def test_hit_within_ttl_then_refetch_after_expiry(provider, tmp_path):
+    cache = OIDCProviderCache(METADATA_URL, ttl_seconds=60, cache_dir=str(tmp_path))
+
+    async def scenario():
+        await cache.load()
+        assert cache.source == "network"
+        fetched = len(provider.requests)
+
+        assert cache.refresh_if_stale() is False
+        await cache.load()
+        assert len(provider.requests) == fetched
+
+        provider.kids = ["key-2"]
+        cache.fetched_at = time.time() - 61
+        assert cache.refresh_if_stale() is True
+        await cache._refresh_task
+        assert len(provider.requests) == fetched + 2
+
+    asyncio.run(scenario())
+    assert kids(cache) == ["key-2"]
+    assert not cache.stale
+
+
+def test_kid_miss_refreshes_once_per_interval(provider, tmp_path):
+    cache = OIDCProviderCache(METADATA_URL, cache_dir=str(tmp_path), key_refresh_interval=60)
+
+    async def scenario():
+        await cache.load()
+        fetched = len(provider.requests)
+
+        # Known key: nothing to refresh
+        await cache.refresh_keys("key-1")
+        assert len(provider.requests) == fetched
+
+        provider.kids = ["key-1", "key-2"]
+        await cache.refresh_keys("key-2")
+        assert kids(cache) == ["key-1", "key-2"]
+        assert len(provider.requests) == fetched + 2
+
+        # A made-up kid right after doesn't hit the provider again
+        await cache.refresh_keys("bogus")
+        assert len(provider.requests) == fetched + 2
+
+    asyncio.run(scenario())
+    assert cache.stats()["key_misses"] == 1
+
+
+def test_failed_fetch_falls_back_to_the_disk_copy(provider, tmp_path):
+    asyncio.run(OIDCProviderCache(METADATA_URL, ttl_seconds=60, cache_dir=str(tmp_path)).load())
+
+    # A new process finds an expired disk copy while the provider is down
+    path = OIDCProviderCache(METADATA_URL, cache_dir=str(tmp_path)).cache_path
+    entry = json.loads(open(path).read())
+    entry["fetched_at"] -= 120
+    open(path, "w").write(json.dumps(entry))
+    provider.down = True
+
+    cache = OIDCProviderCache(METADATA_URL, ttl_seconds=60, cache_dir=str(tmp_path))
+    asyncio.run(cache.load())
+    assert cache.source == "disk"
+    assert kids(cache) == ["key-1"]
+    assert cache.stale
+    assert cache.failures == 1
+
+
+def test_failed_fetch_with_nothing_cached_raises(provider, tmp_path):
+    provider.down = True
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(OIDCProviderCache(METADATA_URL, cache_dir=str(tmp_path)).load())
+
+
+@pytest.fixture
+def google_config(tmp_path, monkeypatch):
+    """config.google_oauth_config loaded against a stand-in provider's local files"""
+    import importlib
+    from config import google_oauth_config
+
+    metadata_file = tmp_path / "google-metadata.json"
+    jwks_file = tmp_path / "google-jwks.json"
+    metadata_file.write_text(json.dumps({
+        "issuer": "https://stand-in.test",
+        "authorization_endpoint": "https://stand-in.test/auth",
+        "token_endpoint": "https://stand-in.test/token"
+    }))
+    jwks_file.write_text(json.dumps({"keys": [{"kid": "stand-in-1"}]}))
+    monkeypatch.setenv("GOOGLE_OIDC_METADATA_FILE", str(metadata_file))
+    monkeypatch.setenv("GOOGLE_OIDC_JWKS_FILE", str(jwks_file))
+    yield importlib.reload(google_oauth_config), jwks_file
+    monkeypatch.undo()
+    importlib.reload(google_oauth_config)
+
+
+def test_google_client_uses_the_stand_in_files(google_config):
+    config, jwks_file = google_config
+
+    async def scenario():
+        await config.load_google_metadata()
+        google = config.get_google_oauth()
+        assert config.google_metadata.source == "file"
+        assert google.server_metadata["issuer"] == "https://stand-in.test"
+        assert await google.fetch_jwk_set() == {"keys": [{"kid": "stand-in-1"}]}
+
+        # Authlib's refetch after an unknown kid is answered by the cache, not jwks_uri
+        jwks_file.write_text(json.dumps({"keys": [{"kid": "stand-in-2"}]}))
+        assert await google.fetch_jwk_set(force=True) == {"keys": [{"kid": "stand-in-2"}]}
+        assert google.server_metadata["jwks"] == {"keys": [{"kid": "stand-in-2"}]}
+
+    asyncio.run(scenario())
@@ -0,0 +1,133 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from postgrest import AsyncPostgrestClient
+
+from repositories.products import _apply_order, _keyset_filter
+from utils.catalog import CatalogSnapshot
+from utils.pagination import decode_cursor, encode_cursor, keyset_slice, page_metadata, sort_tuple
+
+
+def raw_cursor(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("value", [799, 12.5, None])
+def test_cursor_round_trip(value):
+    assert decode_cursor(encode_cursor(value, 42)) == (value, 42)
+
+
+@pytest.mark.parametrize("data", [
+    {"v": "1,id.gt.0", "id": 1},
+    {"v": "799)", "id": 1},
+    {"v": 799, "id": "1,Price.is.null"},
+    {"v": 799, "id": "7"},
+    {"v": 799, "id": 7.5},
+    {"v": True, "id": 1},
+    {"v": 799, "id": False},
+    {"v": [1], "id": 1},
+    {"v": 799},
+    [799, 1],
+])
+def test_cursor_with_non_numeric_parts_is_rejected(data):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(raw_cursor(data))
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "", raw_cursor({"v": 1})[:-3], "TmFO"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor)
+
+
+def test_non_finite_cursor_value_is_rejected():
+    cursor = base64.urlsafe_b64encode(b'{"v":NaN,"id":1}').decode()
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor)
+
+
+def test_keyset_filter_ascending():
+    assert _keyset_filter("Price", False, (500, 3)) == "Price.gt.500,and(Price.eq.500,id.gt.3),Price.is.null"
+    assert _keyset_filter("Price", False, (None, 3)) == "and(Price.is.null,id.gt.3)"
+    assert _keyset_filter("id", False, (3, 3)) == "id.gt.3"
+
+
+def test_keyset_filter_descending_keeps_nulls_last():
+    assert _keyset_filter("Price", True, (500, 3)) == "Price.lt.500,and(Price.eq.500,id.lt.3),Price.is.null"
+    assert _keyset_filter("Price", True, (None, 3)) == "and(Price.is.null,id.lt.3)"
+
+
+def test_keyset_filter_refuses_non_numeric_positions():
+    with pytest.raises(ValueError):
+        _keyset_filter("Price", False, ("1,id.gt.0", 1))
+    with pytest.raises(ValueError):
+        _keyset_filter("Price", False, (1, "1"))
+
+
+def _query():
+    return AsyncPostgrestClient("http://127.0.0.1:9").from_("products").select("*")
+
+
+@pytest.mark.parametrize("descending, expected", [
+    (False, "Price,id"),
+    (True, "Price.desc.nullslast,id.desc"),
+])
+def test_db_order_puts_nulls_last(descending, expected):
+    assert _apply_order(_query(), "Price", descending).params["order"] == expected
+
+
+ROWS = [
+    {"id": 1, "Price": 300, "Category": "A", "Quantity": 1},
+    {"id": 2, "Price": None, "Category": "A", "Quantity": 1},
+    {"id": 3, "Price": 100, "Category": "B", "Quantity": 0},
+    {"id": 4, "Price": 300, "Category": "B", "Quantity": 2},
+    {"id": 5, "Price": None, "Category": "B", "Quantity": 2},
+    {"id": 6, "Price": 200, "Category": "A", "Quantity": 2},
+]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_snapshot_price_order_matches_sort_tuple(descending):
+    catalog = CatalogSnapshot()
+    catalog.rebuild(ROWS)
+    rows = catalog.rows(catalog.filter(), sort="Price", descending=descending)
+    expected = sorted(ROWS, key=lambda row: sort_tuple(row["Price"], row["id"], descending))
+    assert [row["id"] for row in rows] == [row["id"] for row in expected]
+    # NULL prices last either way, newest id first when descending
+    assert [row["id"] for row in rows][-2:] == ([5, 2] if descending else [2, 5])
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_slice_pages_through_every_row_once(descending):
+    key = lambda row: sort_tuple(row["Price"], row["id"], descending)
+    rows = sorted(ROWS, key=key)
+    seen, after_key, has_more = [], None, True
+    while has_more:
+        page, has_more = keyset_slice(rows, after_key, 4, key=key)
+        seen += page
+        cursor = decode_cursor(encode_cursor(page[-1]["Price"], page[-1]["id"]))
+        after_key = sort_tuple(cursor[0], cursor[1], descending)
+    assert seen == rows
+
+
+def test_keyset_slice_only_computes_keys_for_the_search():
+    rows = [{"id": i} for i in range(1, 1025)]
+    computed = []
+
+    def key(row):
+        computed.append(row["id"])
+        return (row["id"],)
+
+    page, has_more = keyset_slice(rows, (500,), 3, key=key)
+    assert [row["id"] for row in page] == [501, 502, 503]
+    assert has_more
+    assert len(computed) <= 11
+
+
+def test_page_metadata():
+    assert page_metadata(2, 5, 11) == {
+        "page": 2, "pageSize": 5, "totalItems": 11, "totalPages": 3, "hasNext": True, "hasPrev": True
+    }
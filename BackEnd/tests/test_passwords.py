@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from repositories import users as users_repo
+from routers import Users
+from utils import passwords
+from utils.passwords import PasswordPool, PasswordPoolBusy
+
+
+def test_full_pool_sheds_with_503_and_recovers():
+    pool = PasswordPool(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordPoolBusy) as excinfo:
+            await pool.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(*running)
+        return excinfo.value, await pool.run(lambda: "hashed")
+
+    busy, result = asyncio.run(scenario())
+    assert busy.status_code == 503
+    assert busy.headers == {"Retry-After": "1"}
+    assert result == "hashed"
+    stats = pool.stats()
+    assert (stats["rejected"], stats["completed"], stats["peak_pending"]) == (1, 3, 2)
+
+
+def test_login_answers_503_when_the_pool_is_full(monkeypatch):
+    pool = PasswordPool(workers=1, max_queue=0)
+    release = threading.Event()
+    monkeypatch.setattr(passwords, "password_pool", pool)
+
+    async def get_user_by_email(email):
+        return {"id": 1, "email": email, "name": "Shopper", "role": "user", "password": "$2b$12$hash"}
+
+    monkeypatch.setattr(users_repo, "get_user_by_email", get_user_by_email)
+    app = FastAPI()
+    app.include_router(Users.router)
+
+    async def scenario():
+        blocker = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/login", json={"email": "shopper@example.com", "password": "secret"})
+        release.set()
+        await blocker
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from routers import Products
+from utils.catalog import CatalogSnapshot
+from utils.pagination import decode_cursor
+from utils.search_index import SearchIndex
+
+ROWS = [
+    {"id": 1, "name": "Batman Graphic Tee", "Category": "T-Shirts", "Price": 799, "Description": "", "Quantity": 5},
+    {"id": 2, "name": "Barca Jersey", "Category": "Jerseys", "Price": 1999, "Description": "", "Quantity": 0},
+    {"id": 3, "name": "Superhero Hoodie", "Category": "Hoodies", "Price": 1499, "Description": "batman", "Quantity": 3},
+    {"id": 4, "name": "La Pulga Tee", "Category": "T-Shirts", "Price": 699, "Description": "", "Quantity": 10},
+    {"id": 5, "name": "Plain Hoodie", "Category": "Hoodies", "Price": None, "Description": "", "Quantity": 1},
+    {"id": 6, "name": "Batman Hoodie", "Category": "Hoodies", "Price": 799, "Description": "", "Quantity": 2},
+]
+
+NO_FILTERS = {"category": None, "min_price": None, "max_price": None, "search": None, "in_stock": None}
+
+
+@pytest.fixture(autouse=True)
+def snapshot(monkeypatch):
+    catalog = CatalogSnapshot()
+    catalog.rebuild(ROWS)
+    index = SearchIndex()
+    index.rebuild(ROWS)
+    monkeypatch.setattr(Products, "catalog", catalog)
+    monkeypatch.setattr(Products, "search_index", index)
+
+
+def paging(**overrides):
+    return {"cursor": None, "after": None, "limit": None, "page": None, "page_size": None, "include_total": False, **overrides}
+
+
+def walk(filters, listing, limit):
+    """Follow next_cursor to the end, return the ids in the order served"""
+    ids, cursor = [], None
+    while True:
+        body = Products._snapshot_listing(filters, listing, paging(
+            cursor=cursor, after=decode_cursor(cursor) if cursor else None, limit=limit, include_total=True
+        ))
+        ids += [row["id"] for row in body["products"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, body["total"]
+
+
+@pytest.mark.parametrize("descending, expected", [
+    (False, [4, 1, 6, 3, 2, 5]),
+    (True, [2, 3, 6, 1, 4, 5]),
+])
+def test_price_keyset_pages(descending, expected):
+    listing = {"sort": "Price", "descending": descending, "columns": "*"}
+    assert walk(NO_FILTERS, listing, 2) == (expected, 6)
+    assert [row["id"] for row in Products._snapshot_listing(NO_FILTERS, listing, paging())] == expected
+
+
+def test_offset_pages_with_projection():
+    listing = {"sort": "id", "descending": True, "columns": "id,name"}
+    body = Products._snapshot_listing({**NO_FILTERS, "category": "Hoodies"}, listing, paging(page=2, page_size=2))
+    assert body["products"] == [{"id": 3, "name": "Superhero Hoodie"}]
+    assert body["pagination"]["totalItems"] == 3
+
+
+def test_relevance_pages_follow_search_ranking():
+    filters = {**NO_FILTERS, "search": "batman"}
+    listing = {"sort": "relevance", "descending": True, "columns": "*"}
+    ranked = [pid for pid, _ in Products.search_index.search("batman")]
+    assert walk(filters, listing, 1) == (ranked, 3)
+    # Name matches outrank the description-only match
+    assert ranked[-1] == 3
+
+
+def get(path):
+    app = FastAPI()
+    app.include_router(Products.router, prefix="/products")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(run())
+
+
+def test_facets_wait_for_the_snapshot_instead_of_loading_inline(monkeypatch):
+    reloads = []
+    monkeypatch.setattr(Products, "refresh_catalog_if_stale", lambda: reloads.append(True))
+    monkeypatch.setattr(Products, "catalog", CatalogSnapshot())
+
+    response = get("/products/facets")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(Products.FACETS_RETRY_AFTER_SECONDS)
+    # The background load was kicked off
+    assert reloads
+
+    Products.catalog.rebuild(ROWS)
+    response = get("/products/facets?category=Hoodies")
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
@@ -0,0 +1,74 @@
+import pytest
+
+from utils.search_index import SearchIndex, edit_distance
+
+PRODUCTS = [
+    {"id": 1, "name": "Denim Jacket", "Category": "Jackets", "Description": "Blue denim"},
+    {"id": 2, "name": "Batman Graphic Tee", "Category": "T-Shirts", "Description": "Black cotton tee"},
+    {"id": 3, "name": "Superhero Hoodie", "Category": "Hoodies", "Description": "Warm hoodie, batman and superman"},
+    {"id": 4, "name": "Barca Jersey", "Category": "Jerseys", "Description": "Home kit"},
+]
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.rebuild(PRODUCTS)
+    return index
+
+
+def ids(results):
+    return [pid for pid, _ in results]
+
+
+def test_exact_and_prefix_matches_rank_by_field(index):
+    assert ids(index.search("batman")) == [2, 3]
+    assert ids(index.search("hood")) == [3]
+    assert ids(index.search("batman hoodie")) == [3]
+
+
+def test_typos_are_tolerated(index):
+    assert ids(index.search("jakcet")) == [1]
+    assert ids(index.search("jersy")) == [4]
+    assert ids(index.search("supreman")) == [3]
+
+
+def test_short_terms_are_not_fuzzy(index):
+    assert index.search("tea") == []
+
+
+def test_results_are_not_capped():
+    index = SearchIndex()
+    index.rebuild({"id": pid, "name": f"Tee {pid}"} for pid in range(1, 1201))
+    assert len(index.search("tee")) == 1200
+    assert len(index.search("tee", limit=10)) == 10
+
+
+def test_incremental_updates_keep_the_vocabulary_sorted(index):
+    index.add({"id": 5, "name": "Cargo Pants", "Category": "Pants"})
+    index.add({"id": 1, "name": "Denim Vest", "Category": "Vests"})
+    index.remove(4)
+    assert index._vocab_sorted == sorted(index._postings)
+    assert ids(index.search("carg")) == [5]
+    assert ids(index.search("crago")) == [5]
+    assert all("barca" not in bucket for bucket in index._edit_buckets.values())
+    assert "barca" not in index._letter_masks
+    assert index.search("jacket") == []
+    assert index.search("barca") == []
+    assert ids(index.search("vest")) == [1]
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("jacket", "jacket", 0),
+    ("jakcet", "jacket", 1),
+    ("jacket", "jackets", 1),
+    ("jersy", "jersey", 1),
+    ("abcd", "badc", 2),
+])
+def test_edit_distance_counts_transpositions(a, b, expected):
+    assert edit_distance(a, b, 3) == expected
+
+
+def test_edit_distance_stops_past_the_limit():
+    assert edit_distance("jacket", "hoodie", 1) == 2
+    assert edit_distance("tee", "teeshirt", 2) == 3
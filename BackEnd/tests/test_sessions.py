@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from utils import sessions
+from utils.jwt_utils import verify_token
+
+
+@pytest.fixture
+def login_codes(monkeypatch):
+    """login_codes table stand-in: code_hash -> row, expiry checked like the delete filter"""
+    rows = {}
+
+    async def insert_code(code_hash, user_id, oauth_provider, expires_at):
+        rows[code_hash] = {"user_id": user_id, "oauth_provider": oauth_provider, "expires_at": expires_at}
+
+    async def take_code(code_hash):
+        row = rows.pop(code_hash, None)
+        if row and row["expires_at"] > datetime.now(timezone.utc):
+            return row
+        return None
+
+    monkeypatch.setattr(sessions.login_codes_repo, "insert_code", insert_code)
+    monkeypatch.setattr(sessions.login_codes_repo, "take_code", take_code)
+    return rows
+
+
+def test_login_code_is_single_use(login_codes):
+    code = asyncio.run(sessions.issue_login_code(1, oauth_provider="google"))
+    # Only the hash is stored
+    assert code not in login_codes and len(login_codes) == 1
+    assert asyncio.run(sessions.redeem_login_code(code)) == {"user_id": 1, "oauth_provider": "google"}
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(sessions.redeem_login_code(code))
+    assert excinfo.value.status_code == 401
+
+
+def test_unknown_login_code_is_rejected(login_codes):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(sessions.redeem_login_code("not-a-code"))
+    assert excinfo.value.status_code == 401
+
+
+def test_expired_login_code_is_rejected(login_codes, monkeypatch):
+    monkeypatch.setattr(sessions, "LOGIN_CODE_TTL_SECONDS", -1)
+    code = asyncio.run(sessions.issue_login_code(1))
+    with pytest.raises(HTTPException):
+        asyncio.run(sessions.redeem_login_code(code))
+
+
+USER = {"id": 1, "email": "shopper@example.com", "name": "Shopper", "role": "user"}
+
+
+def test_oauth_provider_survives_refresh_rotation(monkeypatch):
+    stored = {}
+
+    async def insert_token(user_id, token_hash, family_id, expires_at, oauth_provider=None):
+        stored["oauth_provider"] = oauth_provider
+
+    async def rotate(token_hash, new_hash, expires_at):
+        return {"status": "ok", "user_id": 1, "email": USER["email"], "name": "Shopper", "role": "user", **stored}
+
+    monkeypatch.setattr(sessions.refresh_repo, "insert_token", insert_token)
+    monkeypatch.setattr(sessions.refresh_repo, "rotate", rotate)
+
+    session = asyncio.run(sessions.start_session(USER, oauth_provider="google"))
+    assert stored == {"oauth_provider": "google"}
+    assert verify_token(session["token"])["oauth_provider"] == "google"
+    refreshed = asyncio.run(sessions.refresh_session(session["refresh_token"]))
+    assert verify_token(refreshed["token"])["oauth_provider"] == "google"
+
+    session = asyncio.run(sessions.start_session(USER))
+    refreshed = asyncio.run(sessions.refresh_session(session["refresh_token"]))
+    assert "oauth_provider" not in verify_token(refreshed["token"])
@@ -0,0 +1,120 @@
+import asyncio
+import gzip
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.routing import Mount
+
+from utils.static_files import IMMUTABLE, UploadFiles, _byte_range
+
+HASHED = "0123456789abcdef01234567.png"
+BODY = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / HASHED).write_bytes(BODY)
+    (tmp_path / "legacy.png").write_bytes(BODY)
+    (tmp_path / "icon.svg").write_text("<svg>" + "x" * 500 + "</svg>")
+    (tmp_path / "icon.svg.gz").write_bytes(gzip.compress((tmp_path / "icon.svg").read_bytes()))
+    return Starlette(routes=[Mount("/uploads", app=UploadFiles(directory=tmp_path))])
+
+
+def fetch(app, path, method="GET", **headers):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, headers={k.replace("_", "-"): v for k, v in headers.items()})
+    return asyncio.run(run())
+
+
+def test_byte_range_parsing():
+    assert _byte_range("bytes=0-9", 100) == (0, 9)
+    assert _byte_range("bytes=90-", 100) == (90, 99)
+    assert _byte_range("bytes=-10", 100) == (90, 99)
+    assert _byte_range("bytes=50-500", 100) == (50, 99)
+    assert _byte_range("bytes=0-1,5-6", 100) is None
+    assert _byte_range("items=0-1", 100) is None
+    assert _byte_range("bytes=9-3", 100) is None
+    with pytest.raises(HTTPException) as error:
+        _byte_range("bytes=100-", 100)
+    assert error.value.status_code == 416
+
+
+def test_full_response_and_cache_policy(assets):
+    hashed = fetch(assets, f"/uploads/{HASHED}")
+    assert hashed.status_code == 200
+    assert hashed.content == BODY
+    assert hashed.headers["cache-control"] == IMMUTABLE
+    assert hashed.headers["accept-ranges"] == "bytes"
+    assert fetch(assets, "/uploads/legacy.png").headers["cache-control"] != IMMUTABLE
+
+
+def test_range_requests(assets):
+    part = fetch(assets, f"/uploads/{HASHED}", range="bytes=10-19")
+    assert part.status_code == 206
+    assert part.content == BODY[10:20]
+    assert part.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+
+    suffix = fetch(assets, f"/uploads/{HASHED}", range="bytes=-5")
+    assert suffix.status_code == 206
+    assert suffix.content == BODY[-5:]
+
+    outside = fetch(assets, f"/uploads/{HASHED}", range=f"bytes={len(BODY)}-")
+    assert outside.status_code == 416
+    assert outside.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_if_range_only_applies_to_the_current_copy(assets):
+    etag = fetch(assets, "/uploads/legacy.png").headers["etag"]
+    assert fetch(assets, "/uploads/legacy.png", range="bytes=0-3", if_range=etag).status_code == 206
+    stale = fetch(assets, "/uploads/legacy.png", range="bytes=0-3", if_range='"stale"')
+    assert stale.status_code == 200
+    assert stale.content == BODY
+
+
+def test_conditional_requests(assets):
+    etag = fetch(assets, f"/uploads/{HASHED}").headers["etag"]
+    not_modified = fetch(assets, f"/uploads/{HASHED}", if_none_match=etag)
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert fetch(assets, f"/uploads/{HASHED}", if_none_match='"other"').status_code == 200
+
+
+def test_precompressed_sibling_and_head(assets):
+    plain = fetch(assets, "/uploads/icon.svg", accept_encoding="identity")
+    compressed = fetch(assets, "/uploads/icon.svg", accept_encoding="gzip")
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.content == plain.content
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert "content-encoding" not in fetch(assets, "/uploads/icon.svg", accept_encoding="gzip;q=0").headers
+
+    head = fetch(assets, f"/uploads/{HASHED}", method="HEAD")
+    assert head.status_code == 200
+    assert head.headers["content-length"] == str(len(BODY))
+    assert head.content == b""
+
+
+def test_zerocopy_send(assets):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            message["file"].seek(message["offset"])
+            message = {**message, "body": message["file"].read(message["count"])}
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": f"/uploads/{HASHED}", "root_path": "", "query_string": b"",
+        "headers": [(b"range", b"bytes=4-7")], "extensions": {"http.response.zerocopysend": {}}
+    }
+    asyncio.run(assets(scope, receive, send))
+    assert sent[0]["status"] == 206
+    assert sent[1]["type"] == "http.response.zerocopysend"
+    assert sent[1]["body"] == BODY[4:8]
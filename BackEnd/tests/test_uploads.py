@@ -0,0 +1,111 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, Request
+
+from utils.cdn_queue import CdnUploadQueue
+from utils.upload_index import upload_index
+from utils.uploads import MULTIPART_OVERHEAD_BYTES, PRODUCT_UPLOAD_DIR, UploadTooLarge, read_upload_form, save_upload
+
+BOUNDARY = "testboundary"
+
+
+class Upload:
+    """The part of UploadFile save_upload() reads"""
+
+    def __init__(self, data: bytes):
+        self.file = io.BytesIO(data)
+
+
+@pytest.fixture(autouse=True)
+def upload_dir():
+    PRODUCT_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def test_oversize_upload_is_rejected_without_writing():
+    before = set(PRODUCT_UPLOAD_DIR.iterdir())
+    with pytest.raises(UploadTooLarge) as excinfo:
+        asyncio.run(save_upload(Upload(b"x" * 11), ".png", limit=10))
+    assert excinfo.value.status_code == 413
+    assert set(PRODUCT_UPLOAD_DIR.iterdir()) == before
+
+
+def test_same_bytes_are_stored_once():
+    first = asyncio.run(save_upload(Upload(b"same image bytes"), ".png"))
+    second = asyncio.run(save_upload(Upload(b"same image bytes"), ".jpg"))
+    assert not first["duplicate"]
+    assert second["duplicate"]
+    assert second["local_url"] == first["local_url"]
+    assert first["path"].read_bytes() == b"same image bytes"
+    assert first["path"].name == first["sha256"][:32] + ".png"
+
+
+def multipart(data: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.png\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def upload_request(chunks, content_length=None):
+    """A Request whose body arrives in `chunks`; records how many were read"""
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    pending = list(chunks)
+    read = []
+
+    async def receive():
+        chunk = pending.pop(0) if pending else b""
+        read.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+
+    request = Request({"type": "http", "method": "POST", "path": "/", "headers": headers}, receive)
+    return request, read
+
+
+def test_upload_form_is_parsed_from_the_stream():
+    body = multipart(b"image bytes")
+    request, _ = upload_request([body[:10], body[10:]], len(body))
+
+    async def scenario():
+        form = await read_upload_form(request, limit=100)
+        try:
+            return form["file"].filename, await form["file"].read()
+        finally:
+            await form.close()
+
+    assert asyncio.run(scenario()) == ("a.png", b"image bytes")
+
+
+def test_upload_over_content_length_is_rejected_before_reading():
+    request, read = upload_request([b"x"], content_length=100 + MULTIPART_OVERHEAD_BYTES + 1)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload_form(request, limit=100))
+    assert read == []
+
+
+def test_streamed_upload_stops_once_past_the_cap():
+    body = multipart(b"x" * (4 * MULTIPART_OVERHEAD_BYTES))
+    chunks = [body[i:i + 1024] for i in range(0, len(body), 1024)]
+    request, read = upload_request(chunks)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload_form(request, limit=100))
+    assert len(read) < len(chunks) // 2
+
+
+def test_non_multipart_upload_is_a_bad_request():
+    request = Request({"type": "http", "method": "POST", "path": "/", "headers": [(b"content-type", b"application/json")]})
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(read_upload_form(request))
+    assert excinfo.value.status_code == 400
+
+
+def test_resolve_falls_back_to_the_index_cdn_url():
+    saved = asyncio.run(save_upload(Upload(b"uploaded before a restart"), ".png"))
+    queue = CdnUploadQueue()
+    assert asyncio.run(queue.resolve(saved["local_url"])) == saved["local_url"]
+    upload_index.set_cdn_url(saved["local_url"], "https://cdn.example.com/restart.png")
+    assert asyncio.run(queue.resolve(saved["local_url"])) == "https://cdn.example.com/restart.png"
+    assert asyncio.run(queue.resolve(None)) is None
@@ -10,8 +10,11 @@ from .jwt_utils import verify_token
 # HTTP Bearer scheme for Authorization header
 security = HTTPBearer()
 
+# These are async so they run on the event loop: verify_token is a cache lookup for known
+# tokens, cheaper than a threadpool hop
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
     Dependency to get current authenticated user from JWT token
     
@@ -37,7 +40,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     return payload
 
 
-def get_current_admin(current_user: dict = Depends(get_current_user)) -> dict:
+async def get_current_admin(current_user: dict = Depends(get_current_user)) -> dict:
     """
     Dependency to ensure current user is an admin
     
@@ -59,7 +62,7 @@ def get_current_admin(current_user: dict = Depends(get_current_user)) -> dict:
     return current_user
 
 
-def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))) -> Optional[dict]:
+async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))) -> Optional[dict]:
     """
     Dependency to get current user if token is provided, None otherwise
     Useful for routes that work with or without authentication
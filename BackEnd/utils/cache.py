@@ -1,42 +1,363 @@
 """
-Simple in-memory cache for backend API responses
+Bounded in-memory cache for backend API responses
+LRU eviction with per-entry TTL, capped by entry count and approximate size
+Entries can carry tags so writes invalidate only the entries that depend on them
+Concurrent misses for the same key are coalesced into a single load
+Optional stale-while-revalidate: expired entries are served while one background task refreshes them
 """
-from datetime import datetime, timedelta
-from typing import Any, Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Freshness reported by get_or_load()
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+def _approx_size(value: Any) -> int:
+    """Rough deep size in bytes of a JSON-like value (dicts, lists, scalars)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _approx_size(k) + _approx_size(v)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            size += _approx_size(item)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until", "size", "tags")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float, size: int, tags: tuple):
+        self.value = value
+        self.expires_at = expires_at
+        # Past expires_at but before stale_until the value may still be served while it refreshes
+        self.stale_until = stale_until
+        self.size = size
+        self.tags = tags
+
+
+class Watch:
+    """
+    Writes seen while a load runs (from LRUCache.watch())
+
+    Records the keys deleted and tags invalidated in the meantime so the load
+    stores only entries no write touched; unrelated writes don't discard it.
+    """
+    __slots__ = ("keys", "tags", "cleared", "__weakref__")
 
-class SimpleCache:
     def __init__(self):
-        self._cache = {}
-        self._expiry = {}
-    
-    def set(self, key: str, value: Any, ttl_seconds: int = 300):
-        """Set a value in cache with TTL (time to live)"""
-        self._cache[key] = value
-        self._expiry[key] = datetime.now() + timedelta(seconds=ttl_seconds)
-    
+        self.keys: set = set()
+        self.tags: set = set()
+        self.cleared = False
+
+    def touched(self, key: str, tags: Iterable[str]) -> bool:
+        return self.cleared or key in self.keys or not self.tags.isdisjoint(tags)
+
+
+class SingleFlight:
+    """Run at most one in-flight load per key; concurrent callers await the same result"""
+
+    def __init__(self):
+        self._inflight: dict = {}
+        self.loads = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            # Run the load as its own task so a cancelled caller doesn't cancel it for everyone else
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._done(key, t))
+            self.loads += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter was cancelled
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "loads": self.loads, "coalesced": self.coalesced}
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, sweep_interval: float = 60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._tag_index: dict = {}
+        self._lock = threading.RLock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._flight = SingleFlight()
+        # Watches of in-flight loads; dropped automatically once the load lets go of its watch
+        self._watches: "weakref.WeakSet[Watch]" = weakref.WeakSet()
+        # Strong references to background refresh tasks so they aren't garbage collected mid-flight
+        self._refreshing: set = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+        self.refresh_failures = 0
+
+    def set(self, key: str, value: Any, ttl_seconds: int = 300, tags: Iterable[str] = (), stale_seconds: int = 0):
+        """
+        Set a value in cache with TTL (time to live) and optional dependency tags
+
+        stale_seconds keeps the entry around after the TTL so get_or_load()
+        can keep serving it while a refresh runs.
+        """
+        tags = tuple(tags)
+        size = _approx_size(value)
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit - don't cache it
+                self._remove(key)
+                return
+            self._remove(key)
+            expires_at = now + ttl_seconds
+            self._entries[key] = _Entry(value, expires_at, expires_at + stale_seconds, size, tags)
+            self._bytes += size
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            self._evict_overflow()
+
+    def set_many(
+        self,
+        items: Iterable[Tuple[str, Any, Iterable[str]]],
+        ttl_seconds: int = 300,
+        stale_seconds: int = 0,
+        watch: Optional[Watch] = None
+    ) -> int:
+        """
+        Set several (key, value, tags) entries at once
+
+        If `watch` is given (from watch() before loading the values) entries whose key
+        was deleted, or one of whose tags was invalidated, since then are skipped.
+        Returns how many entries were stored.
+        """
+        stored = 0
+        with self._lock:
+            for key, value, tags in items:
+                tags = tuple(tags)
+                if watch is not None and watch.touched(key, tags):
+                    continue
+                self.set(key, value, ttl_seconds=ttl_seconds, tags=tags, stale_seconds=stale_seconds)
+                stored += 1
+        return stored
+
+    def watch(self) -> Watch:
+        """Start recording writes; take one before a load and pass it to set_many()"""
+        watch = Watch()
+        with self._lock:
+            self._watches.add(watch)
+        return watch
+
     def get(self, key: str) -> Optional[Any]:
         """Get a value from cache if not expired"""
-        if key not in self._cache:
-            return None
-        
-        if datetime.now() > self._expiry[key]:
-            # Expired, remove from cache
-            del self._cache[key]
-            del self._expiry[key]
+        value, freshness = self._lookup(key)
+        if freshness == STALE:
+            self.misses += 1
             return None
-        
-        return self._cache[key]
-    
+        return value
+
+    def _lookup(self, key: str) -> Tuple[Optional[Any], str]:
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, MISS
+
+            if now > entry.stale_until:
+                # Past hard expiry, remove from cache
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None, MISS
+
+            self._entries.move_to_end(key)
+            if now > entry.expires_at:
+                return entry.value, STALE
+
+            self.hits += 1
+            return entry.value, FRESH
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: int = 300,
+        tags: Iterable[str] = (),
+        stale_seconds: int = 0
+    ) -> Tuple[Any, str]:
+        """
+        Get a value from cache, or load it with `loader` on a miss
+
+        Returns (value, freshness) where freshness is FRESH, STALE or MISS.
+        Concurrent misses for the same key share one call to `loader`.
+        With stale_seconds > 0 an expired entry is returned immediately
+        (STALE) while a single background task reloads it, until it is
+        stale_seconds past its TTL.
+        A result is not stored if the key was deleted, or one of its tags
+        invalidated, while it loaded.
+        """
+        tags = tuple(tags)
+
+        async def load_and_store():
+            watch = self.watch()
+            result = await loader()
+            self.set_many([(key, result, tags)], ttl_seconds=ttl_seconds, stale_seconds=stale_seconds, watch=watch)
+            return result
+
+        value, freshness = self._lookup(key)
+        if freshness == FRESH:
+            return value, FRESH
+        if freshness == STALE and stale_seconds > 0:
+            self.stale_hits += 1
+            task = asyncio.ensure_future(self._refresh(key, load_and_store))
+            self._refreshing.add(task)
+            task.add_done_callback(self._refreshing.discard)
+            return value, STALE
+        if freshness == STALE:
+            self.misses += 1
+
+        return await self._flight.do(key, load_and_store), MISS
+
+    async def _refresh(self, key: str, load_and_store: Callable[[], Awaitable[Any]]):
+        # Background revalidation; on failure the stale value keeps being served until hard expiry
+        try:
+            await self._flight.do(key, load_and_store)
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.warning(f"Background refresh of cache key {key!r} failed: {e}")
+
     def delete(self, key: str):
-        """Delete a key from cache"""
-        if key in self._cache:
-            del self._cache[key]
-            del self._expiry[key]
-    
+        """Delete a key from cache (and keep an in-flight load of it from storing an older copy)"""
+        with self._lock:
+            for watch in self._watches:
+                watch.keys.add(key)
+            self._remove(key)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Delete every entry carrying any of the given tags, return how many were removed"""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tag_index.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            for watch in self._watches:
+                watch.tags.update(tags)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def patch_tags(self, tags: Iterable[str], patch: Callable[[Any], None]) -> int:
+        """
+        Apply `patch` in place to the value of every entry carrying any of the given tags
+
+        For writes small enough to fold into cached values instead of dropping them.
+        In-flight loads of entries with these tags are not stored, since they may
+        have read from before the write. Returns how many entries were patched.
+        """
+        tags = tuple(tags)
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tag_index.get(tag, set())
+            for key in keys:
+                patch(self._entries[key].value)
+            for watch in self._watches:
+                watch.tags.update(tags)
+            return len(keys)
+
     def clear(self):
         """Clear all cache"""
-        self._cache.clear()
-        self._expiry.clear()
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+            self._bytes = 0
+            for watch in self._watches:
+                watch.cleared = True
+
+    def stats(self) -> dict:
+        """Counters and current size, for the metrics endpoint"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "approx_bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_hits": self.stale_hits,
+                "refresh_failures": self.refresh_failures,
+                "tags": len(self._tag_index),
+                **self._flight.stats(),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._forget(key, entry)
+
+    def _forget(self, key: str, entry: _Entry):
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def _evict_overflow(self):
+        # Least recently used entries sit at the front of the OrderedDict
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self._forget(key, entry)
+            self.evictions += 1
+
+    def _maybe_sweep(self, now: float):
+        # Amortized cleanup: at most one full pass per sweep_interval, piggybacked on get/set
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        expired = [key for key, entry in self._entries.items() if now > entry.stale_until]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+
 
 # Global cache instance
-cache = SimpleCache()
+cache = LRUCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
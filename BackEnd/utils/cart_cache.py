@@ -0,0 +1,181 @@
+"""
+Write-through per-user cart cache
+A user's cart only changes through this API, so writes update the cached copy directly
+and reads, summaries and ownership checks are served from memory
+Entries still expire after CART_CACHE_TTL to bound staleness from writes made elsewhere
+Only the rows are cached; reads reprice them against the product catalog in one batch
+lookup and total them in the same pass
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+import os
+
+from .cache import cache
+from .catalog import products_by_id
+
+CART_CACHE_TTL = int(os.getenv("CART_CACHE_TTL", "300"))
+
+
+def cart_key(user_id: str) -> str:
+    return f"cart_{user_id}"
+
+
+# user_id -> [writes in flight, whether any of them overlapped]
+_writes: dict = {}
+
+
+async def get_cart(user_id: str) -> List[dict]:
+    """The user's cart rows, loaded from Supabase on a miss"""
+    from repositories import cart as cart_repo
+
+    items, _ = await cache.get_or_load(cart_key(user_id), lambda: cart_repo.list_items(user_id), ttl_seconds=CART_CACHE_TTL)
+    return items
+
+
+async def find_item(user_id: str, cart_item_id: int) -> Optional[dict]:
+    """The row with this id if it is in the user's cart, else None"""
+    items = await get_cart(user_id)
+    return next((item for item in items if item["id"] == cart_item_id), None)
+
+
+@contextmanager
+def writing(user_id: str):
+    """
+    Wrap a cart write and the cache update that follows it
+
+    Overlapping writes to one cart can commit in a different order than their responses
+    come back, so a write that overlapped another drops the cached cart instead of
+    patching it and the next read reloads it from Supabase.
+    """
+    state = _writes.setdefault(user_id, [0, False])
+    if state[0]:
+        state[1] = True
+    state[0] += 1
+    try:
+        yield
+    finally:
+        state[0] -= 1
+        if state[1]:
+            invalidate(user_id)
+        if not state[0]:
+            _writes.pop(user_id, None)
+
+
+def _overlapped(user_id: str) -> bool:
+    state = _writes.get(user_id)
+    return state is not None and state[1]
+
+
+def store(user_id: str, items: List[dict]):
+    """Replace the cached cart with rows just read from or written to Supabase"""
+    # delete() first so a load that started before the write can't store its older copy
+    cache.delete(cart_key(user_id))
+    if not _overlapped(user_id):
+        cache.set(cart_key(user_id), items, ttl_seconds=CART_CACHE_TTL)
+
+
+def invalidate(user_id: str):
+    cache.delete(cart_key(user_id))
+
+
+def _update(user_id: str, change: Callable[[List[dict]], Optional[List[dict]]]):
+    # Apply a write to the cached rows; if nothing is cached (or change() gives up) the
+    # entry is just dropped and the next read reloads it
+    items = cache.get(cart_key(user_id))
+    if items is None or _overlapped(user_id):
+        invalidate(user_id)
+        return
+    items = change(list(items))
+    if items is None:
+        invalidate(user_id)
+    else:
+        store(user_id, items)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def item_added(user_id: str, values: dict, cart_item_id: int, quantity: int, inserted: bool):
+    """Record an add: a new row, or the existing row's incremented quantity"""
+    def change(items):
+        now = _now()
+        if inserted:
+            return items + [{**values, "id": cart_item_id, "quantity": quantity, "created_at": now, "updated_at": now}]
+        for i, item in enumerate(items):
+            if item["id"] == cart_item_id:
+                items[i] = {**item, "quantity": quantity, "updated_at": now}
+                return items
+        return None
+    _update(user_id, change)
+
+
+def item_updated(user_id: str, cart_item_id: int, quantity: int):
+    def change(items):
+        return [{**item, "quantity": quantity, "updated_at": _now()} if item["id"] == cart_item_id else item for item in items]
+    _update(user_id, change)
+
+
+def item_removed(user_id: str, cart_item_id: int):
+    _update(user_id, lambda items: [item for item in items if item["id"] != cart_item_id])
+
+
+def cleared(user_id: str):
+    store(user_id, [])
+
+
+def _stock_status(product: Optional[dict], quantity: int) -> str:
+    if product is None:
+        return "unavailable"
+    available = product.get("Quantity") or 0
+    if available <= 0:
+        return "out_of_stock"
+    if available < quantity:
+        return "insufficient"
+    return "ok"
+
+
+async def repriced_cart(user_id: str) -> dict:
+    """
+    The user's cart priced at current product prices and checked against current stock
+
+    `product_price` is the current price; lines whose stored price differs carry
+    `price_changed` and `previous_price`, and `stock_status` is ok, insufficient,
+    out_of_stock or unavailable (product deleted). Every product is resolved in
+    one batch from the catalog snapshot / product cache - no per-line queries.
+    """
+    items = await get_cart(user_id)
+    products = await products_by_id({item["product_id"] for item in items})
+
+    repriced = []
+    total_items = total_price = price_changes = stock_issues = 0
+    for item in items:
+        product = products.get(item["product_id"])
+        stored_price = item.get("product_price")
+        current_price = product.get("Price") if product and product.get("Price") is not None else stored_price
+        status = _stock_status(product, item["quantity"])
+        line = {
+            **item,
+            "product_price": current_price,
+            "price_changed": current_price != stored_price,
+            "available_quantity": (product.get("Quantity") or 0) if product else 0,
+            "stock_status": status
+        }
+        if line["price_changed"]:
+            line["previous_price"] = stored_price
+            price_changes += 1
+        if status != "ok":
+            stock_issues += 1
+        total_items += item["quantity"]
+        total_price += (current_price or 0) * item["quantity"]
+        repriced.append(line)
+
+    return {
+        "items": repriced,
+        "total_items": total_items,
+        "total_price": total_price,
+        "items_count": len(repriced),
+        "price_changes": price_changes,
+        "stock_issues": stock_issues
+    }
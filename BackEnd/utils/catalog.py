@@ -0,0 +1,490 @@
+"""
+In-memory catalog snapshot
+Array-backed copy of the products table with per-category bitmaps and a price-sorted index,
+so product filter/sort/paginate requests are answered without a Supabase round trip.
+Rows are kept as value tuples over one shared column list and turned back into dicts only
+for the rows a request reads.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from typing import Iterable, List, Optional
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from .search_index import search_index
+from .cache import cache
+from .product_cache import (
+    invalidate_reloaded, invalidate_stock_change, product_key, cache_products,
+    PRODUCTS_CACHE_TTL, PRODUCTS_CACHE_MAX_STALE
+)
+
+logger = logging.getLogger(__name__)
+
+# Reload the whole snapshot in the background once it is this old, to pick up
+# writes made by other workers or directly in Supabase
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+
+# Width of the precomputed price histogram buckets used for facet counts
+PRICE_BUCKET_SIZE = int(os.getenv("PRICE_BUCKET_SIZE", "500"))
+
+# Stored in the price array for rows whose Price is NULL
+_NULL_PRICE = -(2 ** 62)
+
+# Stored for a column a row doesn't have
+_MISSING = object()
+
+
+# Bitmaps span every slot, so per-bit int operations (shifts, masks) copy the whole int;
+# bulk reads and builds go through its binary digits instead
+
+def _bit_flags(bits: int) -> str:
+    """Binary digits of `bits`, lowest first: flags[slot] == "1" for set slots"""
+    return bin(bits)[:1:-1]
+
+
+def _iter_bits(bits: int):
+    """Yield the positions of the set bits in `bits`, lowest first"""
+    flags = _bit_flags(bits)
+    position = flags.find("1")
+    while position != -1:
+        yield position
+        position = flags.find("1", position + 1)
+
+
+def _bits_of(slots: Iterable[int], size: int) -> int:
+    """Bitmap with the given slots (all below `size`) set"""
+    flags = bytearray(b"0" * (size + 1))
+    for slot in slots:
+        flags[slot] = 49  # "1"
+    return int(flags[::-1], 2)
+
+
+def _decode(columns: tuple, values: Optional[tuple]) -> Optional[dict]:
+    if values is None:
+        return None
+    return {name: value for name, value in zip(columns, values) if value is not _MISSING}
+
+
+class RowView(Sequence):
+    """Rows of a list of slots, built from the snapshot's value tuples as they are read"""
+
+    def __init__(self, columns: tuple, values: list, slots: List[int]):
+        self._columns = columns
+        self._values = values
+        self._slots = slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_decode(self._columns, self._values[slot]) for slot in self._slots[index]]
+        return _decode(self._columns, self._values[self._slots[index]])
+
+
+class CatalogSnapshot:
+    def __init__(self, price_bucket_size: int = PRICE_BUCKET_SIZE):
+        self.price_bucket_size = price_bucket_size
+        # Slot-indexed columns; a deleted product leaves a dead slot until the next rebuild.
+        # Each row is a tuple of values for the names in _columns (rows from before a
+        # column was added are shorter)
+        self._columns: tuple = ()
+        self._values: List[Optional[tuple]] = []
+        self._ids = array("q")
+        self._prices = array("q")
+        self._slot_of: dict = {}
+        # Bitmaps over slots
+        self._live = 0
+        self._in_stock = 0
+        self._by_category: dict = {}
+        self._by_price_bucket: dict = {}
+        # Slots ordered by (Price, id), NULL prices last; rebuilt lazily after writes
+        self._price_order: List[int] = []
+        self._price_keys: List[tuple] = []
+        self._price_dirty = False
+        self._lock = threading.RLock()
+        self.ready = False
+        self.loaded_at = float("-inf")
+
+    # ---- loading and incremental updates ----
+
+    def rebuild(self, products: Iterable[dict]) -> set:
+        """Replace the snapshot with the given full product rows, return the ids that changed"""
+        products = list(products)
+        with self._lock:
+            previous = {pid: self._row(slot) for pid, slot in self._slot_of.items()}
+            current = {product["id"]: product for product in products}
+            changed = {pid for pid in previous.keys() | current.keys() if previous.get(pid) != current.get(pid)}
+
+            self._columns = ()
+            self._values = []
+            self._ids = array("q")
+            self._prices = array("q")
+            self._slot_of = {}
+            self._live = 0
+            self._in_stock = 0
+            self._by_category = {}
+            self._by_price_bucket = {}
+            for product in sorted(products, key=lambda p: p["id"]):
+                self._append(product)
+            self._price_dirty = True
+            self.ready = True
+            self.loaded_at = time.monotonic()
+            return changed
+
+    def upsert(self, product: dict):
+        """Insert or replace a product from a full row returned by a write"""
+        with self._lock:
+            slot = self._slot_of.get(product.get("id"))
+            if slot is None:
+                self._append(product)
+            else:
+                self._clear_slot(slot)
+                self._fill_slot(slot, product)
+            self._price_dirty = True
+
+    def set_quantity(self, product_id: int, quantity: int):
+        """Apply a stock change without needing the full row"""
+        with self._lock:
+            slot = self._slot_of.get(product_id)
+            if slot is None:
+                return
+            self._values[slot] = self._encode({**self._row(slot), "Quantity": quantity})
+            if (quantity or 0) > 0:
+                self._in_stock |= 1 << slot
+            else:
+                self._in_stock &= ~(1 << slot)
+
+    def remove(self, product_id: int):
+        with self._lock:
+            slot = self._slot_of.pop(product_id, None)
+            if slot is None:
+                return
+            self._clear_slot(slot)
+            self._values[slot] = None
+            self._live &= ~(1 << slot)
+            self._price_dirty = True
+
+    # ---- queries ----
+
+    def get(self, product_id: int) -> Optional[dict]:
+        with self._lock:
+            slot = self._slot_of.get(product_id)
+            return self._row(slot) if slot is not None else None
+
+    def filter(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: Optional[bool] = None,
+        ids: Optional[Iterable[int]] = None
+    ) -> int:
+        """Bitmap of the slots matching every given predicate"""
+        with self._lock:
+            bits = self._live
+            if category:
+                bits &= self._by_category.get(category, 0)
+            if in_stock is True:
+                bits &= self._in_stock
+            elif in_stock is False:
+                bits &= ~self._in_stock
+            if ids is not None:
+                slots = (self._slot_of.get(pid) for pid in ids)
+                bits &= _bits_of((slot for slot in slots if slot is not None), len(self._values))
+            if bits and (min_price is not None or max_price is not None):
+                bits &= self._price_range(min_price, max_price)
+            return bits
+
+    def rows(self, bits: int, sort: str = "id", descending: bool = False) -> RowView:
+        """Rows for the slots in `bits`, ordered by `sort` ("id" or "Price") then id"""
+        with self._lock:
+            if sort == "Price":
+                self._refresh_price_order()
+                flags = _bit_flags(bits)
+                slots = [slot for slot in self._price_order if slot < len(flags) and flags[slot] == "1"]
+                if descending:
+                    # NULL prices stay last in both directions
+                    split = next((i for i, slot in enumerate(slots) if self._prices[slot] == _NULL_PRICE), len(slots))
+                    slots = slots[:split][::-1] + slots[split:][::-1]
+            else:
+                slots = sorted(_iter_bits(bits), key=self._ids.__getitem__, reverse=descending)
+            return RowView(self._columns, self._values, slots)
+
+    def rows_for_ids(self, bits: int, ids: Iterable[int]) -> RowView:
+        """Rows for the slots in `bits`, in the order of `ids` (e.g. search ranking)"""
+        with self._lock:
+            flags = _bit_flags(bits)
+            slots = (self._slot_of.get(pid) for pid in ids)
+            return RowView(
+                self._columns, self._values,
+                [slot for slot in slots if slot is not None and slot < len(flags) and flags[slot] == "1"]
+            )
+
+    def count(self, bits: int) -> int:
+        return bits.bit_count()
+
+    def facets(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: Optional[bool] = None,
+        ids: Optional[Iterable[int]] = None
+    ) -> dict:
+        """
+        Category, price bucket and stock counts for a filter set
+
+        Each facet is counted with every filter applied except its own, so
+        the UI can show how many items picking another value would give.
+        Counts are popcounts over the precomputed bitmaps - no rows are touched.
+        """
+        with self._lock:
+            ids = list(ids) if ids is not None else None
+            by_category = self.filter(None, min_price, max_price, in_stock, ids)
+            by_price = self.filter(category, None, None, in_stock, ids)
+            by_stock = self.filter(category, min_price, max_price, None, ids)
+            size = self.price_bucket_size
+
+            categories = {name: (bits & by_category).bit_count() for name, bits in sorted(self._by_category.items())}
+            price_buckets = []
+            for bucket, bits in sorted(self._by_price_bucket.items()):
+                price_buckets.append({
+                    "min": bucket * size,
+                    "max": (bucket + 1) * size - 1,
+                    "count": (bits & by_price).bit_count()
+                })
+            return {
+                "total": self.filter(category, min_price, max_price, in_stock, ids).bit_count(),
+                "categories": {name: n for name, n in categories.items() if n},
+                "price_buckets": [bucket for bucket in price_buckets if bucket["count"]],
+                "price_bucket_size": size,
+                "stock": {
+                    "in_stock": (by_stock & self._in_stock).bit_count(),
+                    "out_of_stock": (by_stock & ~self._in_stock).bit_count()
+                }
+            }
+
+    def categories(self) -> dict:
+        """Category -> bitmap of its slots"""
+        with self._lock:
+            return dict(self._by_category)
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    # ---- internals ----
+
+    def _append(self, product: dict):
+        slot = len(self._values)
+        self._values.append(None)
+        self._ids.append(0)
+        self._prices.append(_NULL_PRICE)
+        self._fill_slot(slot, product)
+
+    def _fill_slot(self, slot: int, product: dict):
+        pid = product["id"]
+        price = product.get("Price")
+        quantity = product.get("Quantity") or 0
+        self._values[slot] = self._encode(product)
+        self._ids[slot] = pid
+        self._prices[slot] = _NULL_PRICE if price is None else price
+        self._slot_of[pid] = slot
+        self._live |= 1 << slot
+        if quantity > 0:
+            self._in_stock |= 1 << slot
+        category = product.get("Category")
+        if category:
+            self._by_category[category] = self._by_category.get(category, 0) | (1 << slot)
+        if price is not None:
+            bucket = price // self.price_bucket_size
+            self._by_price_bucket[bucket] = self._by_price_bucket.get(bucket, 0) | (1 << slot)
+
+    def _clear_slot(self, slot: int):
+        row = self._row(slot) or {}
+        _unset(self._by_category, row.get("Category"), slot)
+        if row.get("Price") is not None:
+            _unset(self._by_price_bucket, row["Price"] // self.price_bucket_size, slot)
+        self._in_stock &= ~(1 << slot)
+
+    def _encode(self, product: dict) -> tuple:
+        extra = tuple(name for name in product if name not in self._columns)
+        if extra:
+            self._columns += extra
+        return tuple(product.get(name, _MISSING) for name in self._columns)
+
+    def _row(self, slot: int) -> Optional[dict]:
+        return _decode(self._columns, self._values[slot])
+
+    def _refresh_price_order(self):
+        if not self._price_dirty:
+            return
+        live = list(_iter_bits(self._live))
+        live.sort(key=lambda slot: (self._prices[slot] == _NULL_PRICE, self._prices[slot], self._ids[slot]))
+        self._price_order = live
+        self._price_keys = [(self._prices[slot] == _NULL_PRICE, self._prices[slot]) for slot in live]
+        self._price_dirty = False
+
+    def _price_range(self, min_price: Optional[int], max_price: Optional[int]) -> int:
+        # Binary search the price-sorted index; NULL prices never match a price filter
+        self._refresh_price_order()
+        start = 0 if min_price is None else bisect_left(self._price_keys, (False, min_price))
+        end = bisect_left(self._price_keys, (True,)) if max_price is None else bisect_right(self._price_keys, (False, max_price))
+        return _bits_of(self._price_order[start:end], len(self._values))
+
+
+def _unset(bitmaps: dict, key, slot: int):
+    """Clear `slot` in bitmaps[key], dropping the key once its bitmap is empty"""
+    if key not in bitmaps:
+        return
+    remaining = bitmaps[key] & ~(1 << slot)
+    if remaining:
+        bitmaps[key] = remaining
+    else:
+        del bitmaps[key]
+
+
+# Global snapshot, loaded at startup and kept in sync by product writes
+catalog = CatalogSnapshot()
+
+_reload_lock = asyncio.Lock()
+_reload_task: Optional[asyncio.Task] = None
+# Writes applied while a reload is fetching rows; replayed on top of the fresh rows
+_journal: Optional[list] = None
+
+
+async def load_catalog():
+    """Load every product into the snapshot and rebuild the search index from the same rows"""
+    global _journal
+    from repositories import products as products_repo
+
+    async with _reload_lock:
+        _journal = []
+        try:
+            products = await products_repo.list_products()
+            pending, _journal = _journal, None
+            changed = catalog.rebuild(products)
+            search_index.rebuild(products)
+            for apply, args in pending:
+                apply(*args)
+            # Picks up writes made by other workers or directly in Supabase
+            invalidate_reloaded(changed)
+        finally:
+            _journal = None
+        logger.info(f"Catalog snapshot loaded with {len(catalog)} products")
+
+
+def refresh_catalog_if_stale() -> bool:
+    """
+    Start a background reload if the snapshot is older than CATALOG_REFRESH_SECONDS
+
+    Returns True if the snapshot being served is stale.
+    """
+    global _reload_task
+    if catalog.age < CATALOG_REFRESH_SECONDS:
+        return False
+    if _reload_task is None or _reload_task.done():
+        _reload_task = asyncio.ensure_future(_background_reload())
+    return True
+
+
+async def _background_reload():
+    try:
+        await load_catalog()
+    except Exception as e:
+        logger.warning(f"Catalog snapshot reload failed: {e}")
+
+
+def snapshot_usable() -> bool:
+    """Whether the catalog snapshot is loaded and recent enough to answer reads"""
+    return catalog.ready and catalog.age < CATALOG_REFRESH_SECONDS + PRODUCTS_CACHE_MAX_STALE
+
+
+async def products_by_id(product_ids: Iterable[int]) -> dict:
+    """
+    Full product rows for the given ids, keyed by id (unknown ids are left out)
+
+    Looked up in the catalog snapshot, then the per-id cache; whatever is
+    still missing is fetched with a single `in.(...)` query and cached. Snapshot
+    misses are queried too: the product may have been created by another worker
+    (or directly in Supabase) since the last reload.
+    """
+    from repositories import products as products_repo
+
+    refresh_catalog_if_stale()
+    found = {}
+    missing = []
+    use_snapshot = snapshot_usable()
+    for pid in product_ids:
+        row = catalog.get(pid) if use_snapshot else None
+        if row is None:
+            row = cache.get(product_key(pid))
+        if row is not None:
+            found[pid] = row
+        else:
+            missing.append(pid)
+
+    if missing:
+        watch = cache.watch()
+        rows = await products_repo.list_products(ids=missing)
+        cache_products(rows, ttl_seconds=PRODUCTS_CACHE_TTL, watch=watch)
+        found.update((row["id"], row) for row in rows)
+    return found
+
+
+def upsert_product(product: dict):
+    """Apply a product insert/update to the snapshot and search index"""
+    if not product:
+        return
+    if _journal is not None:
+        _journal.append((upsert_product, (product,)))
+    catalog.upsert(product)
+    search_index.add(product)
+
+
+def remove_product(product_id: int):
+    """Apply a product delete to the snapshot and search index"""
+    if _journal is not None:
+        _journal.append((remove_product, (product_id,)))
+    catalog.remove(product_id)
+    search_index.remove(product_id)
+
+
+def set_product_quantity(product_id: int, quantity: int):
+    """Apply a stock change to the snapshot (stock isn't searchable, so the index is untouched)"""
+    if _journal is not None:
+        _journal.append((set_product_quantity, (product_id, quantity)))
+    catalog.set_quantity(product_id, quantity)
+
+
+def apply_stock_reservation(rows: list):
+    """
+    Push stock levels from reserve_stock rows into the caches and snapshot
+
+    Only the reserved products are touched.
+    """
+    for row in rows:
+        invalidate_stock_change(row["product_id"], row.get("category"), row["available"], row["remaining"])
+        set_product_quantity(row["product_id"], row["remaining"])
+
+
+def stock_shortage(rows: list) -> dict:
+    """Error body for a failed reservation: which products were short and what every line had"""
+    short = [row["product_id"] for row in rows if row["available"] is None or row["available"] < row["requested"]]
+    return {
+        "detail": f"Insufficient stock for product(s): {', '.join(map(str, short))}",
+        "items": [{
+            "product_id": row["product_id"],
+            "requested": row["requested"],
+            "available": row["available"],
+            "status": "not_found" if row["available"] is None else "insufficient" if row["product_id"] in short else "ok"
+        } for row in rows]
+    }
@@ -0,0 +1,167 @@
+"""
+Background CDN uploads
+Images are saved locally first and pushed to Cloudinary by a few worker tasks, with retries
+and exponential backoff. The local URL is served until the CDN copy exists; then every
+product pointing at it is switched to the CDN URL.
+
+The queue lives in process memory: jobs pending at shutdown are dropped, and those
+images simply stay on their (still valid) local URLs.
+"""
+from collections import OrderedDict
+from typing import Callable, Optional
+import asyncio
+import logging
+import os
+import random
+
+from .upload_index import upload_index
+from .uploads import PRODUCT_UPLOAD_URL
+
+logger = logging.getLogger(__name__)
+
+CLOUDINARY_UPLOAD_CONCURRENCY = int(os.getenv("CLOUDINARY_UPLOAD_CONCURRENCY", "2"))
+CLOUDINARY_UPLOAD_RETRIES = int(os.getenv("CLOUDINARY_UPLOAD_RETRIES", "4"))
+CLOUDINARY_RETRY_BASE_SECONDS = float(os.getenv("CLOUDINARY_RETRY_BASE_SECONDS", "1"))
+CLOUDINARY_FOLDER = "clothing-store/products"
+
+# How many recent uploads to remember for status lookups and local -> CDN URL rewrites
+MAX_TRACKED_UPLOADS = 1024
+
+
+def cloudinary_enabled() -> bool:
+    import cloudinary
+    import config.cloudinary_config  # noqa: F401  (applies the credentials on import)
+    return bool(cloudinary.config().cloud_name and cloudinary.config().api_key)
+
+
+def _upload_to_cloudinary(file_path: str) -> str:
+    from config.cloudinary_config import upload_image
+    return upload_image(file_path, folder=CLOUDINARY_FOLDER)
+
+
+async def _swap_product_images(local_url: str, cdn_url: str):
+    """Remember the CDN copy and point every product still using the local URL at it"""
+    from repositories import products as products_repo
+    from .catalog import upsert_product
+    from .product_cache import invalidate_product
+
+    # The index is synchronous SQLite; keep it off the event loop
+    await asyncio.to_thread(upload_index.set_cdn_url, local_url, cdn_url)
+    rows = await products_repo.replace_image(local_url, cdn_url)
+    for row in rows:
+        invalidate_product(row)
+        upsert_product(row)
+    if rows:
+        logger.info(f"Switched {len(rows)} product(s) from {local_url} to the CDN")
+
+
+class CdnUploadQueue:
+    """
+    Upload worker pool: at most `concurrency` uploads run at once, each retried up to
+    `retries` times with jittered exponential backoff
+    """
+
+    def __init__(
+        self,
+        upload: Callable[[str], str] = _upload_to_cloudinary,
+        on_uploaded: Callable = _swap_product_images,
+        concurrency: int = 2,
+        retries: int = 4,
+        backoff_base: float = 1.0
+    ):
+        self._upload = upload
+        self._on_uploaded = on_uploaded
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list = []
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self.uploaded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def enqueue(self, local_url: str, file_path: str) -> dict:
+        """Queue a saved file for upload; must be called from the event loop"""
+        self._start_workers()
+        job = {"status": "queued", "url": local_url, "attempts": 0}
+        self._jobs[local_url] = job
+        self._jobs.move_to_end(local_url)
+        while len(self._jobs) > MAX_TRACKED_UPLOADS:
+            self._jobs.popitem(last=False)
+        self._queue.put_nowait((local_url, file_path))
+        return dict(job)
+
+    def status(self, local_url: str) -> Optional[dict]:
+        job = self._jobs.get(local_url)
+        return dict(job) if job else None
+
+    async def resolve(self, url: Optional[str]) -> Optional[str]:
+        """The CDN URL if `url` is a local upload that has finished uploading, else `url`"""
+        job = self._jobs.get(url) if url else None
+        if job and job["status"] == "done":
+            return job["url"]
+        if url and url.startswith(PRODUCT_UPLOAD_URL):
+            # Uploads finished before a restart (or evicted from the job list)
+            return await asyncio.to_thread(upload_index.cdn_url_for, url) or url
+        return url
+
+    def stats(self) -> dict:
+        statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "concurrency": self.concurrency,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_progress": sum(1 for s in statuses if s in ("uploading", "retrying")),
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "retried": self.retried
+        }
+
+    def _start_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.ensure_future(self._worker()))
+
+    async def _worker(self):
+        while True:
+            local_url, file_path = await self._queue.get()
+            try:
+                await self._process(local_url, file_path)
+            except Exception as e:
+                logger.warning(f"CDN upload of {local_url} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, local_url: str, file_path: str):
+        job = self._jobs.get(local_url) or {"url": local_url}
+        for attempt in range(1, self.retries + 2):
+            job.update(status="uploading", attempts=attempt)
+            try:
+                # The Cloudinary SDK is blocking
+                cdn_url = await asyncio.to_thread(self._upload, file_path)
+            except Exception as e:
+                job["error"] = str(e)
+                if attempt > self.retries:
+                    job["status"] = "failed"
+                    self.failed += 1
+                    logger.warning(f"Giving up on CDN upload of {local_url} after {attempt} attempts: {e}")
+                    return
+                self.retried += 1
+                job["status"] = "retrying"
+                await asyncio.sleep(self.backoff_base * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                continue
+
+            job.pop("error", None)
+            job.update(status="done", url=cdn_url)
+            self.uploaded += 1
+            await self._on_uploaded(local_url, cdn_url)
+            return
+
+
+cdn_queue = CdnUploadQueue(
+    concurrency=CLOUDINARY_UPLOAD_CONCURRENCY,
+    retries=CLOUDINARY_UPLOAD_RETRIES,
+    backoff_base=CLOUDINARY_RETRY_BASE_SECONDS
+)
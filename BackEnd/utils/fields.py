@@ -0,0 +1,47 @@
+"""
+Sparse fieldsets
+Validates a `fields=` query parameter against a column allowlist and turns it into a Supabase select
+"""
+from fastapi import HTTPException
+from typing import Iterable, Optional
+
+PRODUCT_FIELDS = ("id", "name", "Category", "Price", "Description", "Image", "Quantity", "created_at")
+
+ORDER_FIELDS = (
+    "id", "order_id", "customer_name", "customer_email", "customer_phone",
+    "address", "city", "state", "pincode", "country", "order_items",
+    "total_items", "total_price", "status", "shipping_id", "shipping_company",
+    "order_date", "updated_at"
+)
+
+USER_FIELDS = (
+    "id", "email", "name", "phone", "role", "is_active", "created_at",
+    "google_id", "profile_picture", "oauth_provider"
+)
+
+
+def select_columns(fields: Optional[str], allowed: Iterable[str], required: Iterable[str] = ()) -> str:
+    """
+    Turn a comma-separated `fields` value into a select string
+
+    Returns "*" when fields is empty, so callers keep their full rows.
+    `required` columns are always included (e.g. the id needed for cursors).
+    Columns come back in allowlist order so equal requests share a cache key.
+
+    Raises:
+        HTTPException: 400 if a requested field is not in the allowlist
+    """
+    allowed = tuple(allowed)
+    if not fields:
+        return "*"
+
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+        )
+
+    requested |= set(required)
+    return ", ".join(column for column in allowed if column in requested)
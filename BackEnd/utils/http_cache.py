@@ -0,0 +1,111 @@
+"""
+HTTP conditional GET support
+Per-resource version counters, bumped on writes, give cheap strong ETags and Last-Modified
+dates, so unchanged resources are answered with 304 before any query or serialization
+
+Versions live in process memory: they are exact for writes made through this worker
+(the deployment runs a single uvicorn worker). A per-process nonce is mixed into every
+ETag so validators from one process are never mistaken for another's.
+
+HTTP dates only have 1-second resolution, so a Last-Modified is only sent (and only
+honoured) once its second is over; until then a second write in the same second would
+carry the same date, and the ETag alone validates.
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from typing import Optional
+import hashlib
+import secrets
+import threading
+
+# Browsers and CDNs may store these responses but must revalidate before reuse
+PUBLIC_REVALIDATE = "public, no-cache"
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class ResourceVersions:
+    def __init__(self):
+        self._versions: dict = {}
+        self._modified: dict = {}
+        self._nonce = secrets.token_hex(8)
+        self._started = _now()
+        self._lock = threading.Lock()
+
+    def bump(self, *resources: str):
+        """Record a write to each resource"""
+        now = _now()
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = self._versions.get(resource, 0) + 1
+                self._modified[resource] = now
+
+    def etag(self, *resources: str, variant: str = "") -> str:
+        """
+        Strong ETag for a representation built from the given resources
+
+        `variant` distinguishes representations of the same resources
+        (e.g. the query string of a filtered listing).
+        """
+        with self._lock:
+            parts = [self._nonce, variant] + [f"{r}={self._versions.get(r, 0)}" for r in resources]
+        return '"' + hashlib.sha1("|".join(parts).encode()).hexdigest()[:24] + '"'
+
+    def last_modified(self, *resources: str) -> datetime:
+        """Time of the latest write to any of the resources (sub-second precision)"""
+        with self._lock:
+            return max([self._started] + [self._modified[r] for r in resources if r in self._modified])
+
+
+versions = ResourceVersions()
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def conditional_get(
+    request: Request,
+    response: Response,
+    *resources: str,
+    cache_control: str = PUBLIC_REVALIDATE,
+    variant: Optional[str] = None
+) -> Optional[Response]:
+    """
+    Validate a GET against the current versions of `resources`
+
+    Returns a ready 304 response if the client's copy is current; otherwise
+    sets ETag / Last-Modified / Cache-Control on `response` and returns None.
+    The query string is used as the variant unless one is given.
+    """
+    if variant is None:
+        variant = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    etag = versions.etag(*resources, variant=variant)
+    # Only a date whose second has fully passed can vouch for every write made in it
+    last_modified = versions.last_modified(*resources).replace(microsecond=0)
+    date_usable = last_modified + timedelta(seconds=1) <= _now()
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if date_usable:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif date_usable:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                if last_modified <= parsedate_to_datetime(if_modified_since):
+                    return Response(status_code=304, headers=headers)
+            except (TypeError, ValueError):
+                pass
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,322 @@
+"""
+Responsive image variants
+Each uploaded image is resized once, in a process pool, into AVIF/WebP copies at several
+widths. Files are named by the SHA-256 of the source plus width, so identical uploads
+share variants and a name always means the same bytes (safe to cache forever).
+
+A small JSON manifest per upload (variants/manifests/<upload name>.json) maps the upload
+to its variants; product responses turn it into srcset strings, kept in their own bounded
+in-memory map so manifests are read from disk (off the event loop) only once per image.
+Cloudinary images need no local work: their srcset uses Cloudinary's on-the-fly resize
+transformations.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+
+from .http_cache import versions
+from .uploads import UPLOAD_ROOT, PRODUCT_UPLOAD_DIR, PRODUCT_UPLOAD_URL
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = UPLOAD_ROOT / "variants"
+MANIFEST_DIR = VARIANT_DIR / "manifests"
+
+IMAGE_VARIANT_WIDTHS = sorted(int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "160,320,640,960,1280").split(","))
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+# Encoder quality per format (AVIF reaches the same visual quality at a lower setting)
+FORMAT_QUALITY = {"avif": 55, "webp": 80}
+MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+VARIANT_NAME = re.compile(r"^[0-9a-f]{24}-\d{1,5}\.(avif|webp)$")
+VARIANT_URL_PREFIX = "/products/image-variants/"
+CLOUDINARY_UPLOAD = re.compile(r"^(https://res\.cloudinary\.com/[^/]+/image/upload/)(.+)$")
+
+# Version resource bumped when new variants appear (product responses embed their srcsets)
+IMAGE_VARIANTS_RESOURCE = "image_variants"
+
+SRCSET_CACHE_TTL = 3600
+# A missing manifest is rechecked after this long (generation may still be running)
+SRCSET_MISS_TTL = 60
+MAX_SRCSET_ENTRIES = 10000
+
+
+def _encoders() -> List[str]:
+    from PIL import features
+    return [fmt for fmt in ("avif", "webp") if features.check(fmt)]
+
+
+def render_variants(source_path: str, variant_dir: str, widths: List[int]) -> dict:
+    """
+    Write every variant of one image and return its manifest (runs in a worker process)
+
+    Widths at or above the source width are dropped in favour of one variant at the
+    source width, so images are never upscaled. Existing files are reused.
+    """
+    from PIL import Image, ImageOps
+
+    with open(source_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:24]
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    source_width, source_height = image.size
+    targets = [w for w in widths if w < source_width]
+    if source_width <= widths[-1] or not targets:
+        targets.append(min(source_width, widths[-1]))
+
+    manifest = {"source": digest, "width": source_width, "height": source_height, "variants": {}}
+    for fmt in _encoders():
+        entries = []
+        for width in targets:
+            name = f"{digest}-{width}.{fmt}"
+            path = os.path.join(variant_dir, name)
+            if not os.path.exists(path):
+                height = max(1, round(source_height * width / source_width))
+                resized = image if width == source_width else image.resize((width, height), Image.LANCZOS)
+                partial = f"{path}.{os.getpid()}.part"
+                resized.save(partial, format=fmt.upper(), quality=FORMAT_QUALITY[fmt])
+                os.replace(partial, path)
+            entries.append([width, name])
+        manifest["variants"][fmt] = entries
+    return manifest
+
+
+class VariantGenerator:
+    """Schedules render_variants in a process pool, at most once per upload at a time"""
+
+    def __init__(self, workers: int = 2, widths: Optional[List[int]] = None):
+        self.workers = workers
+        self.widths = widths or IMAGE_VARIANT_WIDTHS
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: dict = {}
+        # Uploads Pillow can't decode; not retried on every lookup
+        self._unreadable: set = set()
+        self.generated = 0
+        self.failed = 0
+
+    def schedule(self, upload_path: Path) -> Optional[asyncio.Task]:
+        """Start generating variants for a saved upload; must be called from the event loop"""
+        key = upload_path.name
+        if key in self._unreadable:
+            return None
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(upload_path))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    async def _generate(self, upload_path: Path):
+        from PIL import UnidentifiedImageError
+
+        if self._executor is None:
+            VARIANT_DIR.mkdir(parents=True, exist_ok=True)
+            MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+            # spawn, not fork: the server process has threads (bcrypt pool, to_thread) whose
+            # locks a forked child could inherit mid-use
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        try:
+            loop = asyncio.get_running_loop()
+            manifest = await loop.run_in_executor(
+                self._executor, render_variants, str(upload_path), str(VARIANT_DIR), self.widths
+            )
+        except UnidentifiedImageError as e:
+            self.failed += 1
+            self._unreadable.add(upload_path.name)
+            logger.warning(f"Image variants for {upload_path.name} skipped, not a readable image: {e}")
+            return None
+        except Exception as e:
+            # Transient (disk, a crashed worker...): the next lookup after SRCSET_MISS_TTL retries
+            self.failed += 1
+            if isinstance(e, BrokenProcessPool):
+                self._executor = None
+            logger.warning(f"Image variants for {upload_path.name} failed: {e}")
+            return None
+
+        await asyncio.to_thread(_write_manifest, upload_path.name, manifest)
+        self.generated += 1
+        srcsets.set(PRODUCT_UPLOAD_URL + upload_path.name, _manifest_srcset(manifest))
+        versions.bump(IMAGE_VARIANTS_RESOURCE)
+        return manifest
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "generated": self.generated,
+            "failed": self.failed,
+            "srcsets": srcsets.stats()
+        }
+
+
+variant_generator = VariantGenerator(IMAGE_VARIANT_WORKERS)
+
+
+def _write_manifest(upload_name: str, manifest: dict):
+    path = MANIFEST_DIR / f"{upload_name}.json"
+    partial = path.with_name(path.name + ".part")
+    partial.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(partial, path)
+
+
+class SrcsetMap:
+    """
+    Image URL -> srcset dict, LRU-bounded with a TTL per entry
+
+    Separate from the shared response cache so srcsets neither evict listings and carts
+    nor invalidate their in-flight loads. Only touched from the event loop.
+    """
+
+    def __init__(self, max_entries: int = MAX_SRCSET_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, image_url: str) -> Optional[dict]:
+        """The cached srcset ({} if the image has none), None if unknown or expired"""
+        entry = self._entries.get(image_url)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(image_url)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, image_url: str, srcset: dict):
+        ttl = SRCSET_CACHE_TTL if srcset else SRCSET_MISS_TTL
+        self._entries[image_url] = (time.monotonic() + ttl, srcset)
+        self._entries.move_to_end(image_url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+srcsets = SrcsetMap()
+
+
+def _manifest_srcset(manifest: dict) -> dict:
+    srcset = {}
+    for fmt, entries in manifest["variants"].items():
+        if entries:
+            srcset[fmt] = ", ".join(f"{VARIANT_URL_PREFIX}{name} {width}w" for width, name in entries)
+    webp = manifest["variants"].get("webp") or []
+    if webp:
+        srcset["thumbnail"] = VARIANT_URL_PREFIX + webp[0][1]
+    return srcset
+
+
+def _read_local_srcsets(upload_names: List[str]) -> dict:
+    """
+    upload name -> (srcset, needs_variants) for each name; blocking file reads, run in a thread
+
+    needs_variants marks uploads without a manifest (e.g. from before variants existed).
+    """
+    found = {}
+    for upload_name in upload_names:
+        try:
+            manifest = json.loads((MANIFEST_DIR / f"{upload_name}.json").read_text(encoding="utf-8"))
+            found[upload_name] = (_manifest_srcset(manifest), False)
+        except (OSError, ValueError, KeyError):
+            found[upload_name] = ({}, (PRODUCT_UPLOAD_DIR / upload_name).is_file())
+    return found
+
+
+def _cloudinary_srcset(prefix: str, rest: str) -> dict:
+    def url(width: int, fmt: str) -> str:
+        return f"{prefix}w_{width},c_limit,f_{fmt},q_auto/{rest}"
+
+    srcset = {
+        fmt: ", ".join(f"{url(width, fmt)} {width}w" for width in IMAGE_VARIANT_WIDTHS)
+        for fmt in ("avif", "webp")
+    }
+    srcset["thumbnail"] = url(IMAGE_VARIANT_WIDTHS[0], "webp")
+    return srcset
+
+
+def _remote_srcset(image_url: str) -> dict:
+    cloudinary = CLOUDINARY_UPLOAD.match(image_url)
+    return _cloudinary_srcset(*cloudinary.groups()) if cloudinary else {}
+
+
+async def load_srcsets(image_urls) -> None:
+    """Make sure every URL has a srcset entry; unknown local uploads are read in one thread hop"""
+    local = []
+    for image_url in set(image_urls):
+        if not image_url or srcsets.lookup(image_url) is not None:
+            continue
+        if image_url.startswith(PRODUCT_UPLOAD_URL):
+            local.append(image_url[len(PRODUCT_UPLOAD_URL):])
+        else:
+            srcsets.set(image_url, _remote_srcset(image_url))
+    if not local:
+        return
+
+    for upload_name, (srcset, needs_variants) in (await asyncio.to_thread(_read_local_srcsets, local)).items():
+        srcsets.set(PRODUCT_UPLOAD_URL + upload_name, srcset)
+        if needs_variants:
+            # Generated on first sight; responses pick them up once the version bumps
+            variant_generator.schedule(PRODUCT_UPLOAD_DIR / upload_name)
+
+
+def image_srcset(image_url: Optional[str]) -> Optional[dict]:
+    """
+    srcset strings for a product image: {"avif": ..., "webp": ..., "thumbnail": url}
+
+    None when no variants exist (yet) - e.g. an external URL, or a local upload
+    whose variants are still being generated - or when load_srcsets() hasn't seen it.
+    """
+    if not image_url:
+        return None
+    return srcsets.lookup(image_url) or None
+
+
+def _image_urls(result) -> list:
+    if isinstance(result, dict) and "products" in result:
+        return _image_urls(result["products"])
+    if isinstance(result, list):
+        return [row["Image"] for row in result if isinstance(row, dict) and row.get("Image")]
+    if isinstance(result, dict) and result.get("Image"):
+        return [result["Image"]]
+    return []
+
+
+def _attach_srcsets(result):
+    if isinstance(result, dict) and "products" in result:
+        return {**result, "products": _attach_srcsets(result["products"])}
+    if isinstance(result, list):
+        return [_attach_srcsets(row) for row in result]
+    if isinstance(result, dict) and "Image" in result:
+        return {**result, "image_srcset": image_srcset(result["Image"])}
+    return result
+
+
+async def with_srcsets(result):
+    """Copy product rows (a list, or a page dict with "products") adding `image_srcset`"""
+    await load_srcsets(_image_urls(result))
+    return _attach_srcsets(result)
+
+
+def variant_path(name: str) -> Optional[Path]:
+    """Path of a variant file, None for names that aren't variant names"""
+    return VARIANT_DIR / name if VARIANT_NAME.match(name) else None
@@ -1,19 +1,120 @@
 """
 JWT Token Utilities
 Handles JWT token creation and verification
+Verified claims are cached per token (until exp) so repeat requests skip signature checks
 """
 from jose import jwt, JWTError
-from datetime import datetime, timedelta
-from typing import Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import hashlib
+import logging
 import os
+import secrets
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-change-this-in-production")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))  # 24 hours
+# Access tokens are short-lived; clients renew them with a refresh token (see utils/sessions.py)
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+# Verified-token cache: how many tokens to remember, and how long a rejected token is
+# answered from memory before it is checked again
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "4096"))
+TOKEN_NEGATIVE_CACHE_SECONDS = int(os.getenv("JWT_NEGATIVE_CACHE_SECONDS", "30"))
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified token claims keyed by a SHA-256 digest of the token
+
+    Positive entries are valid until the token's own `exp`, so a hit returns
+    exactly what a fresh verification would. Rejected tokens are remembered
+    for a short while so a client retrying a bad token doesn't cost a decode each time.
+    """
+
+    def __init__(self, max_entries: int = 4096, negative_seconds: int = 30):
+        self.max_entries = max_entries
+        self.negative_seconds = negative_seconds
+        self._valid: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._rejected: "OrderedDict[bytes, float]" = OrderedDict()
+        # Dependencies may run in the threadpool
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def lookup(self, key: bytes):
+        """(claims, rejected): cached claims, or rejected=True for a cached failure"""
+        now = time.time()
+        with self._lock:
+            entry = self._valid.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._valid.move_to_end(key)
+                    self.hits += 1
+                    return claims, False
+                del self._valid[key]
+
+            rejected_until = self._rejected.get(key)
+            if rejected_until is not None:
+                if now < rejected_until:
+                    self.negative_hits += 1
+                    return None, True
+                del self._rejected[key]
+
+            self.misses += 1
+            return None, False
+
+    def store_valid(self, key: bytes, claims: dict):
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            # Without an expiry there is nothing to bound the entry by - don't cache
+            return
+        with self._lock:
+            self._valid[key] = (claims, expires_at)
+            self._valid.move_to_end(key)
+            while len(self._valid) > self.max_entries:
+                self._valid.popitem(last=False)
+
+    def store_rejected(self, key: bytes):
+        with self._lock:
+            self._rejected[key] = time.time() + self.negative_seconds
+            self._rejected.move_to_end(key)
+            while len(self._rejected) > self.max_entries:
+                self._rejected.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._valid.clear()
+            self._rejected.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._valid),
+                "rejected_entries": len(self._rejected),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits
+            }
+
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_NEGATIVE_CACHE_SECONDS)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -53,13 +154,40 @@ def verify_token(token: str) -> Optional[dict]:
     Returns:
         Decoded payload dict if valid, None if invalid/expired
     """
+    key = token_cache.digest(token)
+    claims, rejected = token_cache.lookup(key)
+    if rejected:
+        return None
+    if claims is not None:
+        # Copy so a caller mutating its claims can't change the cached entry
+        return dict(claims)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError as e:
-        print(f"JWT verification failed: {str(e)}")
+        logger.info(f"JWT verification failed: {str(e)}")
+        token_cache.store_rejected(key)
         return None
 
+    token_cache.store_valid(key, payload)
+    return dict(payload)
+
+
+def create_refresh_token() -> Tuple[str, str, datetime]:
+    """
+    Create an opaque refresh token
+
+    Returns (token, token_hash, expires_at); only the hash is ever stored.
+    """
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return token, hash_refresh_token(token), expires_at
+
+
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens carry 256 random bits, so a plain SHA-256 is enough (no bcrypt needed)
+    return hashlib.sha256(token.encode()).hexdigest()
+
 
 def decode_token(token: str) -> Optional[dict]:
     """
@@ -0,0 +1,229 @@
+"""
+OpenID provider metadata cache
+The discovery document and JWKS are loaded at startup and kept in memory and on disk, so
+OAuth sign-ins never wait on the provider's well-known endpoints. Entries older than the
+TTL keep being served while a background refresh replaces them. A token signed with a key
+the cached JWKS doesn't hold (the provider rotated keys) triggers an early refresh.
+
+Either document can come from a local file instead of the network (no expiry), which
+lets tests run against a stand-in provider offline.
+"""
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OIDC_CACHE_TTL = int(os.getenv("OIDC_CACHE_TTL", "21600"))  # 6 hours
+OIDC_CACHE_DIR = os.getenv("OIDC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "clothing-store-oidc"))
+OIDC_FETCH_TIMEOUT = float(os.getenv("OIDC_FETCH_TIMEOUT", "5"))
+# Minimum time between refreshes triggered by an unknown signing key id
+OIDC_KEY_REFRESH_INTERVAL = float(os.getenv("OIDC_KEY_REFRESH_INTERVAL", "60"))
+
+
+def _read_json(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class OIDCProviderCache:
+    """Discovery document + JWKS for one provider: memory, then disk, then network"""
+
+    def __init__(
+        self,
+        metadata_url: str,
+        ttl_seconds: int = OIDC_CACHE_TTL,
+        cache_dir: str = OIDC_CACHE_DIR,
+        metadata_file: Optional[str] = None,
+        jwks_file: Optional[str] = None,
+        key_refresh_interval: float = OIDC_KEY_REFRESH_INTERVAL
+    ):
+        self.metadata_url = metadata_url
+        self.ttl_seconds = ttl_seconds
+        self.key_refresh_interval = key_refresh_interval
+        self.metadata_file = metadata_file
+        self.jwks_file = jwks_file
+        self.cache_path = os.path.join(
+            cache_dir, hashlib.sha1(metadata_url.encode()).hexdigest()[:16] + ".json"
+        )
+        self.metadata: Optional[dict] = None
+        self.jwks: Optional[dict] = None
+        self.fetched_at = 0.0
+        self.source: Optional[str] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.key_misses = 0
+        self._key_refreshed_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.metadata is not None and self.jwks is not None
+
+    @property
+    def local(self) -> bool:
+        """Metadata comes from a local file and never expires"""
+        return bool(self.metadata_file)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    @property
+    def stale(self) -> bool:
+        return not self.ready or (not self.local and self.age >= self.ttl_seconds)
+
+    async def load(self) -> dict:
+        """
+        Populate the cache: local files, else a fresh disk copy, else the network
+
+        A network failure falls back to whatever copy is held (even if expired);
+        only a cache with nothing at all raises.
+        """
+        async with self._lock:
+            if self.local:
+                self._load_files()
+            elif not self._load_disk(fresh_only=True):
+                try:
+                    await self._fetch()
+                except Exception:
+                    if not (self.ready or self._load_disk(fresh_only=False)):
+                        raise
+                    self.failures += 1
+                    logger.warning(f"OIDC metadata fetch failed, serving cached copy from {self.source}")
+            return self.metadata
+
+    async def refresh(self):
+        """Re-read local files or re-fetch from the provider, keeping the old copy on failure"""
+        async with self._lock:
+            if self.local:
+                self._load_files()
+            else:
+                await self._fetch()
+
+    async def refresh_keys(self, kid: Optional[str] = None) -> dict:
+        """
+        The JWKS after a token came signed with a key it didn't hold
+
+        Refreshes early unless `kid` is already held (another request refreshed first)
+        or the last such refresh was under key_refresh_interval ago, so tokens with
+        made-up key ids can't hammer the provider. A failed refresh keeps the old keys.
+        """
+        async with self._lock:
+            if self._has_key(kid) or time.monotonic() - self._key_refreshed_at < self.key_refresh_interval:
+                return self.jwks
+            self._key_refreshed_at = time.monotonic()
+            self.key_misses += 1
+            try:
+                if self.local:
+                    self._load_files()
+                else:
+                    await self._fetch()
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"OIDC key refresh failed: {e}")
+            return self.jwks
+
+    def refresh_if_stale(self) -> bool:
+        """
+        Start a background refresh if the cached copy has expired
+
+        Returns True if the copy being served is stale.
+        """
+        if not self.stale:
+            return False
+        if self._refresh_task is None or self._refresh_task.done():
+            try:
+                self._refresh_task = asyncio.ensure_future(self._background_refresh())
+            except RuntimeError:
+                # No running event loop (called from sync code); the next async caller retries
+                pass
+        return True
+
+    async def _background_refresh(self):
+        try:
+            await (self.refresh() if self.ready else self.load())
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"OIDC metadata refresh failed: {e}")
+
+    def server_metadata(self) -> dict:
+        """Metadata in the shape Authlib keeps it: `_loaded_at` stops its own lazy fetch and `jwks` is inline"""
+        return {**self.metadata, "jwks": self.jwks, "_loaded_at": self.fetched_at}
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "source": self.source,
+            "age_seconds": round(self.age, 1) if self.ready else None,
+            "ttl_seconds": None if self.local else self.ttl_seconds,
+            "refreshes": self.refreshes,
+            "key_misses": self.key_misses,
+            "failures": self.failures
+        }
+
+    def _has_key(self, kid: Optional[str]) -> bool:
+        return kid is not None and any(key.get("kid") == kid for key in (self.jwks or {}).get("keys", ()))
+
+    def _set(self, metadata: dict, jwks: dict, fetched_at: float, source: str):
+        self.metadata = metadata
+        self.jwks = jwks
+        self.fetched_at = fetched_at
+        self.source = source
+        self.refreshes += 1
+
+    def _load_files(self):
+        metadata = _read_json(self.metadata_file)
+        metadata.pop("_loaded_at", None)
+        if self.jwks_file:
+            jwks = _read_json(self.jwks_file)
+        elif "jwks" in metadata:
+            jwks = metadata.pop("jwks")
+        else:
+            raise ValueError(f"{self.metadata_file} has no inline jwks and no JWKS file is configured")
+        self._set(metadata, jwks, time.time(), "file")
+
+    def _load_disk(self, fresh_only: bool) -> bool:
+        try:
+            entry = _read_json(self.cache_path)
+            metadata, jwks, fetched_at = entry["metadata"], entry["jwks"], float(entry["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if fresh_only and time.time() - fetched_at >= self.ttl_seconds:
+            return False
+        self._set(metadata, jwks, fetched_at, "disk")
+        return True
+
+    async def _fetch(self):
+        async with httpx.AsyncClient(timeout=OIDC_FETCH_TIMEOUT) as client:
+            response = await client.get(self.metadata_url)
+            response.raise_for_status()
+            metadata = response.json()
+            jwks = metadata.pop("jwks", None)
+            if jwks is None:
+                if not metadata.get("jwks_uri"):
+                    raise ValueError("OIDC metadata has no jwks_uri")
+                response = await client.get(metadata["jwks_uri"])
+                response.raise_for_status()
+                jwks = response.json()
+        self._set(metadata, jwks, time.time(), "network")
+        self._save_disk()
+
+    def _save_disk(self):
+        # Write-then-rename so a crash never leaves a truncated cache file behind
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": self.fetched_at, "metadata": self.metadata, "jwks": self.jwks}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write OIDC cache file {self.cache_path}: {e}")
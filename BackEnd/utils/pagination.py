@@ -0,0 +1,78 @@
+"""
+Pagination helpers
+Opaque keyset cursors and offset pagination metadata
+"""
+from bisect import bisect_right
+from fastapi import HTTPException
+from typing import Any, Callable, List, Optional
+import base64
+import json
+import math
+
+
+def encode_cursor(sort_value: Any, last_id: int) -> str:
+    """Encode the sort value and id of the last row on a page as an opaque cursor"""
+    raw = json.dumps({"v": sort_value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _is_sort_value(value: Any) -> bool:
+    # Sort columns are numeric; bool is an int subclass but never a sort value
+    if value is None:
+        return True
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return math.isfinite(value)
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor from encode_cursor() into (sort_value, last_id)
+
+    Cursors come back from clients and end up in database filters, so anything
+    but a finite number (or null) and an integer id is rejected with 400.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort_value, last_id = data["v"], data["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if type(last_id) is not int or not _is_sort_value(sort_value):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, last_id
+
+
+def page_metadata(page: int, page_size: int, total_items: Optional[int]) -> dict:
+    """Offset pagination metadata in the shape the frontend slices expect"""
+    total_items = total_items or 0
+    total_pages = (total_items + page_size - 1) // page_size
+    return {
+        "page": page,
+        "pageSize": page_size,
+        "totalItems": total_items,
+        "totalPages": total_pages,
+        "hasNext": page < total_pages,
+        "hasPrev": page > 1
+    }
+
+
+def sort_tuple(value: Any, row_id: int, descending: bool = False) -> tuple:
+    """
+    Sort key for in-memory (value, id) ordering of numeric columns
+    NULL values sort last in both directions
+    """
+    sign = -1 if descending else 1
+    return (value is None, sign * (value or 0), sign * row_id)
+
+
+def keyset_slice(rows: List, after_key: Optional[tuple], limit: int, key: Callable[[Any], tuple]) -> tuple:
+    """
+    Page through rows already ordered by `key`
+
+    Returns (rows, has_more) for the `limit` rows strictly after `after_key`.
+    The start is found by binary search, so only O(log n) keys are computed.
+    """
+    start = bisect_right(rows, after_key, key=key) if after_key is not None else 0
+    window = rows[start:start + limit + 1]
+    return window[:limit], len(window) > limit
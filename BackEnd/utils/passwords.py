@@ -0,0 +1,102 @@
+"""
+Password hashing off the event loop
+bcrypt runs in a small dedicated thread pool (it releases the GIL while hashing), with a cap
+on how much work may wait; beyond it callers get a fast 503 instead of stalling every request
+"""
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from typing import Callable
+import asyncio
+import os
+import threading
+import time
+
+# Password hashing context using bcrypt
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+
+
+class PasswordPoolBusy(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Too many sign-ins in progress, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+
+class PasswordPool:
+    """Bounded thread pool: `workers` hashes run at once, at most `max_queue` more wait"""
+
+    def __init__(self, workers: int = 2, max_queue: int = 16):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        # Submitted jobs not yet finished (running + queued)
+        self._pending = 0
+        self.peak_pending = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn: Callable, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self._pending += 1
+            self.peak_pending = max(self.peak_pending, self._pending)
+
+        submitted = time.monotonic()
+
+        def job():
+            waited = time.monotonic() - submitted
+            with self._lock:
+                self.started += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            return fn(*args)
+
+        future = self._executor.submit(job)
+        # Runs whether the job finished or was cancelled before starting
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": min(self._pending, self.workers),
+                "queued": max(0, self._pending - self.workers),
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.started * 1000, 2) if self.started else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2)
+            }
+
+
+password_pool = PasswordPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password using bcrypt with automatic salting"""
+    return await password_pool.run(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a bcrypt hash"""
+    return await password_pool.run(pwd_context.verify, plain_password, hashed_password)
@@ -0,0 +1,113 @@
+"""
+Cache tags and per-id entries for product data
+Listings are tagged with what they depend on so a product write only drops the affected entries
+Writes also bump the HTTP validator versions (ETags) of the products they touch
+"""
+from typing import Iterable, Optional
+import os
+
+from .cache import Watch, cache
+from .http_cache import versions
+
+# Listing and per-id caches: fresh for PRODUCTS_CACHE_TTL seconds, then listings are served
+# stale (while one background refresh runs) for up to PRODUCTS_CACHE_MAX_STALE more seconds
+PRODUCTS_CACHE_TTL = int(os.getenv("PRODUCTS_CACHE_TTL", "300"))
+PRODUCTS_CACHE_MAX_STALE = int(os.getenv("PRODUCTS_CACHE_MAX_STALE", "600"))
+
+# Listings without a category filter can contain any product
+ALL_CATEGORIES = "*"
+
+# Version resource covering every product listing
+PRODUCTS_RESOURCE = "products"
+
+
+def product_tag(product_id) -> str:
+    return f"product:{product_id}"
+
+
+def category_tag(category: Optional[str]) -> str:
+    return f"products:category:{category or ALL_CATEGORIES}"
+
+
+def stock_tag(category: Optional[str]) -> str:
+    return f"products:stock:{category or ALL_CATEGORIES}"
+
+
+def listing_tags(category: Optional[str], in_stock: Optional[bool]) -> list:
+    """Tags for a product listing built from the given filters"""
+    tags = [category_tag(category)]
+    if in_stock is not None:
+        tags.append(stock_tag(category))
+    return tags
+
+
+def invalidate_product(*rows: Optional[dict]) -> int:
+    """
+    Drop cached entries affected by a product write
+
+    Pass the row before and/or after the write so a category change
+    invalidates listings for both the old and the new category.
+    """
+    tags = {category_tag(None), stock_tag(None)}
+    for row in rows:
+        if not row:
+            continue
+        tags.add(product_tag(row.get("id")))
+        if row.get("Category"):
+            tags.add(category_tag(row["Category"]))
+            tags.add(stock_tag(row["Category"]))
+    versions.bump(PRODUCTS_RESOURCE, *(product_tag(row.get("id")) for row in rows if row))
+    return cache.invalidate_tags(*tags)
+
+
+def invalidate_stock_change(product_id, category: Optional[str], old_quantity: int, new_quantity: int) -> int:
+    """
+    Drop cached entries affected by a stock change
+
+    Stock-filtered listings are only dropped when the product crosses the
+    in-stock boundary. Other listings that can contain the product (its category's
+    and the unfiltered ones) keep their entries, with its Quantity patched in place.
+    """
+    tags = [product_tag(product_id)]
+    if (old_quantity > 0) != (new_quantity > 0):
+        tags += [stock_tag(None), stock_tag(category)]
+    versions.bump(PRODUCTS_RESOURCE, product_tag(product_id))
+    removed = cache.invalidate_tags(*tags)
+    cache.patch_tags(
+        [category_tag(None), category_tag(category)],
+        lambda listing: _patch_quantity(listing, product_id, new_quantity)
+    )
+    return removed
+
+
+def _patch_quantity(listing, product_id, quantity: int):
+    # Listings are a list of rows or a page dict with "products"; narrowed rows may lack Quantity
+    rows = listing.get("products", ()) if isinstance(listing, dict) else listing
+    for row in rows:
+        if row.get("id") == product_id and "Quantity" in row:
+            row["Quantity"] = quantity
+
+
+def invalidate_reloaded(product_ids: Iterable[int]) -> int:
+    """Drop per-product entries and bump versions for products a catalog reload found changed"""
+    tags = [product_tag(pid) for pid in product_ids]
+    if not tags:
+        return 0
+    versions.bump(PRODUCTS_RESOURCE, *tags)
+    return cache.invalidate_tags(*tags)
+
+
+def product_key(product_id) -> str:
+    """Cache key of a single full product row"""
+    return f"product_{product_id}"
+
+
+def cache_products(rows: Iterable[dict], ttl_seconds: int, watch: Optional[Watch] = None) -> int:
+    """
+    Store full product rows as per-id entries (tagged with their product tag)
+
+    Pass a cache.watch() taken before the rows were fetched so rows that a
+    concurrent write to the same product may have made stale are not stored.
+    """
+    entries = [(product_key(row["id"]), row, (product_tag(row["id"]),)) for row in rows if row and "id" in row]
+    return cache.set_many(entries, ttl_seconds=ttl_seconds, watch=watch)
@@ -0,0 +1,252 @@
+"""
+In-process product search index
+Inverted index over name, Category and Description with prefix and typo-tolerant matching
+(trigram similarity, or a small edit distance counting transpositions)
+"""
+from bisect import bisect_left, insort
+from typing import Iterable, List, Optional, Tuple
+import re
+import threading
+
+# How much a match in each field counts towards a product's score
+FIELD_WEIGHTS = {"name": 3.0, "Category": 2.0, "Description": 1.0}
+
+# Score multipliers by match kind
+EXACT = 1.0
+PREFIX = 0.7
+FUZZY = 0.5
+
+# Minimum trigram similarity (Dice coefficient) for a vocabulary token to count as a typo match
+FUZZY_THRESHOLD = 0.5
+
+# Edits (insert, delete, substitute, swap adjacent letters) tolerated by query term length;
+# shorter terms rely on trigram similarity alone
+EDIT_DISTANCE_MIN_LENGTH = 4
+LONG_TERM_LENGTH = 8
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> List[str]:
+    return _TOKEN_RE.findall(str(text).lower()) if text else []
+
+
+def trigrams(token: str) -> set:
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def letter_mask(token: str) -> int:
+    """Bit set of the characters in a token (tokens are [a-z0-9])"""
+    mask = 0
+    for char in token:
+        mask |= 1 << (ord(char) - 48)
+    return mask
+
+
+def max_edits(term: str) -> int:
+    if len(term) < EDIT_DISTANCE_MIN_LENGTH:
+        return 0
+    return 2 if len(term) >= LONG_TERM_LENGTH else 1
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions),
+    or limit + 1 once it is certain to exceed `limit`
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    def __init__(self):
+        # token -> {product_id: best field weight}
+        self._postings: dict = {}
+        # product_id -> tokens it was indexed under (for removal)
+        self._doc_tokens: dict = {}
+        # trigram -> vocabulary tokens containing it
+        self._trigrams: dict = {}
+        # token -> number of distinct trigrams it has
+        self._gram_counts: dict = {}
+        # (first character, length) -> vocabulary tokens, and token -> letter_mask(token),
+        # to narrow edit distance checks to plausible tokens
+        self._edit_buckets: dict = {}
+        self._letter_masks: dict = {}
+        # Vocabulary in sorted order for prefix lookups, kept sorted as tokens come and go
+        self._vocab_sorted: List[str] = []
+        self._lock = threading.RLock()
+        self.ready = False
+
+    def rebuild(self, products: Iterable[dict]):
+        """Replace the whole index with the given product rows"""
+        with self._lock:
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._trigrams.clear()
+            self._gram_counts.clear()
+            self._edit_buckets.clear()
+            self._letter_masks.clear()
+            self._vocab_sorted = []
+            for product in products:
+                self._add(product, track_vocab=False)
+            self._vocab_sorted = sorted(self._postings)
+            self.ready = True
+
+    def add(self, product: dict):
+        """Index a product, replacing any previous version of it"""
+        with self._lock:
+            self._remove(product.get("id"))
+            self._add(product)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Rank products against a free-text query
+
+        Every query token must match (exactly, as a prefix, or within typo
+        distance) for a product to be returned. Returns (product_id, score)
+        pairs, best first - every match unless `limit` is given.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = self._score_term(term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    def _score_term(self, term: str) -> dict:
+        # Best score each product gets for this query term across all matching vocabulary tokens
+        matches = {term: EXACT} if term in self._postings else {}
+
+        start = bisect_left(self._vocab_sorted, term)
+        for token in self._vocab_sorted[start:]:
+            if not token.startswith(term):
+                break
+            if token != term:
+                # Shorter completions are closer to what was typed
+                matches.setdefault(token, PREFIX * len(term) / len(token))
+
+        if len(term) >= 3:
+            term_grams = trigrams(term)
+            # Vocabulary tokens sharing a trigram with the term, and how many they share
+            shared: dict = {}
+            for gram in term_grams:
+                for token in self._trigrams.get(gram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            candidates = set(shared)
+            edits = max_edits(term)
+            if edits:
+                # A swap or two can break every shared trigram of a short word; tokens with the
+                # same first letter and a length within the edit budget are checked as well
+                for length in range(len(term) - edits, len(term) + edits + 1):
+                    candidates |= self._edit_buckets.get((term[0], length), set())
+                term_mask = letter_mask(term)
+            for token in candidates:
+                if token in matches:
+                    continue
+                similarity = 2 * shared.get(token, 0) / (len(term_grams) + self._gram_counts[token])
+                if similarity < FUZZY_THRESHOLD and edits:
+                    # Each edit adds or drops at most one distinct character, so tokens whose
+                    # character sets differ by more than `edits` can't be within reach
+                    token_mask = self._letter_masks[token]
+                    if (term_mask & ~token_mask).bit_count() > edits or (token_mask & ~term_mask).bit_count() > edits:
+                        continue
+                    distance = edit_distance(term, token, edits)
+                    if distance <= edits:
+                        similarity = max(FUZZY_THRESHOLD, 1 - distance / max(len(term), len(token)))
+                if similarity >= FUZZY_THRESHOLD:
+                    matches[token] = FUZZY * similarity
+
+        term_scores: dict = {}
+        for token, factor in matches.items():
+            for pid, weight in self._postings[token].items():
+                score = weight * factor
+                if score > term_scores.get(pid, 0.0):
+                    term_scores[pid] = score
+        return term_scores
+
+    def _add(self, product: dict, track_vocab: bool = True):
+        pid = product.get("id")
+        if pid is None:
+            return
+        tokens = set()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field)):
+                if token not in self._postings:
+                    # New vocabulary token - register its trigrams for fuzzy lookup
+                    self._postings[token] = {}
+                    if track_vocab:
+                        insort(self._vocab_sorted, token)
+                    grams = trigrams(token)
+                    for gram in grams:
+                        self._trigrams.setdefault(gram, set()).add(token)
+                    self._gram_counts[token] = len(grams)
+                    self._edit_buckets.setdefault((token[0], len(token)), set()).add(token)
+                    self._letter_masks[token] = letter_mask(token)
+                posting = self._postings[token]
+                if posting.get(pid, 0.0) < weight:
+                    posting[pid] = weight
+                tokens.add(token)
+        self._doc_tokens[pid] = tokens
+
+    def _remove(self, product_id):
+        tokens = self._doc_tokens.pop(product_id, None)
+        if not tokens:
+            return
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(product_id, None)
+            if not posting:
+                del self._postings[token]
+                position = bisect_left(self._vocab_sorted, token)
+                if position < len(self._vocab_sorted) and self._vocab_sorted[position] == token:
+                    del self._vocab_sorted[position]
+                for gram in trigrams(token):
+                    grams = self._trigrams.get(gram)
+                    if grams is not None:
+                        grams.discard(token)
+                        if not grams:
+                            del self._trigrams[gram]
+                bucket = self._edit_buckets.get((token[0], len(token)))
+                if bucket is not None:
+                    bucket.discard(token)
+                    if not bucket:
+                        del self._edit_buckets[(token[0], len(token))]
+                self._gram_counts.pop(token, None)
+                self._letter_masks.pop(token, None)
+
+# Global index instance, loaded at startup and kept in sync by product writes
+search_index = SearchIndex()
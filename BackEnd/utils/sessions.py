@@ -0,0 +1,110 @@
+"""
+Sign-in sessions
+A session is a short-lived JWT access token plus a single-use refresh token. Clients renew
+access by redeeming the refresh token (one indexed lookup) instead of re-sending the
+password, so bcrypt only runs on real sign-ins.
+
+OAuth sign-ins hand the session to the frontend through a one-time login code: the
+redirect URL carries only the code, which the frontend exchanges by POST, so the tokens
+never land in browser history, proxy logs or Referer headers. Codes live in the
+login_codes table (hashed, like refresh tokens), so any worker can redeem them, and the
+session itself is only started when the code is redeemed.
+"""
+from fastapi import HTTPException
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from repositories import login_codes as login_codes_repo
+from repositories import refresh_tokens as refresh_repo
+from .jwt_utils import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, create_refresh_token, hash_refresh_token
+import logging
+import os
+import secrets
+import uuid
+
+logger = logging.getLogger(__name__)
+
+REFRESH_FAILURES = {
+    "invalid": "Invalid refresh token",
+    "expired": "Refresh token expired, please sign in again",
+    "inactive": "Account is deactivated",
+    "reused": "Refresh token already used, please sign in again"
+}
+
+LOGIN_CODE_TTL_SECONDS = int(os.getenv("LOGIN_CODE_TTL_SECONDS", "60"))
+
+
+def _claims(user: dict, oauth_provider: Optional[str] = None) -> dict:
+    claims = {
+        "sub": user["email"],
+        "user_id": user["id"],
+        "role": user["role"],
+        "name": user["name"]
+    }
+    if oauth_provider:
+        claims["oauth_provider"] = oauth_provider
+    return claims
+
+
+def _tokens(access_token: str, refresh_token: str) -> dict:
+    return {
+        "token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+
+async def start_session(user: dict, oauth_provider: Optional[str] = None) -> dict:
+    """
+    Issue an access token and the first refresh token of a new session family
+
+    `oauth_provider` is stored with the refresh token so every refreshed access
+    token keeps the same claim.
+    """
+    refresh_token, token_hash, expires_at = create_refresh_token()
+    await refresh_repo.insert_token(user["id"], token_hash, str(uuid.uuid4()), expires_at, oauth_provider)
+    return _tokens(create_access_token(_claims(user, oauth_provider)), refresh_token)
+
+
+async def refresh_session(refresh_token: str) -> dict:
+    """
+    Trade a refresh token for a new access token and its replacement refresh token
+
+    Claims are rebuilt from the users row, so role changes and deactivation apply on
+    the next refresh; oauth_provider comes from the stored token. Raises 401 if the
+    token can't be redeemed.
+    """
+    new_token, new_hash, expires_at = create_refresh_token()
+    result = await refresh_repo.rotate(hash_refresh_token(refresh_token), new_hash, expires_at)
+    status = result.get("status")
+    if status != "ok":
+        if status == "reused":
+            logger.warning(f"Refresh token reuse for user {result.get('user_id')}, session revoked")
+        raise HTTPException(status_code=401, detail=REFRESH_FAILURES.get(status, REFRESH_FAILURES["invalid"]))
+    user = {**result, "id": result["user_id"]}
+    return _tokens(create_access_token(_claims(user, result.get("oauth_provider"))), new_token)
+
+
+async def end_session(refresh_token: str):
+    """Revoke a refresh token (sign-out)"""
+    await refresh_repo.revoke(hash_refresh_token(refresh_token))
+
+
+async def issue_login_code(user_id: int, oauth_provider: Optional[str] = None) -> str:
+    """Issue a short-lived, single-use code that starts a session for the user when redeemed"""
+    code = secrets.token_urlsafe(32)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=LOGIN_CODE_TTL_SECONDS)
+    await login_codes_repo.insert_code(hash_refresh_token(code), user_id, oauth_provider, expires_at)
+    return code
+
+
+async def redeem_login_code(code: str) -> dict:
+    """
+    The {"user_id", "oauth_provider"} behind `code`, consuming it
+
+    Raises 401 if it is unknown, already used or expired.
+    """
+    row = await login_codes_repo.take_code(hash_refresh_token(code))
+    if not row:
+        raise HTTPException(status_code=401, detail="Login code is invalid or expired, please sign in again")
+    return {"user_id": row["user_id"], "oauth_provider": row.get("oauth_provider")}
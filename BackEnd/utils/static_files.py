@@ -0,0 +1,204 @@
+"""
+Static serving for uploaded files
+Files named by their content hash (uploads and image variants) never change, so they are
+sent with a one-year immutable Cache-Control; anything else must revalidate. Every file
+gets a strong ETag (304 on If-None-Match / If-Modified-Since), single byte-range requests
+(206, If-Range aware), precompressed .br / .gz siblings for compressible types when the
+client accepts them, and zero-copy sendfile when the ASGI server offers it.
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request
+from fastapi.staticfiles import StaticFiles
+from mimetypes import guess_type
+from pathlib import Path
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from typing import Optional, Tuple
+import anyio
+import os
+import re
+import stat
+
+from .http_cache import PUBLIC_REVALIDATE
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# <sha256 prefix>.<ext> uploads and <sha256 prefix>-<width>.<ext> variants
+CONTENT_HASHED_NAME = re.compile(r"^([0-9a-f]{24,64})(-\d+)?\.[a-z0-9]+$")
+
+# Only these are worth a precompressed sibling; images are already compressed
+COMPRESSIBLE_TYPES = {"image/svg+xml", "application/json", "application/javascript", "text/css", "text/plain", "text/html"}
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+ZEROCOPY = "http.response.zerocopysend"
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive for a single `bytes=` range; None to ignore the header
+
+    Multi-range requests are answered with the whole file, which RFC 9110 allows.
+    Raises 416 for a syntactically valid range that lies outside the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(0, size - suffix), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+class AssetResponse(Response):
+    """A file response with caching validators, ranges, precompression and zero-copy send"""
+
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        request_headers: Headers,
+        method: str = "GET",
+        media_type: Optional[str] = None
+    ):
+        self.path = path
+        self.background = None
+        self.send_header_only = method.upper() == "HEAD"
+        name = os.path.basename(path)
+        self.media_type = media_type or guess_type(name)[0] or "application/octet-stream"
+        self.init_headers({})
+
+        content_hash = CONTENT_HASHED_NAME.match(name)
+        encoding = self._pick_encoding(request_headers)
+        if encoding:
+            coding, suffix = encoding
+            self.path = path + suffix
+            stat_result = os.stat(self.path)
+            self.headers["content-encoding"] = coding
+        if self.media_type in COMPRESSIBLE_TYPES:
+            self.headers["vary"] = "Accept-Encoding"
+
+        size = stat_result.st_size
+        tag = (content_hash.group(1) + (content_hash.group(2) or "")) if content_hash else f"{stat_result.st_mtime_ns:x}-{size:x}"
+        etag = f'"{tag}-{encoding[0]}"' if encoding else f'"{tag}"'
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.headers.update({
+            "etag": etag,
+            "last-modified": last_modified,
+            "cache-control": IMMUTABLE if content_hash else PUBLIC_REVALIDATE,
+            "accept-ranges": "bytes"
+        })
+
+        self.status_code = 200
+        self.offset, self.count = 0, size
+        if self._not_modified(request_headers, etag, stat_result.st_mtime):
+            self.status_code = 304
+            self.count = 0
+            for header in ("content-type", "content-encoding", "accept-ranges"):
+                if header in self.headers:
+                    del self.headers[header]
+            return
+
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_ok(request_headers.get("if-range"), etag, last_modified):
+            byte_range = _byte_range(range_header, size)
+            if byte_range:
+                start, end = byte_range
+                self.status_code = 206
+                self.offset, self.count = start, end - start + 1
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(self.count)
+
+    def _pick_encoding(self, request_headers: Headers) -> Optional[Tuple[str, str]]:
+        if self.media_type not in COMPRESSIBLE_TYPES:
+            return None
+        accept_encoding = request_headers.get("accept-encoding", "")
+        for coding, suffix in PRECOMPRESSED:
+            if _accepts(accept_encoding, coding) and os.path.isfile(self.path + suffix):
+                return coding, suffix
+        return None
+
+    @staticmethod
+    def _not_modified(request_headers: Headers, etag: str, mtime: float) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or etag in (
+                tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+            )
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _if_range_ok(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+        # A range only applies if the client's copy is still the current one
+        return if_range is None or if_range.strip() in (etag, last_modified)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if ZEROCOPY in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({"type": ZEROCOPY, "file": file, "offset": self.offset, "count": self.count, "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = self.count
+            while remaining:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def asset_response(request: Request, path: Path, media_type: Optional[str] = None) -> Response:
+    """Serve a file from an endpoint with the same headers as the /uploads mount; 404 if missing"""
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return AssetResponse(str(path), stat_result, request.headers, request.method, media_type)
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles serving AssetResponses"""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        return AssetResponse(str(full_path), stat_result, Headers(scope=scope), scope["method"])
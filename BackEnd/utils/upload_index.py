@@ -0,0 +1,92 @@
+"""
+Upload index
+SQLite table of stored uploads keyed by content hash (SHA-256): the local URL each one was
+saved under and, once the background upload finishes, its CDN URL. It is a local file, so
+duplicate detection and local -> CDN URL lookups survive restarts.
+"""
+from typing import List, Optional
+import os
+import sqlite3
+import threading
+import time
+
+# Kept outside UPLOAD_DIR, which is served publicly under /uploads
+UPLOAD_INDEX_PATH = os.getenv("UPLOAD_INDEX_PATH", "data/upload_index.sqlite3")
+
+SCHEMA = """
+create table if not exists uploads (
+  sha256 text primary key,
+  local_url text not null,
+  cdn_url text,
+  size integer not null,
+  created_at real not null
+);
+create index if not exists uploads_local_url on uploads (local_url);
+"""
+
+
+class UploadIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # One connection shared by the event loop and upload threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma journal_mode=wal")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, sha256: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection().execute("select * from uploads where sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(row)
+
+    def record(self, sha256: str, local_url: str, size: int):
+        """Store a new upload (replacing an entry whose files were gone)"""
+        with self._lock:
+            self._connection().execute(
+                "insert into uploads (sha256, local_url, cdn_url, size, created_at) values (?, ?, null, ?, ?) "
+                "on conflict (sha256) do update set local_url = excluded.local_url, cdn_url = null, "
+                "size = excluded.size, created_at = excluded.created_at",
+                (sha256, local_url, size, time.time())
+            )
+
+    def set_cdn_url(self, local_url: str, cdn_url: str):
+        with self._lock:
+            self._connection().execute("update uploads set cdn_url = ? where local_url = ?", (cdn_url, local_url))
+
+    def cdn_url_for(self, local_url: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection().execute(
+                "select cdn_url from uploads where local_url = ? and cdn_url is not null", (local_url,)
+            ).fetchone()
+            return row["cdn_url"] if row else None
+
+    def forget_local(self, local_url: str):
+        """The local file was reclaimed: drop entries that had no CDN copy to fall back on"""
+        with self._lock:
+            self._connection().execute("delete from uploads where local_url = ? and cdn_url is null", (local_url,))
+
+    def entries(self) -> List[dict]:
+        with self._lock:
+            return [dict(row) for row in self._connection().execute("select * from uploads")]
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._connection().execute("select count(*) from uploads").fetchone()[0]
+        return {"entries": count, "duplicate_hits": self.hits, "misses": self.misses}
+
+
+upload_index = UploadIndex(UPLOAD_INDEX_PATH)
@@ -0,0 +1,142 @@
+"""
+Upload storage
+Upload bodies are parsed from the request stream by read_upload_form(), which rejects
+them (413) from Content-Length, or as soon as the bytes received pass MAX_UPLOAD_BYTES
+plus room for the multipart framing, so an oversized upload never fills the temp spool.
+The spooled file is then hashed (SHA-256) in fixed-size chunks, which also enforces the
+exact cap, before it is copied into the upload directory. Files are stored under their
+content hash, and the upload index maps each hash to its URLs, so a re-upload of the
+same image is answered with the existing URL instead of another disk write or CDN upload.
+"""
+from fastapi import HTTPException, Request, UploadFile
+from pathlib import Path
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+import asyncio
+import hashlib
+import os
+import uuid
+
+from .upload_index import upload_index
+
+UPLOAD_ROOT = Path(os.getenv("UPLOAD_DIR", "public/uploads"))
+PRODUCT_UPLOAD_DIR = UPLOAD_ROOT / "products"
+PRODUCT_UPLOAD_URL = "/uploads/products/"
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Allowance on top of MAX_UPLOAD_BYTES for multipart boundaries, part headers and small fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, limit: int = MAX_UPLOAD_BYTES):
+        super().__init__(status_code=413, detail=f"File too large. Maximum size is {limit // (1024 * 1024)} MB")
+
+
+class _BodyTooLarge(MultiPartException):
+    # Raised from inside the parser's stream so it closes the files it already spooled
+    pass
+
+
+async def read_upload_form(request: Request, limit: int = MAX_UPLOAD_BYTES) -> FormData:
+    """
+    Parse a multipart/form-data upload straight from the request stream
+
+    Raises 413 (UploadTooLarge) before reading anything when Content-Length is over
+    the cap, or mid-stream once that many bytes have arrived; 400 for a malformed body.
+    The caller closes the returned form.
+    """
+    body_limit = limit + MULTIPART_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > body_limit:
+        raise UploadTooLarge(limit)
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    async def capped_stream():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > body_limit:
+                raise _BodyTooLarge("Upload too large")
+            yield chunk
+
+    try:
+        return await MultiPartParser(request.headers, capped_stream(), max_files=1, max_fields=10).parse()
+    except _BodyTooLarge:
+        raise UploadTooLarge(limit)
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+def _hash_capped(source, limit: int):
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := source.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLarge(limit)
+        digest.update(chunk)
+    return digest.hexdigest(), size
+
+
+def _copy(source, destination: Path):
+    # Write to a unique temp name and rename, so a failed upload never leaves a file that
+    # looks complete and two concurrent uploads of the same image don't share a temp file
+    partial = destination.with_name(f"{destination.name}.{uuid.uuid4().hex}.part")
+    try:
+        with open(partial, "wb") as out:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                out.write(chunk)
+        os.replace(partial, destination)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+
+def _store(source, extension: str, limit: int) -> dict:
+    source.seek(0)
+    sha256, size = _hash_capped(source, limit)
+
+    existing = upload_index.lookup(sha256)
+    if existing:
+        local_path = PRODUCT_UPLOAD_DIR / existing["local_url"][len(PRODUCT_UPLOAD_URL):]
+        if existing["cdn_url"] or local_path.is_file():
+            return {
+                "path": local_path,
+                "local_url": existing["local_url"],
+                "cdn_url": existing["cdn_url"],
+                "sha256": sha256,
+                "size": size,
+                "duplicate": True
+            }
+
+    destination = PRODUCT_UPLOAD_DIR / f"{sha256[:32]}{extension}"
+    if not destination.is_file():
+        source.seek(0)
+        _copy(source, destination)
+    local_url = PRODUCT_UPLOAD_URL + destination.name
+    upload_index.record(sha256, local_url, size)
+    return {
+        "path": destination,
+        "local_url": local_url,
+        "cdn_url": None,
+        "sha256": sha256,
+        "size": size,
+        "duplicate": False
+    }
+
+
+async def save_upload(file: UploadFile, extension: str, limit: int = MAX_UPLOAD_BYTES) -> dict:
+    """
+    Store an uploaded product image unless the same bytes were uploaded before
+
+    Returns {"path", "local_url", "cdn_url", "sha256", "size", "duplicate"};
+    for a duplicate, cdn_url is set once the earlier upload reached the CDN.
+    """
+    # Reads of the spooled upload, hashing, disk writes and the index lookup all run off the loop
+    return await asyncio.to_thread(_store, file.file, extension, limit)
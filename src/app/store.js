@@ -1,11 +1,12 @@
 import { configureStore } from '@reduxjs/toolkit'
 import productsReducer from '../features/Slices/AddProductSlice'
-import authReducer from '../features/Slices/authSlice'
+import authReducer, { tokensRefreshed } from '../features/Slices/authSlice'
 import cartReducer from '../features/Slices/CartSlice'
 import filterReducer from '../features/Slices/filterSlice'
 import searchReducer from '../features/Slices/SearchSlice'
 import paymentReducer from '../features/Slices/PaymentFormSlice'
 import ordersReducer from '../features/Slices/OrdersSlice'
+import { onTokensRefreshed } from '../config/api'
 
 export const store = configureStore({
   reducer: {
@@ -17,4 +18,7 @@ export const store = configureStore({
     payment: paymentReducer,
     orders: ordersReducer,
   },
-})
\ No newline at end of file
+})
+
+// Keep the store's tokens in step with refreshes done inside api.js
+onTokensRefreshed((tokens) => store.dispatch(tokensRefreshed(tokens)))
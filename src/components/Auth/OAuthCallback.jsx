@@ -1,7 +1,8 @@
-import { useEffect } from 'react';
+import { useEffect, useRef } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import { useDispatch } from 'react-redux';
 import { login } from '../../features/Slices/authSlice';
+import { authApi } from '../../config/api';
 import { toast } from 'react-toastify';
 import Loader from '../Loader/Loader';
 
@@ -9,11 +10,12 @@ function OAuthCallback() {
   const [searchParams] = useSearchParams();
   const navigate = useNavigate();
   const dispatch = useDispatch();
+  // The code is single-use; don't redeem it twice if the effect re-runs
+  const redeemed = useRef(false);
 
   useEffect(() => {
-    // Extract token and user from URL parameters
-    const token = searchParams.get('token');
-    const userParam = searchParams.get('user');
+    // The backend redirects here with a one-time code (or an error)
+    const code = searchParams.get('code');
     const error = searchParams.get('error');
     const errorMessage = searchParams.get('message');
 
@@ -39,33 +41,34 @@ function OAuthCallback() {
     }
 
     // Handle successful OAuth
-    if (token && userParam) {
-      try {
-        const user = JSON.parse(decodeURIComponent(userParam));
-        
-        console.log('OAuth successful - User data:', user);
-        
-        // Store token and dispatch login action
-        dispatch(login({ user, token }));
-        
-        toast.success(`Welcome back, ${user.name}!`, { autoClose: 3000 });
-        
-        // Redirect based on role
-        if (user.role === 'admin') {
-          navigate('/admin/dashboard', { replace: true });
-        } else {
-          navigate('/', { replace: true });
-        }
-      } catch (err) {
-        console.error('Failed to parse OAuth user data:', err);
-        toast.error('Authentication failed. Please try again.', { autoClose: 5000 });
-        setTimeout(() => {
-          navigate('/login', { replace: true });
-        }, 1000);
-      }
+    if (code) {
+      if (redeemed.current) return;
+      redeemed.current = true;
+
+      authApi.exchangeOAuthCode(code)
+        .then(({ user, token, refresh_token: refreshToken }) => {
+          // Store token and dispatch login action
+          dispatch(login({ user, token, refreshToken }));
+
+          toast.success(`Welcome back, ${user.name}!`, { autoClose: 3000 });
+
+          // Redirect based on role
+          if (user.role === 'admin') {
+            navigate('/admin/dashboard', { replace: true });
+          } else {
+            navigate('/', { replace: true });
+          }
+        })
+        .catch((err) => {
+          console.error('Failed to complete OAuth sign-in:', err);
+          toast.error('Authentication failed. Please try again.', { autoClose: 5000 });
+          setTimeout(() => {
+            navigate('/login', { replace: true });
+          }, 1000);
+        });
     } else {
       // Missing required parameters
-      console.error('OAuth callback: Missing token or user data');
+      console.error('OAuth callback: Missing login code');
       toast.error('Invalid authentication response. Please try again.', { autoClose: 5000 });
       setTimeout(() => {
         navigate('/login', { replace: true });
@@ -1,7 +1,7 @@
 import { useState } from 'react';
 import { NavLink, useNavigate } from 'react-router-dom';
 import { useSelector, useDispatch } from 'react-redux';
-import { logout } from '../../features/Slices/authSlice';
+import { logoutUser } from '../../features/Slices/authSlice';
 import { selectCartTotalItems, clearCart } from '../../features/Slices/CartSlice';
 import { resetPaymentForm } from '../../features/Slices/PaymentFormSlice';
 import { X, Search } from 'lucide-react';
@@ -16,7 +16,7 @@ function Header() {
   const [isSearchOpen, setIsSearchOpen] = useState(false);
 
   const handleLogout = () => {
-    dispatch(logout());
+    dispatch(logoutUser());
     dispatch(clearCart());
     dispatch(resetPaymentForm());
     setIsMenuOpen(false);
@@ -74,7 +74,7 @@ function Login() {
     try {
       const data = await authApi.login(email.trim(), password)
 
-      dispatch(login({ user: data.user, token: data.token }))
+      dispatch(login({ user: data.user, token: data.token, refreshToken: data.refresh_token }))
       dispatch(syncGuestCartToUser(data.user.email))
 
       toast.success(`Welcome back, ${data.user.name}!`)
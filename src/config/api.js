@@ -10,26 +10,79 @@ export const API_ENDPOINTS = {
   uploads: `${BASE_URL}/uploads`,
 };
 
+// Variant URLs in a product's image_srcset may be relative to the API
+export const absoluteSrcset = (srcset) =>
+  srcset.replace(/(^|, )\//g, `$1${BASE_URL}/`);
+
 // Default headers - automatically gets token from localStorage
 const defaultHeaders = (token = null) => {
   const headers = { 'Content-Type': 'application/json' };
   // Use provided token or get from localStorage authState
-  let authToken = token;
-  if (!authToken) {
-    try {
-      const authState = JSON.parse(localStorage.getItem('authState') || '{}');
-      authToken = authState.token;
-    } catch {
-      authToken = null;
-    }
-  }
+  const authToken = token || readAuthState().token;
   if (authToken) headers['Authorization'] = `Bearer ${authToken}`;
   return headers;
 };
 
+const readAuthState = () => {
+  try {
+    return JSON.parse(localStorage.getItem('authState') || '{}');
+  } catch {
+    return {};
+  }
+};
+
+// One refresh at a time: concurrent 401s all wait on the same rotation
+let refreshInFlight = null;
+
+// Called with { token, refreshToken } after a rotation so the Redux auth state can follow
+let tokensRefreshedListener = null;
+
+export const onTokensRefreshed = (listener) => {
+  tokensRefreshedListener = listener;
+};
+
+const refreshAccessToken = () => {
+  if (!refreshInFlight) {
+    refreshInFlight = (async () => {
+      const authState = readAuthState();
+      if (!authState.refreshToken) return null;
+      const response = await fetch(`${BASE_URL}/auth/refresh`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: authState.refreshToken }),
+      });
+      if (!response.ok) return null;
+      const data = await response.json();
+      localStorage.setItem('authState', JSON.stringify({
+        ...authState,
+        token: data.token,
+        refreshToken: data.refresh_token,
+      }));
+      tokensRefreshedListener?.({ token: data.token, refreshToken: data.refresh_token });
+      return data.token;
+    })()
+      .catch(() => null)
+      .finally(() => { refreshInFlight = null; });
+  }
+  return refreshInFlight;
+};
+
+// On a 401 for an authenticated call, renew the access token once and retry
+const retryWithFreshToken = async (url, options) => {
+  const sent = options.headers?.Authorization?.replace('Bearer ', '');
+  const stored = readAuthState().token;
+  // Another request (or tab) may already have refreshed
+  const token = stored && stored !== sent ? stored : await refreshAccessToken();
+  if (!token) return null;
+  return fetch(url, { ...options, headers: { ...options.headers, Authorization: `Bearer ${token}` } });
+};
+
 // Core request handler
 const request = async (url, options = {}) => {
-  const response = await fetch(url, options);
+  let response = await fetch(url, options);
+  if (response.status === 401 && options.headers?.Authorization) {
+    response = (await retryWithFreshToken(url, options)) || response;
+  }
   const data = await response.json().catch(() => ({}));
   if (!response.ok) throw new Error(data.detail || `Request failed: ${response.status}`);
   return data;
@@ -62,6 +115,21 @@ export const authApi = {
       headers: defaultHeaders(token),
     }),
 
+  // Redeem the one-time code from the Google sign-in redirect
+  exchangeOAuthCode: (code) =>
+    request(`${API_ENDPOINTS.auth}/exchange`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ code }),
+    }),
+
+  logout: (refreshToken) =>
+    request(`${API_ENDPOINTS.auth}/logout`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    }),
+
   deleteUser: (userId, token) =>
     request(`${BASE_URL}/users/${userId}`, {
       method: 'DELETE',
@@ -79,6 +147,9 @@ export const productsApi = {
   getById: (id) =>
     request(`${API_ENDPOINTS.products}/${id}`),
 
+  getBatch: (ids) =>
+    request(`${API_ENDPOINTS.products}/batch?ids=${ids.join(',')}`),
+
   create: (data) =>
     request(`${API_ENDPOINTS.products}/`, {
       method: 'POST',
@@ -122,6 +193,14 @@ export const productsApi = {
       method: 'PATCH',
       headers: defaultHeaders(), // Will automatically get token
     }),
+
+  // items: [{ product_id, quantity }] - reserved all-or-nothing
+  reserveStock: (items) =>
+    request(`${API_ENDPOINTS.products}/reserve-stock`, {
+      method: 'POST',
+      headers: defaultHeaders(), // Will automatically get token
+      body: JSON.stringify({ items }),
+    }),
 };
 
 // ─── Cart ─────────────────────────────────────────────────────────────────────
@@ -138,6 +217,14 @@ export const cartApi = {
       body: JSON.stringify(item),
     }),
 
+  // operations: [{ op: 'add' | 'update' | 'remove', product_id, quantity, ... }] - applied in one transaction
+  batch: (userId, operations) =>
+    request(`${API_ENDPOINTS.cart}/batch`, {
+      method: 'POST',
+      headers: defaultHeaders(),
+      body: JSON.stringify({ user_id: userId, operations }),
+    }),
+
   update: (cartItemId, quantity) =>
     request(`${API_ENDPOINTS.cart}/${cartItemId}`, {
       method: 'PUT',
@@ -188,6 +275,14 @@ export const ordersApi = {
       body: JSON.stringify(data),
     }),
 
+  // Places the order from the user's server-side cart (stock + order + cart clear in one transaction)
+  checkout: (data, idempotencyKey) =>
+    request(`${API_ENDPOINTS.orders}/checkout`, {
+      method: 'POST',
+      headers: { ...defaultHeaders(), 'Idempotency-Key': idempotencyKey },
+      body: JSON.stringify(data),
+    }),
+
   update: (orderId, data) =>
     request(`${API_ENDPOINTS.orders}/${orderId}`, {
       method: 'PATCH',
@@ -7,13 +7,12 @@ import {
   selectUserInfo,
   resetPaymentForm,
 } from "../Slices/PaymentFormSlice";
-import { ordersApi, productsApi } from "../../config/api";
+import { ordersApi } from "../../config/api";
 import {
   selectCartItems,
   selectCartTotalItems,
   selectCartTotalPrice,
   clearCart,
-  clearCartBackend,
 } from "../Slices/CartSlice";
 import { addOrder } from "../Slices/OrdersSlice";
 import { updateProductStock } from "../Slices/AddProductSlice";
@@ -88,7 +87,7 @@ function PaymentDetailsForm() {
   }, [countdown, isProcessing]);
   const saveOrder = async (orderId, status, paymentId = null) => {
     try {
-      await ordersApi.create({
+      await ordersApi.checkout({
         order_id: orderId,
         customer_name: userInfo.name,
         customer_email: userInfo.email,
@@ -98,25 +97,17 @@ function PaymentDetailsForm() {
         state: userInfo.state,
         pincode: userInfo.pincode,
         country: userInfo.country || 'India',
-        order_items: cartItems.map(item => ({
-          id: item.id, name: item.name, price: item.price,
-          quantity: item.quantity, category: item.category, img: item.img
-        })),
-        total_items: totalItems,
-        total_price: totalPrice,
         status: status
-      });
+      }, orderId);
       dispatch(addOrder({
         orderId, userInfo, paymentInfo: { paymentId },
         orderInfo: { items: cartItems, totalItems, totalPrice },
         orderDate: new Date().toISOString(), status: status,
       }));
       for (const item of cartItems) {
-        await productsApi.reduceStock(item.id, item.quantity);
         dispatch(updateProductStock({ productId: item.id, quantity: item.quantity }));
       }
       dispatch(clearCart());
-      await dispatch(clearCartBackend()).unwrap();
       // Clear product cache so stock updates are reflected immediately
       sessionStorage.removeItem('products');
       localStorage.removeItem('cart_items');
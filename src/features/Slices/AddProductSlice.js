@@ -1,5 +1,5 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit'
-import { API_ENDPOINTS } from '../../config/api'
+import { API_ENDPOINTS, productsApi } from '../../config/api'
 
 const API_URL = API_ENDPOINTS.products
 
@@ -46,43 +46,24 @@ export const fetchProducts = createAsyncThunk(
     }
 );
 
+// Body for create/update requests
+const toProductPayload = (productData) => ({
+    name: productData.name,
+    Category: productData.category,
+    Price: parseInt(productData.price),
+    Description: productData.description || 'No description',
+    Image: productData.img || '',
+    Quantity: parseInt(productData.stockQuantity)
+});
+
+// Admin writes go through productsApi so an expired access token is refreshed and the call retried
+
 // Async thunk to add product to backend
 export const addProductToBackend = createAsyncThunk(
     'products/addProductToBackend',
     async (productData, { rejectWithValue }) => {
         try {
-            // Get token from localStorage
-            const authState = JSON.parse(localStorage.getItem('authState') || '{}');
-            const token = authState.token;
-            
-            const headers = {
-                'Content-Type': 'application/json',
-            };
-            
-            // Add Authorization header if token exists
-            if (token) {
-                headers['Authorization'] = `Bearer ${token}`;
-            }
-            
-            const response = await fetch(`${API_URL}/`, {
-                method: 'POST',
-                headers: headers,
-                body: JSON.stringify({
-                    name: productData.name,
-                    Category: productData.category,
-                    Price: parseInt(productData.price),
-                    Description: productData.description || 'No description',
-                    Image: productData.img || '',
-                    Quantity: parseInt(productData.stockQuantity)
-                }),
-            });
-            
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.detail || 'Failed to add product');
-            }
-            
-            const data = await response.json();
+            const data = await productsApi.create(toProductPayload(productData));
             return {
                 id: (data.product_id || data.product?.id)?.toString(),
                 name: productData.name,
@@ -102,43 +83,7 @@ export const updateProductInBackend = createAsyncThunk(
     'products/updateProductInBackend',
     async (productData, { rejectWithValue }) => {
         try {
-            console.log('Updating product with ID:', productData.id, 'Type:', typeof productData.id);
-            
-            // Get token from localStorage
-            const authState = JSON.parse(localStorage.getItem('authState') || '{}');
-            const token = authState.token;
-            
-            const headers = {
-                'Content-Type': 'application/json',
-            };
-            
-            // Add Authorization header if token exists
-            if (token) {
-                headers['Authorization'] = `Bearer ${token}`;
-            }
-            
-            const response = await fetch(`${API_URL}/${productData.id}`, {
-                method: 'PUT',
-                headers: headers,
-                body: JSON.stringify({
-                    name: productData.name,
-                    Category: productData.category,
-                    Price: parseInt(productData.price),
-                    Description: productData.description || 'No description',
-                    Image: productData.img || '',
-                    Quantity: parseInt(productData.stockQuantity)
-                }),
-            });
-            
-            console.log('Update response status:', response.status);
-            
-            if (!response.ok) {
-                const errorData = await response.json();
-                console.error('Update error:', errorData);
-                throw new Error(errorData.detail || 'Failed to update product');
-            }
-            
-            const data = await response.json();
+            await productsApi.update(productData.id, toProductPayload(productData));
             return {
                 id: productData.id.toString(),
                 name: productData.name,
@@ -159,27 +104,7 @@ export const deleteProductFromBackend = createAsyncThunk(
     'products/deleteProductFromBackend',
     async (productId, { rejectWithValue }) => {
         try {
-            // Get token from localStorage
-            const authState = JSON.parse(localStorage.getItem('authState') || '{}');
-            const token = authState.token;
-            
-            const headers = {};
-            
-            // Add Authorization header if token exists
-            if (token) {
-                headers['Authorization'] = `Bearer ${token}`;
-            }
-            
-            const response = await fetch(`${API_URL}/${productId}`, {
-                method: 'DELETE',
-                headers: headers,
-            });
-            
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.detail || 'Failed to delete product');
-            }
-            
+            await productsApi.delete(productId);
             return productId;
         } catch (error) {
             return rejectWithValue(error.message);
@@ -299,6 +224,7 @@ export const AddProductSlice = createSlice({
                     price: product.Price,
                     category: product.Category,
                     img: product.Image,
+                    srcset: product.image_srcset || null,
                     stockQuantity: product.Quantity,
                     description: product.Description
                 }));
@@ -334,6 +260,7 @@ export const AddProductSlice = createSlice({
                     price: product.Price,
                     category: product.Category,
                     img: product.Image,
+                    srcset: product.image_srcset || null,
                     stockQuantity: product.Quantity,
                     description: product.Description
                 }));
@@ -374,6 +301,7 @@ export const AddProductSlice = createSlice({
                     price: product.Price,
                     category: product.Category,
                     img: product.Image,
+                    srcset: product.image_srcset || null,
                     stockQuantity: product.Quantity
                 }));
                 state.products = backendProducts;
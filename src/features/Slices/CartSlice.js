@@ -108,22 +108,20 @@ export const syncGuestCartToUser = createAsyncThunk(
         return await cartApi.getByUser(userEmail);
       }
 
-      for (const item of guestItems) {
-        await cartApi.add({
-          user_id: userEmail,
-          product_id: item.product_id,
-          product_name: item.product_name,
-          product_price: item.product_price,
-          product_category: item.product_category,
-          product_image: item.product_image,
-          quantity: item.quantity
-        });
-      }
+      const { items } = await cartApi.batch(userEmail, guestItems.map(item => ({
+        op: 'add',
+        product_id: item.product_id,
+        product_name: item.product_name,
+        product_price: item.product_price,
+        product_category: item.product_category,
+        product_image: item.product_image,
+        quantity: item.quantity
+      })));
 
       await cartApi.clearByUser(guestId);
       sessionStorage.removeItem('cart_user_id');
 
-      return await cartApi.getByUser(userEmail);
+      return items;
     } catch (error) {
       console.error('Cart sync error:', error);
       return rejectWithValue(error.message);
@@ -20,17 +20,7 @@ export const updateOrderInBackend = createAsyncThunk(
   'orders/updateOrderInBackend',
   async ({ orderId, updates }, { rejectWithValue }) => {
     try {
-      const response = await fetch(`${API_URL}/${orderId}`, {
-        method: 'PATCH',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(updates)
-      });
-      
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.detail || 'Failed to update order');
-      }
-      
+      await ordersApi.update(orderId, updates);
       return { orderId, updates };
     } catch (error) {
       return rejectWithValue(error.message);
@@ -43,15 +33,7 @@ export const deleteOrderFromBackend = createAsyncThunk(
   'orders/deleteOrderFromBackend',
   async (orderId, { rejectWithValue }) => {
     try {
-      const response = await fetch(`${API_URL}/${orderId}`, {
-        method: 'DELETE'
-      });
-      
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.detail || 'Failed to delete order');
-      }
-      
+      await ordersApi.delete(orderId);
       return orderId;
     } catch (error) {
       return rejectWithValue(error.message);
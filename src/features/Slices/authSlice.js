@@ -1,4 +1,5 @@
-import { createSlice } from '@reduxjs/toolkit'
+import { createSlice, createAsyncThunk } from '@reduxjs/toolkit'
+import { authApi } from '../../config/api'
 
 // Load auth state from localStorage
 const loadAuthState = () => {
@@ -7,6 +8,7 @@ const loadAuthState = () => {
     return savedAuth ? JSON.parse(savedAuth) : {
       user: null,
       token: null,
+      refreshToken: null,
       isAuthenticated: false,
       isAdmin: false
     }
@@ -14,6 +16,7 @@ const loadAuthState = () => {
     return {
       user: null,
       token: null,
+      refreshToken: null,
       isAuthenticated: false,
       isAdmin: false
     }
@@ -22,15 +25,32 @@ const loadAuthState = () => {
 
 const initialState = loadAuthState()
 
+// Log out locally, then revoke the refresh token server-side
+export const logoutUser = createAsyncThunk(
+  'auth/logoutUser',
+  async (_, { dispatch }) => {
+    // Read it from storage since api.js rotates it there
+    let refreshToken = null
+    try {
+      refreshToken = JSON.parse(localStorage.getItem('authState') || '{}').refreshToken
+    } catch {
+      // Nothing stored to revoke
+    }
+    dispatch(logout())
+    if (refreshToken) await authApi.logout(refreshToken).catch(() => {})
+  }
+)
+
 export const authSlice = createSlice({
   name: 'auth',
   initialState,
   reducers: {
     login: (state, action) => {
-      const { user, token } = action.payload
+      const { user, token, refreshToken = null } = action.payload
       
       state.user = user
       state.token = token
+      state.refreshToken = refreshToken
       state.isAuthenticated = true
       state.isAdmin = user.role === 'admin'
       
@@ -38,13 +58,22 @@ export const authSlice = createSlice({
       localStorage.setItem('authState', JSON.stringify({
         user: state.user,
         token: state.token,
+        refreshToken: state.refreshToken,
         isAuthenticated: state.isAuthenticated,
         isAdmin: state.isAdmin
       }))
     },
+    // api.js rotated the tokens (and already saved them to localStorage)
+    tokensRefreshed: (state, action) => {
+      const { token, refreshToken } = action.payload
+      if (!state.isAuthenticated) return
+      state.token = token
+      state.refreshToken = refreshToken
+    },
     logout: (state) => {
       state.user = null
       state.token = null
+      state.refreshToken = null
       state.isAuthenticated = false
       state.isAdmin = false
       
@@ -56,5 +85,5 @@ export const authSlice = createSlice({
   }
 })
 
-export const { login, logout } = authSlice.actions
+export const { login, logout, tokensRefreshed } = authSlice.actions
 export default authSlice.reducer
@@ -8,6 +8,7 @@ import { selectFilteredProducts, selectFilters } from "../../Slices/filterSlice"
 import { toast } from "react-toastify";
 import Loader from "../../../components/Loader/Loader";
 import { Button } from "../../../components/ui";
+import { absoluteSrcset } from "../../../config/api";
 
 function ProductsList() {
   const dispatch = useDispatch();
@@ -92,12 +93,21 @@ function ProductsList() {
                 onClick={() => navigate(`/product/${product.id}`)}
               >
                 {product.img ? (
-                  <img
-                    src={product.img}
-                    alt={product.name}
-                    className="w-full h-full object-cover transition-transform duration-300 hover:scale-105"
-                    style={{ objectPosition: "top" }}
-                  />
+                  <picture className="w-full h-full">
+                    {product.srcset?.avif && (
+                      <source type="image/avif" srcSet={absoluteSrcset(product.srcset.avif)} sizes="240px" />
+                    )}
+                    {product.srcset?.webp && (
+                      <source type="image/webp" srcSet={absoluteSrcset(product.srcset.webp)} sizes="240px" />
+                    )}
+                    <img
+                      src={product.img}
+                      alt={product.name}
+                      loading="lazy"
+                      className="w-full h-full object-cover transition-transform duration-300 hover:scale-105"
+                      style={{ objectPosition: "top" }}
+                    />
+                  </picture>
                 ) : (
                   <div className="text-gray-400 text-sm">No Image</div>
                 )}